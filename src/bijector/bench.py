@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+"""
+Scalability benchmark for the translators.
+
+Synthetic programs are generated in the style of send100 / recv100 in
+test/testcsp.py: pairs of processes joined by a channel, all started
+together. For each program size, in both directions, the benchmark
+records translation throughput (lines per second), the time to
+re-translate after a one line edit, the peak memory of the process and
+the size of the output. Every measurement runs in a fresh worker
+process, so that peak memory is not inherited from earlier runs.
+
+The throughput of each registered lint output parser is measured too,
+over synthetic lint output.
+
+The results are written as JSON for trend tracking. Qt is never
+imported, so this runs without a display.
+
+Usage: python -m bijector bench [options]
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import json
+import multiprocessing
+import os
+import platform
+import Queue
+import resource
+import sys
+import time
+
+from lintparse import get_parser, parser_names
+from roundtrip import git_commit
+from tocsp import ThreadsToCSP
+from tothreads import CSPToThreads
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+REPORT_VERSION = 2
+
+SIZES = (10, 1000) # Number of processes. Larger sizes take minutes.
+LARGE_SIZES = (10, 1000, 100000) # With --large.
+TIMEOUT = 60 # Seconds between checks that a worker process is alive.
+LINT_LINES = 100000
+DIRECTIONS = ('csp', 'threads')
+
+CSP_PAIR = '''@process
+def send%(n)d(cout):
+    """
+    readset =
+    writeset = cout
+    """
+    for i in range(100):
+        cout.write(i)
+    return
+
+
+@process
+def recv%(n)d(cin):
+    """
+    readset = cin
+    writeset =
+    """
+    for i in range(100):
+        print(cin.read())
+    return
+
+
+'''
+
+CSP_START = '''    c%(n)d = Channel()
+    procs.append(send%(n)d(c%(n)d))
+    procs.append(recv%(n)d(c%(n)d))
+'''
+
+THREADS_PAIR = '''def send%(n)d(cout):
+    for i in range(100):
+        cout.put(i)
+    return
+
+
+def recv%(n)d(cin):
+    for i in range(100):
+        print(cin.get())
+    return
+
+
+'''
+
+THREADS_START = '''    q%(n)d = Queue.Queue()
+    threads.append(threading.Thread(target=send%(n)d, args=(q%(n)d,)))
+    threads.append(threading.Thread(target=recv%(n)d, args=(q%(n)d,)))
+'''
+
+
+def generate(direction, processes):
+    """Return a synthetic program to be translated in direction.
+    A 'csp' program is threaded code, to be translated to CSP.
+    """
+    pairs = max(processes // 2, 1)
+    out = []
+    if direction == 'csp':
+        out.append('import threading\nimport Queue\n\n\n')
+        out.extend(THREADS_PAIR % {'n': n} for n in xrange(pairs))
+        out.append('def main():\n    threads = []\n')
+        out.extend(THREADS_START % {'n': n} for n in xrange(pairs))
+        out.append('    for t in threads:\n        t.start()\n'
+                   '    for t in threads:\n        t.join()\n    return\n')
+    else:
+        out.append('from csp.csp import *\n\n\n')
+        out.extend(CSP_PAIR % {'n': n} for n in xrange(pairs))
+        out.append('def main():\n    procs = []\n')
+        out.extend(CSP_START % {'n': n} for n in xrange(pairs))
+        out.append('    Par(*procs).start()\n    return\n')
+    out.append('\n\nif __name__ == \'__main__\':\n    main()\n')
+    return ''.join(out)
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(direction, processes):
+    """Generate and translate one program. Returns a dictionary of results.
+    """
+    source = generate(direction, processes)
+    lines = source.count('\n')
+    base_rss = peak_rss_kb()
+    if direction == 'csp':
+        translator = ThreadsToCSP()
+    else:
+        translator = CSPToThreads()
+    start, cpu = time.time(), time.clock()
+    code = translator.translate(source)
+    seconds, cpu = time.time() - start, time.clock() - cpu
+    # Re-translate after editing a line in the middle of the program.
+    middle = source.find('range(100)',
+                         source.find('def send%d(' % (max(processes // 2, 1) // 2)))
+    edited = source[:middle] + 'range(101)' + source[middle + 10:]
+    start = time.time()
+    translator.translate(edited)
+    incremental = time.time() - start
+    return {'direction': direction,
+            'processes': processes,
+            'channels': max(processes // 2, 1),
+            'lines': lines,
+            'input_bytes': len(source),
+            'output_bytes': len(code),
+            'output_lines': code.count('\n'),
+            'seconds': round(seconds, 6),
+            'cpu_seconds': round(cpu, 6),
+            'lines_per_second': int(round(lines / seconds)) if seconds else None,
+            'incremental_seconds': round(incremental, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'translation_rss_kb': peak_rss_kb() - base_rss}
+
+
+def run_measure(args, queue):
+    try:
+        queue.put(measure(*args))
+    except Exception, e:
+        queue.put({'direction': args[0], 'processes': args[1],
+                   'error': '%s: %s' % (e.__class__.__name__, e)})
+    return
+
+
+def measure_isolated(direction, processes):
+    """Run measure() in a fresh worker process.
+    """
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=run_measure,
+                                     args=((direction, processes), queue))
+    worker.start()
+    while True:
+        try:
+            result = queue.get(timeout=TIMEOUT)
+            break
+        except Queue.Empty:
+            if not worker.is_alive():
+                # Killed, e.g. by running out of memory, before replying.
+                result = {'direction': direction, 'processes': processes,
+                          'error': 'worker exited with code %s' %
+                          worker.exitcode}
+                break
+    worker.join()
+    return result
+
+
+def measure_lint_parser(name, messages):
+    """Parse synthetic output holding a number of lint messages.
+    Returns a dictionary of results.
+    """
+    parser_class = get_parser(name)
+    lines = parser_class.sample(messages)
+    if len(lines) == 1:
+        lines = lines[0].split('\n') # One document, e.g. JSON.
+    parser = parser_class()
+    start = time.time()
+    # Fed in batches, as output arrives from a running lint process.
+    parsed = 0
+    for index in xrange(0, len(lines), 1000):
+        parsed += len(parser.feed(lines[index:index + 1000]))
+    parsed += len(parser.close())
+    seconds = time.time() - start
+    return {'parser': name,
+            'lines': len(lines),
+            'messages': parsed,
+            'rejected': len(parser.rejected),
+            'seconds': round(seconds, 6),
+            'messages_per_second': (int(round(parsed / seconds))
+                                    if seconds else None)}
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog bench [options]')
+    parser.add_option('-n', '--sizes', dest='sizes',
+                      default=','.join(str(size) for size in SIZES),
+                      help='Comma separated numbers of processes '
+                      '[default: %default]')
+    parser.add_option('--large', dest='sizes', action='store_const',
+                      const=','.join(str(size) for size in LARGE_SIZES),
+                      help='Also benchmark %d processes'
+                      % LARGE_SIZES[-1])
+    parser.add_option('-t', '--to', dest='directions', action='append',
+                      default=[], choices=list(DIRECTIONS),
+                      help='Only benchmark translation to csp or threads '
+                      '(may be repeated)')
+    parser.add_option('-l', '--lint-messages', dest='lint_messages',
+                      type='int', default=LINT_LINES,
+                      help='Number of messages to give each lint output '
+                      'parser, or 0 to skip [default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='Write the JSON report to this file '
+                      '[default: stdout]')
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+    try:
+        sizes = [int(size) for size in options.sizes.split(',')]
+    except ValueError:
+        parser.error('sizes must be integers')
+
+    report = {'version': REPORT_VERSION,
+              'commit': git_commit(os.path.dirname(os.path.abspath(__file__))),
+              'python': sys.version.split()[0],
+              'platform': platform.platform(),
+              'timestamp': int(time.time()),
+              'results': [],
+              'lint_parsers': []}
+    status = 0
+    for direction in options.directions or DIRECTIONS:
+        for size in sizes:
+            result = measure_isolated(direction, size)
+            report['results'].append(result)
+            if 'error' in result:
+                status = 1
+            sys.stderr.write('%(direction)s %(processes)d processes: ' % result
+                             + (result.get('error') or
+                                '%(lines_per_second)s lines/s, '
+                                '%(peak_rss_kb)d KB peak' % result) + '\n')
+    if options.lint_messages > 0:
+        for name in parser_names():
+            result = measure_lint_parser(name, options.lint_messages)
+            report['lint_parsers'].append(result)
+            if result['messages'] != options.lint_messages:
+                status = 1
+            sys.stderr.write('lint parser %(parser)s: %(messages)d messages in '
+                             '%(seconds).3fs, %(rejected)d lines rejected\n'
+                             % result)
+    text = json.dumps(report, indent=1, sort_keys=True)
+    if options.output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
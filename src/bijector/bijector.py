@@ -17,25 +17,41 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import sip
-sip.setapi('QVariant', 2)
-
-import PyQt4.QtGui as QtGui
-
 import sys
 
-from gui.main_window import MainWindow
-
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
 __date__ = 'April 2011'
 
+# Headless subcommands. These must not import Qt.
+COMMANDS = ('convert', 'roundtrip', 'bench')
+
+
+def run_command(name, args):
+    """Run a headless subcommand and return its exit status.
+    """
+    module = __import__(name, globals())
+    return module.main(args)
+
+
+def run_gui():
+    import sip
+    sip.setapi('QVariant', 2)
+
+    import PyQt4.QtGui as QtGui
+
+    from gui.main_window import MainWindow
 
-def main():
     app = QtGui.QApplication(sys.argv)
     window = MainWindow()
     window.showMaximized()
     sys.exit(app.exec_())
 
 
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(run_command(sys.argv[1], sys.argv[2:]))
+    run_gui()
+
+
 if __name__ == '__main__':
     main()
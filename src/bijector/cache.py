@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Content-addressed on-disk cache.
+
+Values are stored in files named by a hash of everything which affects
+them, e.g. the source text, translator version and options. Reading an
+entry touches its file, and once the cache grows beyond a size limit
+the least recently used entries are removed.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+import tempfile
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+def user_cache_dir(name):
+    """Return the directory for a named cache under the user's home.
+    """
+    return os.path.join(os.path.expanduser('~'), '.pybijector', 'cache', name)
+
+
+def digest(*parts):
+    """Return a hex digest identifying a sequence of strings.
+    """
+    sha = hashlib.sha1()
+    for part in parts:
+        part = str(part)
+        sha.update('%d:' % len(part))
+        sha.update(part)
+    return sha.hexdigest()
+
+
+class DiskCache(object):
+    """A directory of cached strings, evicted least recently used first.
+    """
+    MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes or DiskCache.MAX_BYTES
+        self.size = None # Total bytes on disk, computed lazily.
+        return
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        """Return the value stored under key, or None.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path, None) # Mark as recently used.
+        except (IOError, OSError):
+            return None
+        return value
+
+    def put(self, key, value):
+        """Store value under key, evicting old entries if needed.
+        Failures to write are ignored: the cache is only an optimisation.
+        """
+        path = self.path(key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # Write then rename, so readers never see a partial entry.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            try:
+                old = os.path.getsize(path) # Replaced by the rename.
+            except OSError:
+                old = 0
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            return
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        else:
+            self.size += len(value) - old
+        if self.size > self.max_bytes:
+            self.evict()
+        return
+
+    def entries(self):
+        """Yield (path, size, last use) for every entry in the cache.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+        return
+
+    def evict(self):
+        """Remove least recently used entries until the cache is 3/4 full.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 3 // 4
+        for path, size, _ in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+        return
+
+    def clear(self):
+        for path, _, _ in list(self.entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
+        return
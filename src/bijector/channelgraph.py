@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+
+"""
+Project-wide index of python-csp processes and channels.
+
+Every @process and @forever function may declare the channels it uses in
+its docstring:
+
+    readset = cin1, cin2
+    writeset = cout
+
+The index records these declarations, every Channel() construction site
+and every process instance which is passed a channel, and answers
+questions such as "which processes write to this channel?". Files are
+re-indexed only when they change, and the index is saved between
+sessions.
+
+Processes are known by their names qualified with the classes and
+functions they are defined in, e.g. TestOOP.send for a method, so that
+a method does not hide a module-level process of the same name. A call
+such as f.send(c) is resolved to a method through the class of f, when
+f is assigned an instance in the same scope.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import json
+import os
+
+from tocsp import assignments, call_name
+from translator import dotted_name
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+PROCESS_DECORATORS = ('process', 'forever')
+
+
+def user_index_path():
+    return os.path.join(os.path.expanduser('~'), '.pybijector', 'channels.json')
+
+
+def parse_sets(doc):
+    """Return (readset, writeset) lists from a process docstring.
+    """
+    sets = {'readset': [], 'writeset': []}
+    for line in (doc or '').splitlines():
+        name, sep, value = line.partition('=')
+        name = name.strip()
+        if sep and name in sets:
+            sets[name] = [chan.strip() for chan in value.split(',')
+                          if chan.strip()]
+    return sets['readset'], sets['writeset']
+
+
+def outer_scopes(scope):
+    """Yield scope and the scopes around it, innermost first, ending
+    with the module, ''.
+    """
+    parts = scope.split('.') if scope else []
+    for end in xrange(len(parts), -1, -1):
+        yield '.'.join(parts[:end])
+    return
+
+
+def resolve(name, scope, known, classes, types, modules):
+    """Return the qualified name of the process called as name in scope.
+
+    known is the set of qualified names defined in the module, classes
+    those of its classes, types maps (scope, variable) to the class
+    called to assign an instance to a variable, and modules is the set
+    of imported module names. A name defined in another module is left
+    as it is called, without the name of any module it is called through.
+    """
+    head, _, tail = name.rpartition('.')
+    if not head:
+        for outer in outer_scopes(scope):
+            candidate = outer + '.' + name if outer else name
+            if candidate in known:
+                return candidate
+        return name
+    if name in known:
+        return name # e.g. Class.method
+    if head == 'self' and scope.rsplit('.', 1)[0] in classes:
+        # A method calling another method of its class.
+        return scope.rsplit('.', 1)[0] + '.' + tail
+    for outer in outer_scopes(scope):
+        if (outer, head) in types:
+            cls = resolve(types[(outer, head)], outer, known, classes, {}, ())
+            if cls in classes:
+                return cls + '.' + tail
+            break
+    if head.split('.')[0] in modules:
+        return tail
+    return name
+
+
+def index_source(source):
+    """Return the index entry for the source of a single module.
+
+    The entry is a dictionary of plain lists and dictionaries, so that it
+    can be stored as JSON.
+    """
+    tree = ast.parse(source)
+    processes = {}
+    channels = []
+    instances = []
+    known = set() # Qualified names of functions and classes.
+    classes = set()
+    types = {} # (scope, variable) -> class name called to assign it.
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update((alias.asname or alias.name).split('.')[0]
+                           for alias in node.names)
+    scopes = [(tree, '')]
+    while scopes:
+        node, scope = scopes.pop()
+        local = set()
+        body = [child for child in ast.iter_child_nodes(node)]
+        for child in body:
+            if isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                name = child.name if not scope else scope + '.' + child.name
+                scopes.append((child, name))
+                known.add(name)
+                if isinstance(child, ast.ClassDef):
+                    classes.add(name)
+            if isinstance(child, ast.FunctionDef) and \
+                    set(dotted_name(dec) for dec in child.decorator_list) & \
+                    set(PROCESS_DECORATORS):
+                readset, writeset = parse_sets(ast.get_docstring(child))
+                params = [arg.id for arg in child.args.args
+                          if isinstance(arg, ast.Name)]
+                if isinstance(node, ast.ClassDef) and 'staticmethod' not in \
+                        [dotted_name(dec) for dec in child.decorator_list]:
+                    params = params[1:] # Bound to the instance.
+                processes[name] = {
+                    'line': child.lineno,
+                    'scope': scope,
+                    'params': params,
+                    'readset': readset,
+                    'writeset': writeset}
+        # Channels created directly in this scope (not in nested defs).
+        for child in body:
+            if isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                continue
+            for name, value in assignments(child):
+                if call_name(value) == 'Channel':
+                    local.add(name)
+                    channels.append({'name': name, 'line': value.lineno,
+                                     'scope': scope})
+                elif call_name(value) is not None:
+                    types[(scope, name)] = call_name(value)
+        for child in body:
+            if isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                continue
+            for call in ast.walk(child):
+                if not isinstance(call, ast.Call):
+                    continue
+                args = [dotted_name(arg) for arg in call.args]
+                kwargs = dict((kw.arg, dotted_name(kw.value))
+                              for kw in call.keywords)
+                if not (set(args) | set(kwargs.values())) & local:
+                    continue
+                name = call_name(call)
+                if name is None:
+                    continue
+                instances.append({'process': name,
+                                  'line': call.lineno, 'scope': scope,
+                                  'args': args, 'kwargs': kwargs})
+    # Calls are resolved once every scope has been seen.
+    for inst in instances:
+        inst['process'] = resolve(inst['process'], inst['scope'], known,
+                                  classes, types, modules)
+    return {'processes': processes, 'channels': channels,
+            'instances': instances}
+
+
+class ChannelIndex(object):
+    """Index of processes and channels across many files.
+    """
+    VERSION = 2
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {} # filename -> entry
+        self.by_process = {} # process name -> set of filenames
+        self.by_channel = {} # channel name -> set of filenames
+        self.dirty = False
+        return
+
+    def load(self):
+        """Load a saved index, if there is one.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return
+        if data.get('version') != ChannelIndex.VERSION:
+            return
+        for filename, entry in data['files'].items():
+            self._add(str(filename), entry)
+        return
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({'version': ChannelIndex.VERSION,
+                           'files': self.files}, f)
+            os.rename(self.path + '.tmp', self.path)
+        except (IOError, OSError):
+            return
+        self.dirty = False
+        return
+
+    def update_file(self, filename, source=None):
+        """Re-index a file if it has changed since it was last indexed.
+        Return True if the file was re-indexed.
+        """
+        filename = os.path.abspath(filename)
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            self.remove_file(filename)
+            return False
+        stamp = [stat.st_mtime, stat.st_size]
+        old = self.files.get(filename)
+        if old is not None and old['stamp'] == stamp and source is None:
+            return False
+        try:
+            if source is None:
+                with open(filename) as f:
+                    source = f.read()
+            entry = index_source(source)
+        except (IOError, SyntaxError, TypeError):
+            return False
+        entry['stamp'] = stamp
+        self.remove_file(filename)
+        self._add(filename, entry)
+        self.dirty = True
+        return True
+
+    def update_tree(self, root):
+        """Re-index every changed module under a directory.
+        Return the number of files re-indexed.
+        """
+        count = 0
+        seen = set()
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                if name.endswith('.py'):
+                    filename = os.path.abspath(os.path.join(directory, name))
+                    seen.add(filename)
+                    count += self.update_file(filename)
+        root = os.path.abspath(root) + os.sep
+        for filename in list(self.files):
+            if filename.startswith(root) and filename not in seen:
+                self.remove_file(filename)
+        return count
+
+    def update_directory(self, directory):
+        """Re-index every changed module in a directory, but not in its
+        subdirectories. Return the number of files re-indexed.
+        """
+        directory = os.path.abspath(directory)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            names = []
+        count = 0
+        seen = set()
+        for name in names:
+            filename = os.path.join(directory, name)
+            if name.endswith('.py') and os.path.isfile(filename):
+                seen.add(filename)
+                count += self.update_file(filename)
+        for filename in list(self.files):
+            if os.path.dirname(filename) == directory and \
+                    filename not in seen:
+                self.remove_file(filename)
+        return count
+
+    def remove_file(self, filename):
+        entry = self.files.pop(filename, None)
+        if entry is None:
+            return
+        for name in entry['processes']:
+            self._discard(self.by_process, name, filename)
+        for name in self.channel_names(entry):
+            self._discard(self.by_channel, name, filename)
+        self.dirty = True
+        return
+
+    def channel_names(self, entry):
+        names = set(chan['name'] for chan in entry['channels'])
+        for proc in entry['processes'].values():
+            names.update(proc['readset'])
+            names.update(proc['writeset'])
+        return names
+
+    def _add(self, filename, entry):
+        self.files[filename] = entry
+        for name in entry['processes']:
+            self.by_process.setdefault(name, set()).add(filename)
+        for name in self.channel_names(entry):
+            self.by_channel.setdefault(name, set()).add(filename)
+        return
+
+    def _discard(self, index, name, filename):
+        filenames = index.get(name)
+        if filenames is not None:
+            filenames.discard(filename)
+            if not filenames:
+                del index[name]
+        return
+
+    def definitions(self, process):
+        """Yield (filename, info) for every definition of a process.
+        """
+        for filename in sorted(self.by_process.get(process, ())):
+            yield filename, self.files[filename]['processes'][process]
+        return
+
+    def writers(self, channel):
+        """Return a list of (filename, line, description) tuples for every
+        process which writes to a channel.
+        """
+        return self._users(channel, 'writeset')
+
+    def readers(self, channel):
+        """Return a list of (filename, line, description) tuples for every
+        process which reads from a channel.
+        """
+        return self._users(channel, 'readset')
+
+    def _users(self, channel, which):
+        results = []
+        for filename in sorted(self.by_channel.get(channel, ())):
+            entry = self.files[filename]
+            # Processes which declare the channel directly, either as a
+            # parameter or as an attribute such as self.chan.
+            for name, proc in sorted(entry['processes'].items()):
+                if channel in proc[which]:
+                    results.append((filename, proc['line'],
+                                    'process %s' % name))
+            # Process instances passed a channel created here.
+            for inst in entry['instances']:
+                slots = [index for index, arg in enumerate(inst['args'])
+                         if arg == channel]
+                slots += [key for key, arg in inst['kwargs'].items()
+                          if arg == channel]
+                if not slots:
+                    continue
+                for _, proc in self.definitions(inst['process']):
+                    params = [proc['params'][slot]
+                              if isinstance(slot, int) and
+                              slot < len(proc['params']) else slot
+                              for slot in slots]
+                    if set(params) & set(proc[which]):
+                        results.append((filename, inst['line'],
+                                        '%s(...) in %s' % (inst['process'],
+                                                           inst['scope'] or
+                                                           'module')))
+                        break
+        return results
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+"""
+Headless batch translation of a directory tree.
+
+Every module under the given paths is translated between the threaded
+and CSP styles by a pool of worker processes. One JSON object is written
+to stdout per file as soon as it has been translated, followed by a
+summary object. Qt is never imported, so this runs without a display.
+
+Usage: python -m bijector convert [options] PATH...
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+from tocsp import ThreadsToCSP
+from tothreads import CSPToThreads
+from translator import TranslationError
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+CSP_RE = re.compile(r'^\s*(from|import)\s+csp\b', re.MULTILINE)
+THREADS_RE = re.compile(r'^\s*(from|import)\s+(threading|Queue|queue)\b',
+                        re.MULTILINE)
+
+# One translator of each kind per worker process.
+_translators = {}
+
+
+def get_translator(direction, backend='auto'):
+    if direction not in _translators:
+        if direction == 'csp':
+            _translators[direction] = ThreadsToCSP(backend=backend)
+        else:
+            _translators[direction] = CSPToThreads()
+    return _translators[direction]
+
+
+def detect(source):
+    """Guess which way a module should be translated.
+    Return 'csp', 'threads' or None.
+    """
+    if CSP_RE.search(source):
+        return 'threads'
+    elif THREADS_RE.search(source):
+        return 'csp'
+    return None
+
+
+def find_modules(paths):
+    """Yield every Python module under a list of files and directories.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    yield os.path.join(root, name)
+    return
+
+
+def convert_file(job):
+    """Translate a single file. Runs in a worker process.
+
+    job is a tuple of (path, relative path, direction, output directory,
+    CSP backend). Returns a dictionary describing the result.
+    """
+    path, relpath, direction, output, backend = job
+    result = {'path': path, 'status': 'ok'}
+    start = time.time()
+    try:
+        with open(path) as f:
+            source = f.read()
+        if direction is None:
+            direction = detect(source)
+        result['direction'] = direction
+        if direction is None:
+            result['status'] = 'skipped'
+        else:
+            code = get_translator(direction, backend).translate(source)
+            result['lines'] = source.count('\n')
+            if output is not None:
+                target = os.path.join(output, relpath)
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+                with open(target, 'w') as f:
+                    f.write(code)
+                result['output'] = target
+    except TranslationError, e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    except (IOError, OSError), e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    except Exception, e:
+        # A bug in a translator should fail this file, not the whole run.
+        # The translator's caches may be inconsistent, so start afresh.
+        _translators.pop(direction, None)
+        result['status'] = 'error'
+        result['error'] = '%s: %s' % (e.__class__.__name__, e)
+    result['seconds'] = round(time.time() - start, 6)
+    return result
+
+
+def jobs_for(paths, direction, output, backend):
+    for path in paths:
+        for module in find_modules([path]):
+            if os.path.isdir(path):
+                relpath = os.path.relpath(module, path)
+            else:
+                relpath = os.path.basename(module)
+            yield module, relpath, direction, output, backend
+    return
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog convert [options] PATH...')
+    parser.add_option('-t', '--to', dest='direction', default=None,
+                      choices=['csp', 'threads'],
+                      help='Translate to csp or threads. By default the '
+                      'direction is detected from the imports of each module.')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='Write translated modules under this directory. '
+                      'Without this, modules are translated but not written.')
+    parser.add_option('-b', '--backend', dest='backend', default='auto',
+                      choices=['auto', 'thread', 'process'],
+                      help='python-csp backend for translated code. By default '
+                      'it is chosen by a static cost model [default: %default]')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int',
+                      default=multiprocessing.cpu_count(),
+                      help='Number of worker processes [default: %default]')
+    (options, args) = parser.parse_args(argv)
+    if not args:
+        parser.error('no paths given')
+
+    jobs = jobs_for(args, options.direction, options.output,
+                    options.backend)
+    counts = {'ok': 0, 'error': 0, 'skipped': 0}
+    start = time.time()
+    pool = None
+    if options.jobs > 1:
+        pool = multiprocessing.Pool(options.jobs)
+        results = pool.imap_unordered(convert_file, jobs, 8)
+    else:
+        results = (convert_file(job) for job in jobs)
+    try:
+        for result in results:
+            counts[result['status']] += 1
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        if pool is not None:
+            pool.terminate()
+        return 130
+    if pool is not None:
+        pool.close()
+        pool.join()
+    summary = {'summary': True, 'files': sum(counts.values()),
+               'seconds': round(time.time() - start, 6)}
+    summary.update(counts)
+    sys.stdout.write(json.dumps(summary) + '\n')
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""
+Static cost model for choosing a python-csp backend.
+
+python-csp can run processes as OS threads (csp.os_thread) or as OS
+processes (csp.os_process). Threads are cheap to start and communicate
+through channels cheaply, but share the GIL. OS processes run on separate
+cores, at the price of a slower start and of pickling every message.
+
+The model scores each process function from its source alone:
+
+ * cpu: arithmetic and comparisons, weighted by loop nesting depth.
+ * io: blocking calls (files, sockets, sleeps, printing) and channel
+   reads and writes, weighted the same way.
+
+A process is CPU-bound if its cpu score is large enough and dwarfs its
+io score. A network with at least as many CPU-bound processes as other
+processes is run on OS processes, anything else stays on threads.
+
+Each OS process works on its own copy of the program's state, so a
+network whose processes share state stays on threads whatever their
+cost: a process shares state if it declares a global, assigns to an
+attribute, or holds a lock which guards more than channels.
+
+The choice can be overridden by a comment at the start of a line:
+
+    # csp-backend: process
+
+where the backend is one of thread, process or auto.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import re
+
+from translator import dotted_name
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+BACKENDS = ('thread', 'process')
+
+BACKEND_RE = re.compile(r'^[ \t]*#[ \t]*csp-backend:[ \t]*(thread|process|auto)\b',
+                        re.MULTILINE)
+ANNOTATION_LINE_RE = re.compile(r'^[ \t]*#[ \t]*csp-backend:.*(\n|$)',
+                                re.MULTILINE)
+
+LOOP_WEIGHT = 4 # Assumed iterations per level of loop nesting.
+MAX_DEPTH = 3
+CPU_THRESHOLD = 8 # Minimum cpu score of a CPU-bound process.
+CPU_RATIO = 4 # A CPU-bound process does this much more cpu than io.
+
+CPU_NODES = (ast.BinOp, ast.AugAssign, ast.UnaryOp, ast.Compare,
+             ast.Subscript)
+LOOP_NODES = (ast.For, ast.While, ast.ListComp, ast.GeneratorExp,
+              ast.SetComp, ast.DictComp)
+CPU_CALLS = ('abs', 'divmod', 'pow', 'sum', 'min', 'max', 'sorted')
+CPU_MODULES = ('math', 'cmath', 'hashlib', 'zlib', 'random', 'operator')
+BLOCKING_CALLS = ('open', 'file', 'input', 'raw_input', 'print',
+                  'time.sleep', 'sleep', 'os.read', 'os.write', 'os.system',
+                  'select.select', 'urllib.urlopen', 'urllib2.urlopen',
+                  'urlopen')
+BLOCKING_MODULES = ('socket', 'subprocess', 'urllib', 'urllib2', 'httplib',
+                    'sys.stdin', 'sys.stdout', 'sys.stderr')
+BLOCKING_METHODS = ('read', 'readline', 'readlines', 'write', 'writelines',
+                    'recv', 'recvfrom', 'send', 'sendall', 'sendto',
+                    'accept', 'connect', 'flush', 'sleep', 'wait',
+                    # Queue and channel communication.
+                    'get', 'put', 'get_nowait', 'put_nowait')
+
+
+def backend_annotation(text):
+    """Return the backend named by a csp-backend comment in text, or None.
+    """
+    match = BACKEND_RE.search(text)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def without_annotations(text):
+    """Return text without its csp-backend comment lines.
+    """
+    return ANNOTATION_LINE_RE.sub('', text)
+
+
+def function_cost(func):
+    """Return (cpu, io) scores for the body of a function definition.
+    """
+    cpu, io = 0, 0
+    todo = [(stmt, 0) for stmt in func.body]
+    while todo:
+        node, depth = todo.pop()
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        weight = LOOP_WEIGHT ** min(depth, MAX_DEPTH)
+        if isinstance(node, CPU_NODES):
+            cpu += weight
+        elif isinstance(node, ast.Print):
+            io += weight
+        elif isinstance(node, ast.Call):
+            name = dotted_name(node.func) or ''
+            module = name.rsplit('.', 1)[0] if '.' in name else ''
+            if name in BLOCKING_CALLS or module in BLOCKING_MODULES:
+                io += weight
+            elif name in CPU_CALLS or module in CPU_MODULES:
+                cpu += weight
+            elif isinstance(node.func, ast.Attribute) and \
+                    node.func.attr in BLOCKING_METHODS:
+                io += weight
+        if isinstance(node, LOOP_NODES):
+            depth += 1
+        todo.extend((child, depth) for child in ast.iter_child_nodes(node))
+    return cpu, io
+
+
+def writes_attribute(target):
+    """Return True if assigning to target changes an attribute, or an
+    item of one, e.g. self.total or self.items[i].
+    """
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return any(writes_attribute(elt) for elt in target.elts)
+    if isinstance(target, ast.Subscript):
+        return writes_attribute(target.value)
+    return isinstance(target, ast.Attribute)
+
+
+def shares_state(func, init=False):
+    """Return True if a function changes state which its caller would
+    see if it ran as a thread, but not as an OS process. init is True
+    for a constructor, which sets up its instance before any process
+    starts.
+    """
+    for node in ast.walk(func):
+        if isinstance(node, ast.Global):
+            return True
+        if init:
+            continue
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AugAssign):
+            targets = [node.target]
+        else:
+            continue
+        if any(writes_attribute(target) for target in targets):
+            return True
+    return False
+
+
+def is_cpu_bound(cost):
+    cpu, io = cost
+    return cpu >= CPU_THRESHOLD and cpu >= CPU_RATIO * io
+
+
+def choose_backend(costs, shared=()):
+    """Choose a backend for a network of processes.
+
+    costs maps the name of each process to its (cpu, io) scores, and
+    shared holds whatever the processes share state through, which
+    keeps them on threads. Return the backend and the sorted names of
+    the CPU-bound processes.
+    """
+    bound = sorted(name for name, cost in costs.items() if is_cpu_bound(cost))
+    if bound and len(bound) * 2 >= len(costs) and not shared:
+        return 'process', bound
+    return 'thread', bound
@@ -19,14 +19,31 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+from collections import deque
+
 from PyQt4 import Qt
 
+import time
+
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
 __credits__ = 'http://diotavelli.net/PyQtWiki/Capturing_Output_from_a_Process'
 __date__ = 'April 2011'
 
 
 class AbstractProcess(Qt.QWidget):
+    """Base class of external programs run by the editor.
+
+    Writes to the STDIN of a program are queued and handed to the
+    process as it reads them, so the event loop never waits on a
+    program which is not reading its input. While more than MAX_QUEUE
+    bytes are waiting, write() refuses more input. write_queue(int, bool)
+    is emitted with the number of lines waiting and whether the program
+    has read nothing for STALL milliseconds, whenever either changes
+    while input is waiting.
+    """
+    CHUNK = 4096 # Most bytes handed to the process at once.
+    MAX_QUEUE = 64 * 1024 # Bytes queued before write() refuses input.
+    STALL = 2000 # ms
 
     def __init__(self, program, args, console=None, line_edit=None, settings=None, history=None, prompt=None):
         Qt.QWidget.__init__(self)
@@ -39,6 +56,13 @@ class AbstractProcess(Qt.QWidget):
         self.prompt = prompt
         self.output = None
         self.errors = None
+        self.spawn_seconds = 0.0 # Time taken to start the last process.
+        self.write_queue = deque()
+        self.queued_bytes = 0
+        self.write_stalled = False
+        self.queue_reported = False
+        self.stall_timer = Qt.QTimer(self)
+        self.stall_timer.setSingleShot(True)
         # Set up external process.
         self.process = Qt.QProcess()
         # External I/O
@@ -46,6 +70,9 @@ class AbstractProcess(Qt.QWidget):
         self.process.setProcessChannelMode(Qt.QProcess.MergedChannels)
         # Signals / slots.
         self.connect(self.process, Qt.SIGNAL("finished(int)"), self.finished)
+        self.connect(self.process, Qt.SIGNAL("finished(int)"), self.discard_input)
+        self.connect(self.process, Qt.SIGNAL("bytesWritten(qint64)"), self.drain)
+        self.connect(self.stall_timer, Qt.SIGNAL('timeout()'), self.stalled)
 #        self.connect(self.process, Qt.SIGNAL("readyReadStderr()"), self.readErrors)
         if self.line_edit is not None:
             self.connect(self.line_edit, Qt.SIGNAL('returnPressed()'), self.input)
@@ -63,8 +90,11 @@ class AbstractProcess(Qt.QWidget):
         self.errors = None
         if args is None:
             args = self.args
+        self.discard_input()
+        started = time.time()
         self.process.start(self.program, args)
         self.process.waitForStarted(-1)
+        self.spawn_seconds = time.time() - started
         return
 
     def is_running(self):
@@ -78,6 +108,7 @@ class AbstractProcess(Qt.QWidget):
         if self.is_running():
             self.process.kill()
             self.process.waitForFinished()
+        self.discard_input()
         return
 
     def finished(self, exit_status):
@@ -101,12 +132,66 @@ class AbstractProcess(Qt.QWidget):
         return
 
     def write(self, data):
-        """Write data to the STDIN of a running process.
+        """Queue a line for the STDIN of a running process.
+        Return False if the process is not running or too much input
+        is already waiting for it.
         """
         if not self.is_running():
-            return
-        self.process.write(str(data) + '\n')
-        self.process.waitForBytesWritten(-1)
+            return False
+        if self.queued_bytes >= AbstractProcess.MAX_QUEUE:
+            self.report_queue()
+            return False
+        line = str(data) + '\n'
+        self.write_queue.append(line)
+        self.queued_bytes += len(line)
+        self.drain()
+        return True
+
+    def drain(self, written=0):
+        """SLOT called when the process has read some of its input.
+        Hand it more of the queue.
+        """
+        if written:
+            self.write_stalled = False
+        while self.write_queue and \
+                self.process.bytesToWrite() < AbstractProcess.CHUNK:
+            line = self.write_queue.popleft()
+            self.queued_bytes -= len(line)
+            self.process.write(line)
+        if self.process.bytesToWrite():
+            if written or not self.stall_timer.isActive():
+                self.stall_timer.start(AbstractProcess.STALL)
+        else:
+            self.stall_timer.stop()
+        self.report_queue()
+        return
+
+    def stalled(self):
+        """SLOT called when the process has not read its input for a while.
+        """
+        self.write_stalled = True
+        self.report_queue()
+        return
+
+    def discard_input(self, exit_status=None):
+        """Forget any input the process has not read.
+        """
+        self.write_queue.clear()
+        self.queued_bytes = 0
+        self.stall_timer.stop()
+        self.write_stalled = False
+        self.report_queue()
+        return
+
+    def report_queue(self):
+        """Emit write_queue(int, bool) if there is input waiting, or if
+        there was at the last report.
+        """
+        waiting = bool(self.write_queue) or self.write_stalled
+        if waiting or self.queue_reported:
+            self.emit(Qt.SIGNAL('write_queue(int, bool)'),
+                      len(self.write_queue), self.write_stalled)
+        self.queue_reported = waiting
         return
 
     def append(self, text=None):
@@ -127,11 +212,12 @@ class AbstractProcess(Qt.QWidget):
         if self.line_edit is None or not self.is_running():
             return
         code = self.line_edit.text()
+        if not self.write(code):
+            return
         if self.prompt:
             self.append(self.prompt + code + '\n')
         else:
             self.append(code + '\n')
-        self.write(code)
         if self.history:
             self.history.insert(code)
         self.line_edit.clear()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+"""
+Page back through the full output of a console, read from its spool.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from collections import OrderedDict
+
+from PyQt4 import Qt
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class SpoolModel(Qt.QAbstractListModel):
+    """List model with one row per line of a spool.
+    Lines are read from disk a page at a time, when the view needs them,
+    and only the most recently used pages are kept.
+    """
+    PAGE = 256 # Lines read at once.
+    PAGES = 16 # Pages kept in memory.
+
+    def __init__(self, spool, parent=None):
+        Qt.QAbstractListModel.__init__(self, parent)
+        self.spool = spool
+        self.count = len(spool)
+        self.generation = spool.generation
+        self.pages = OrderedDict()
+        return
+
+    def rowCount(self, parent=Qt.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.count
+
+    def line(self, row):
+        number = row // SpoolModel.PAGE
+        if number in self.pages:
+            page = self.pages.pop(number)
+        else:
+            page = self.spool.lines(number * SpoolModel.PAGE, SpoolModel.PAGE)
+            if len(self.pages) >= SpoolModel.PAGES:
+                self.pages.popitem(last=False)
+        self.pages[number] = page
+        offset = row % SpoolModel.PAGE
+        if offset < len(page):
+            return page[offset]
+        return ''
+
+    def data(self, index, role=Qt.Qt.DisplayRole):
+        if not index.isValid() or role != Qt.Qt.DisplayRole:
+            return Qt.QVariant()
+        return Qt.QVariant(self.line(index.row()).decode('utf-8', 'replace'))
+
+    def refresh(self):
+        """SLOT called to pick up lines written since the last refresh.
+        """
+        count = len(self.spool)
+        if self.generation != self.spool.generation:
+            # The spool was cleared for a new run.
+            self.beginResetModel()
+            self.count = count
+            self.generation = self.spool.generation
+            self.pages.clear()
+            self.endResetModel()
+            return
+        # The last line may have been unfinished when it was read.
+        if self.count:
+            self.pages.pop((self.count - 1) // SpoolModel.PAGE, None)
+            last = self.index(self.count - 1)
+            self.emit(Qt.SIGNAL('dataChanged(QModelIndex, QModelIndex)'),
+                      last, last)
+        if count > self.count:
+            self.beginInsertRows(Qt.QModelIndex(), self.count, count - 1)
+            self.count = count
+            self.endInsertRows()
+        return
+
+
+class ConsoleHistoryDialog(Qt.QDialog):
+    """Scrollable view of everything written to a console.
+    """
+    REFRESH = 1000 # ms
+
+    def __init__(self, parent, spool, title):
+        Qt.QDialog.__init__(self, parent)
+        self.setWindowTitle(title)
+        self.model = SpoolModel(spool, self)
+        layout = Qt.QVBoxLayout(self)
+        self.view = Qt.QListView(self)
+        self.view.setUniformItemSizes(True)
+        self.view.setFont(Qt.QFont('Monospace'))
+        self.view.setModel(self.model)
+        layout.addWidget(self.view)
+        self.follow = Qt.QCheckBox('&Follow new output', self)
+        self.follow.setChecked(True)
+        buttons = Qt.QDialogButtonBox(Qt.QDialogButtonBox.Close, Qt.Qt.Horizontal,
+                                      self)
+        buttons.addButton(self.follow, Qt.QDialogButtonBox.ActionRole)
+        layout.addWidget(buttons)
+        self.connect(buttons, Qt.SIGNAL('rejected()'), self.reject)
+        self.timer = Qt.QTimer(self)
+        self.connect(self.timer, Qt.SIGNAL('timeout()'), self.refresh)
+        self.timer.start(ConsoleHistoryDialog.REFRESH)
+        self.resize(700, 500)
+        self.view.scrollToBottom()
+        return
+
+    def refresh(self):
+        self.model.refresh()
+        if self.follow.isChecked():
+            self.view.scrollToBottom()
+        return
+
+    def done(self, result):
+        self.timer.stop()
+        Qt.QDialog.done(self, result)
+        return
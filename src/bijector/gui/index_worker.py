@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""
+Index the processes and channels of directories off the GUI thread.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import Qt
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class IndexWorker(Qt.QThread):
+    """Background thread which brings a ChannelIndex up to date with the
+    modules in some directories, but not their subdirectories.
+
+    Emits indexed(PyQt_PyObject) with the list of directories when it is
+    done. The index must not be used on any other thread while the
+    worker is running.
+    """
+
+    def __init__(self, index):
+        Qt.QThread.__init__(self)
+        self.index = index
+        self.directories = []
+        return
+
+    def update(self, directories):
+        """Start indexing directories. Must not be called again until
+        indexed() has been emitted.
+        """
+        # The thread may still be returning from the last run().
+        self.wait()
+        self.directories = sorted(directories)
+        self.start()
+        return
+
+    def run(self):
+        for directory in self.directories:
+            self.index.update_directory(directory)
+        self.emit(Qt.SIGNAL('indexed(PyQt_PyObject)'), self.directories)
+        return
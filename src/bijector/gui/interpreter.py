@@ -22,20 +22,220 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from PyQt4 import Qt
 
 from abstractprocess import AbstractProcess
+from spool import Spool
+
+import json
+import os
 
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
 __credits__ = 'http://diotavelli.net/PyQtWiki/Capturing_Output_from_a_Process'
 __date__ = 'April 2011'
 
 # pylint: disable=W0511
+
+WARM_START = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'warmstart.py')
+
+# Imported by warm interpreters before they are needed.
+PRELOAD = ['csp.csp', 'threading', 'multiprocessing', 'random', 'time']
     
 
 class Interpreter(AbstractProcess):
+    """Run a program and show its output in a console.
+
+    Output is buffered as it arrives and written to the console at most
+    once every FLUSH_INTERVAL milliseconds, in one insert with updates
+    to the console suspended, so that a program printing in a tight
+    loop cannot swamp the event loop. results() is emitted after each
+    write to the console.
+
+    Everything written to the console is also copied to a spool file,
+    so that the console itself can keep only its most recent lines.
+    The spool is cleared when the program is started again.
+    """
+    FLUSH_INTERVAL = 50 # ms
+    MAX_FLUSH = 1 << 20 # Most bytes written to the console at once.
 
     def __init__(self, interpreter, args, console, line_edit=None, prompt=None, settings=None, history=None): 
         AbstractProcess.__init__(self, interpreter, args, console, line_edit=line_edit, prompt=prompt, settings=settings, history=history)
+        self.pending = []
+        self.pending_size = 0
+        self.spool = Spool(prefix='bijector-console-')
+        self.flush_timer = Qt.QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.connect(self.flush_timer, Qt.SIGNAL('timeout()'), self.flush)
         self.connect(self.process, Qt.SIGNAL("readyReadStandardOutput()"), self.readOutput)
-        self.connect(self, Qt.SIGNAL('results()'), self.append)
+        return
+
+    def start(self, args=None):
+        self.reset_output()
+        AbstractProcess.start(self, args)
+        return
+
+    def reset_output(self):
+        """Forget output from the last program, before running another.
+        """
+        self.pending = []
+        self.pending_size = 0
+        self.flush_timer.stop()
+        self.spool.clear()
+        return
+
+    def finished(self, exit_status):
+        """SLOT called when the program exits. Show all of its output.
+        """
+        self.readOutput()
+        while self.pending:
+            self.flush()
+        return
+
+    def readOutput(self):
+        """SLOT called when output is ready. Buffer it until the next flush.
+        """
+        data = str(self.process.readAllStandardOutput())
+        if not data:
+            return
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(Interpreter.FLUSH_INTERVAL)
+        return
+
+    def take_pending(self):
+        """Remove and return up to MAX_FLUSH bytes of buffered output,
+        ending at a newline where possible.
+        """
+        data = ''.join(self.pending)
+        if len(data) > Interpreter.MAX_FLUSH:
+            end = data.rfind('\n', 0, Interpreter.MAX_FLUSH) + 1
+            if end <= 0:
+                end = Interpreter.MAX_FLUSH
+            self.pending = [data[end:]]
+            self.pending_size = len(data) - end
+            return data[:end]
+        self.pending = []
+        self.pending_size = 0
+        return data
+
+    def flush(self):
+        """SLOT called to write buffered output to the console.
+        """
+        if not self.pending:
+            return
+        self.insert(self.take_pending())
+        if self.pending:
+            self.flush_timer.start(Interpreter.FLUSH_INTERVAL)
+        self.emit(Qt.SIGNAL("results()"))
+        return
+
+    def insert(self, text):
+        """Insert text at the end of the console, in one edit.
+        The console follows the new text only if it was already
+        scrolled to the bottom.
+        """
+        scrollbar = self.console.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        self.console.setUpdatesEnabled(False)
+        cursor = Qt.QTextCursor(self.console.document())
+        cursor.movePosition(Qt.QTextCursor.End)
+        cursor.insertText(text)
+        self.console.setUpdatesEnabled(True)
+        self.spool.write(text)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+        return
+
+    def append(self, text=None):
+        """Append text to the visible console, after any buffered output.
+        """
+        while self.pending:
+            self.flush()
+        self.flush_timer.stop()
+        AbstractProcess.append(self, text)
+        if text is not None:
+            self.spool.write(unicode(text).encode('utf-8'))
+        return
+
+    def close_spool(self):
+        """Remove the spool file. Called before exiting the application.
+        """
+        self.spool.close()
+        return
+
+
+class ScriptRunner(Interpreter):
+    """Run scripts in a console, in an interpreter started ahead of time.
+
+    While no script is running, a spare interpreter runs warmstart.py,
+    which imports PRELOAD and then waits for the name of a script to
+    run. start() hands it the script, so a run does not wait for Python
+    to start or for python-csp to be imported. When the script exits
+    run_finished(int) is emitted with its exit status, and another
+    spare interpreter is started.
+    """
+
+    def __init__(self, interpreter, args, console, line_edit=None, prompt=None, settings=None, history=None, preload=None):
+        Interpreter.__init__(self, interpreter, args, console, line_edit=line_edit, prompt=prompt, settings=settings, history=history)
+        self.preload = PRELOAD if preload is None else preload
+        self.warm = False # True while the process waits for a script.
+        self.keep_warm = True
+        return
+
+    def warm_up(self):
+        """Start a spare interpreter, unless one is already running.
+        """
+        if not self.keep_warm or \
+                self.process.state() != Qt.QProcess.NotRunning:
+            return
+        self.warm = True
+        AbstractProcess.start(self, self.args + [WARM_START] + self.preload)
+        return
+
+    def is_running(self):
+        return AbstractProcess.is_running(self) and not self.warm
+
+    def start(self, args=None):
+        """Run a script, given as a list of the script and its arguments.
+        """
+        if args is None:
+            args = self.args
+        if self.is_running():
+            self.terminate()
+        self.reset_output()
+        self.warm_up()
+        self.warm = False
+        self.discard_input()
+        self.process.write(json.dumps([unicode(arg) for arg in args]) + '\n')
+        return
+
+    def readOutput(self):
+        if self.warm:
+            # Nothing should be printed while warming up, but any output
+            # belongs to no run.
+            self.process.readAllStandardOutput()
+            return
+        Interpreter.readOutput(self)
+        return
+
+    def finished(self, exit_status):
+        if self.warm:
+            # The spare interpreter died, e.g. the Python path is wrong.
+            # Try again at the next run.
+            self.warm = False
+            self.process.readAllStandardOutput()
+            return
+        Interpreter.finished(self, exit_status)
+        self.emit(Qt.SIGNAL('run_finished(int)'), exit_status)
+        Qt.QTimer.singleShot(0, self.warm_up)
+        return
+
+    def shutdown(self):
+        """Stop any running script and the spare interpreter.
+        Called before exiting the application.
+        """
+        self.keep_warm = False
+        self.warm = False
+        self.terminate()
         return
 
 
@@ -24,23 +24,140 @@ from abstractprocess import AbstractProcess
 
 from PyQt4 import Qt
 
+from cache import digest
+from lintdiff import Ranges, carry_over, definitions, map_lines, plan, \
+    stub_source
+from lintparse import LintMessage, get_parser
+from lintserver import DONE, find_program, script_interpreter
+
+import json
 import os
-import re
+import shutil
+import tempfile
+import time
 
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
 __credits__ = 'http://diotavelli.net/PyQtWiki/Capturing_Output_from_a_Process'
 __date__ = 'April 2011'
 
 
+def program_stamp(program):
+    """Return a string which changes when an executable is replaced,
+    e.g. by upgrading it.
+    """
+    paths = [program]
+    if not os.path.dirname(program):
+        paths = [os.path.join(path, program)
+                 for path in os.environ.get('PATH', '').split(os.pathsep)]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        return '%s:%d:%d' % (os.path.realpath(path), stat.st_mtime, stat.st_size)
+    return program
+
+
+def lint_environment(path):
+    """Return the environment for a linter, as a list of NAME=VALUE
+    strings, with directory path searched for modules first if given.
+    """
+    environment = [str(var) for var in Qt.QProcess.systemEnvironment()]
+    if path is None:
+        return environment
+    dirs = [path]
+    if os.environ.get('PYTHONPATH'):
+        dirs.append(os.environ['PYTHONPATH'])
+    return [var for var in environment if not var.startswith('PYTHONPATH=')] \
+        + ['PYTHONPATH=' + os.pathsep.join(dirs)]
+
+
+def ram_temp_dir():
+    """Return a RAM-backed directory for temporary files if there is
+    one, or None for the default temporary directory.
+    """
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK | os.X_OK):
+        return '/dev/shm'
+    return None
+
+
+# Phases of a lint run which are timed, see Lint.timed().
+LINT_PHASES = ('queue', 'spawn', 'linter', 'read', 'parse', 'annotate',
+               'total')
+
+LINT_SERVER = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'lintserver.py')
+
+
+def server_command(python, program):
+    """Return the interpreter and arguments which start a lint server
+    for program. A linter is run by the interpreter in its #! line, if
+    it has one, since the linter may not be installed for python.
+    """
+    interpreter = script_interpreter(find_program(program)) or [python]
+    return interpreter[0], interpreter[1:] + ['-u', LINT_SERVER, program]
+
+
 class Lint(AbstractProcess): #, LintStyleMixin):
+    CACHE_VERSION = 2
+    MAX_RESTARTS = 1 # Times a request is retried if the lint server dies.
 
-    def __init__(self, lint, args, editor, results_iter, message):
+    def __init__(self, lint, args, editor, parser, message, cache=None,
+                 server=None, incremental=False, timings=None):
         AbstractProcess.__init__(self, lint, args, editor)
         # self.lint = lint
         # self.args = args
         # self.editor = editor
-        self.results_iter = results_iter
+        # Output is read by a parser registered in lintparse, by name.
+        self.parser_class = get_parser(parser)
+        self.parser = None
+        self.rejected = [] # Lines of output the parser could not read.
         self.message = message # Must be callable.
+        # Line number -> [(message, style)] from the last run.
+        self.annotations = {}
+        # Line number -> (text, style) currently shown in the editor, and
+        # lines whose messages have changed since they were shown.
+        self.shown = {}
+        self.dirty = set()
+        # Output after the last newline, waiting for the rest of its line.
+        self.partial = ''
+        # Parsed results are cached by file content, see lint_file().
+        self.cache = cache
+        self.cache_key = None
+        self.messages = []
+        # If server is the path of a Python interpreter, lint runs inside
+        # a long-lived lintserver process started with it, so that the
+        # linter's imports are paid for once rather than on every run.
+        self.server = server
+        self.request = None # (id, args) of the request in progress.
+        self.request_id = 0
+        self.stale = 0 # Superseded requests whose output is still due.
+        self.restarts = 0
+        # Set when the buffer has changed since this run was requested, so
+        # that its results no longer fit the text. See LintScheduler.
+        self.discard = False
+        self.cancelling = False
+        # Text to send to the linter on stdin, instead of it reading a file.
+        self.stdin = None
+        # Directory to import modules from first, when the linter reads
+        # a copy of a module kept somewhere else.
+        self.path = None
+        # If incremental is True, only the top-level definitions which
+        # changed since the last run are linted, see lintdiff.
+        self.incremental = incremental
+        self.linted = None # (content, definitions, messages) of the last run.
+        self.run_content = None
+        self.run_defs = None
+        self.kept = [] # Messages carried over from the last run.
+        self.carried = None # Ranges of lines the kept messages cover.
+        self.snapshot_dir = None
+        self.shown_lines = None # Text the shown annotations belong to.
+        # Phase -> seconds for the run in progress, recorded in timings,
+        # a timings.Timings, when the run is over.
+        self.timings = timings
+        self.run_times = {}
+        self.run_started = None
+        self.linter_started = None
         # Set up styling for annotations.        
         self.console.setAnnotationDisplay(2)
         self.font = Qt.QFont('Courier', 9, Qt.QFont.Normal, True)
@@ -56,11 +173,359 @@ class Lint(AbstractProcess): #, LintStyleMixin):
         self.severities = {'I':self.info, 'C':self.info, 
                            'W':self.warning, 'R':self.warning,
                            'E':self.error, 'F':self.error}
+        self.ranks = {self.info:0, self.warning:1, self.error:2}
         self.connect(self, Qt.SIGNAL('results()'), self.apply_results)
+        # Annotate as soon as each message arrives, not when lint exits.
+        self.connect(self.process, Qt.SIGNAL('readyReadStandardOutput()'),
+                     self.read_lines)
+        return
+
+    def start(self, args=None):
+        if args is None:
+            args = self.args
+        self.annotations = {}
+        self.dirty = set()
+        self.messages = []
+        self.parser = self.parser_class()
+        self.rejected = []
+        self.replay(self.kept)
+        self.spawn_seconds = 0.0
+        if self.server is None:
+            self.partial = ''
+            self.process.setEnvironment(lint_environment(self.path))
+            AbstractProcess.start(self, args)
+            self.timed('spawn', self.spawn_seconds)
+            self.linter_started = time.time()
+            if self.stdin is not None:
+                self.process.write(self.stdin)
+                self.process.closeWriteChannel()
+            return
+        if not self.is_running():
+            self.partial = ''
+            self.stale = 0
+            started = time.time()
+            self.process.start(*server_command(self.server, self.program))
+            self.process.waitForStarted(-1)
+            self.timed('spawn', time.time() - started)
+        elif self.request is not None:
+            self.stale += 1
+        self.request_id += 1
+        self.request = (self.request_id, args)
+        request = {'id': self.request_id, 'args': [str(arg) for arg in args]}
+        if self.stdin is not None:
+            request['stdin'] = self.stdin
+        if self.path is not None:
+            request['path'] = [self.path]
+        self.linter_started = time.time()
+        self.process.write(json.dumps(request) + '\n')
+        return
+
+    def timed(self, phase, seconds):
+        """Add time spent in a phase of the run in progress.
+        """
+        self.run_times[phase] = self.run_times.get(phase, 0.0) + seconds
+        return
+
+    def record_times(self):
+        """Record the times of the run which has just finished.
+        """
+        if self.run_started is not None:
+            self.timed('total', time.time() - self.run_started)
+        if self.timings is not None:
+            for phase, seconds in self.run_times.items():
+                self.timings.record(phase, seconds)
+        self.run_times = {}
+        self.run_started = None
+        return
+
+    def terminate(self):
+        self.request = None # Do not restart the server.
+        AbstractProcess.terminate(self)
+        if self.snapshot_dir is not None:
+            shutil.rmtree(self.snapshot_dir, True)
+        return
+
+    def finished(self, exit_status):
+        """SLOT called when the lint process exits.
+        A lint server exits when it recycles itself or crashes; in the
+        latter case the request in progress is sent to a new server.
+        """
+        if self.server is None:
+            if not self.cancelling:
+                self.readOutput()
+            return
+        self.parse_output(str(self.process.readAllStandardOutput()))
+        self.stale = 0
+        if self.request is None:
+            return
+        args = self.request[1]
+        self.request = None
+        if self.restarts < Lint.MAX_RESTARTS:
+            self.restarts += 1
+            self.start(args)
+            return
+        self.restarts = 0
+        self.cache_key = None
+        self.parser = None
+        self.message('%s lint server stopped unexpectedly.' %
+                     os.path.basename(self.program))
+        self.emit(Qt.SIGNAL("results()"))
+        return
+
+    def cancel(self):
+        """Abandon the run in progress, whose results will not be shown.
+        Return True if it has stopped, or False if it is left to finish
+        in a lint server, which would otherwise have to be restarted.
+        """
+        self.discard = True
+        if self.server is not None:
+            return self.request is None
+        if self.is_running():
+            self.cancelling = True
+            self.process.kill()
+            self.process.waitForFinished()
+            self.process.readAllStandardOutput()
+            self.cancelling = False
+        self.cache_key = None
+        return True
+
+    def lint_file(self, filename, args, stdin=None, path=None):
+        """Lint a file, reusing the results of an earlier run over the
+        same content with the same linter and arguments if possible.
+        If stdin is given, it is the content, and is sent to the linter
+        on its standard input. If filename is a copy of a module, path
+        is the directory of the module, where its neighbours are.
+        """
+        self.run_times = {}
+        self.run_started = time.time()
+        self.linter_started = None
+        self.discard = False
+        self.cache_key = None
+        self.stdin = stdin
+        self.path = path
+        self.kept = []
+        self.carried = None
+        content = stdin
+        try:
+            if content is None:
+                with open(filename, 'rb') as f:
+                    content = f.read()
+        except IOError:
+            content = None
+        self.run_content, self.run_defs = content, None
+        if content is None:
+            self.start(args)
+            return
+        self.follow_edits(content)
+        if self.cache is not None:
+            self.cache_key = digest(Lint.CACHE_VERSION,
+                                    program_stamp(self.program),
+                                    [str(arg) for arg in args], content)
+            cached = self.cache.get(self.cache_key)
+            if cached is not None:
+                self.finish_without_lint(json.loads(cached))
+                return
+        if self.incremental and self.linted is not None:
+            old, messages = self.linted[1], self.linted[2]
+            if old is None:
+                old = definitions(self.linted[0])
+            self.run_defs = definitions(content)
+            changes = plan(old, self.run_defs)
+            if changes is not None and changes[0]:
+                unchanged, changed = changes
+                if not changed:
+                    # Same text, so the same messages.
+                    self.finish_without_lint(messages)
+                    return
+                self.kept = carry_over(messages, unchanged)
+                args = self.stub_args(filename, args, stub_source(
+                    content, [new for _, new in unchanged]))
+                if args is None:
+                    self.kept = []
+                else:
+                    self.carried = Ranges((new.start, new.end)
+                                          for _, new in unchanged)
+        self.start(args)
+        return
+
+    def stub_args(self, filename, args, text):
+        """Arrange for the linter to read text in place of filename.
+        Return the arguments to lint it with, or None on failure.
+        """
+        if self.stdin is not None:
+            self.stdin = text
+            return args
+        try:
+            if self.snapshot_dir is None:
+                self.snapshot_dir = tempfile.mkdtemp(prefix='bijector-lint-',
+                                                     dir=ram_temp_dir())
+            # Keep the file name, as lint messages may depend on it.
+            path = os.path.join(self.snapshot_dir, os.path.basename(filename))
+            with open(path, 'w') as f:
+                f.write(text)
+        except (IOError, OSError):
+            return None
+        if self.path is None:
+            self.path = os.path.dirname(os.path.abspath(filename))
+        return [path if str(arg) == filename else arg for arg in args]
+
+    def finish_without_lint(self, messages):
+        """Show results from the cache, or carried over from the last
+        run, as if lint had been run.
+        """
+        self.annotations = {}
+        self.dirty = set()
+        self.messages = []
+        self.rejected = []
+        self.replay(messages)
+        self.remember()
+        self.emit(Qt.SIGNAL("results()"))
+        return
+
+    def replay(self, messages):
+        """Record (linenum, message, severity) tuples as lint messages.
+        """
+        carried, self.carried = self.carried, None
+        for linenum, message, severity in messages:
+            self.lint_error(LintMessage(linenum, message, severity))
+        self.carried = carried
+        return
+
+    def remember(self):
+        """Keep the results of a run, for the next incremental run.
+        """
+        if self.incremental and self.run_content is not None:
+            self.linted = (self.run_content, self.run_defs,
+                           [(msg.linenum, msg.message, msg.severity)
+                            for msg in self.messages])
+        return
+
+    def follow_edits(self, content):
+        """Move the record of the annotations shown to follow the edits
+        made since they were shown. QScintilla moves the annotations
+        themselves; those in changed lines are cleared.
+        """
+        new_lines = content.split('\n')
+        if self.shown and self.shown_lines is not None and \
+                self.shown_lines != new_lines:
+            moved, changed = map_lines(self.shown_lines, new_lines,
+                                       self.shown.keys())
+            self.shown = dict((moved[linenum], shown)
+                              for linenum, shown in self.shown.items()
+                              if linenum in moved)
+            for first, last in changed:
+                for linenum in xrange(first, last + 1):
+                    if linenum not in self.shown:
+                        self.console.clearAnnotations(linenum)
+        self.shown_lines = new_lines
+        return
+
+    def read_lines(self):
+        """SLOT called when lint has written more output.
+        """
+        started = time.time()
+        data = str(self.process.readAllStandardOutput())
+        self.timed('read', time.time() - started)
+        self.parse_output(data)
+        return
+
+    def readOutput(self):
+        """Read the last of the output once the lint process has exited.
+        """
+        started = time.time()
+        data = str(self.process.readAllStandardOutput())
+        self.timed('read', time.time() - started)
+        self.parse_output(data, True)
+        self.end_output()
+        if self.process.exitStatus() == Qt.QProcess.NormalExit:
+            self.store_results()
+        self.cache_key = None
+        self.emit(Qt.SIGNAL("results()"))
+        return
+
+    def request_done(self):
+        """Called when the lint server has finished the current request.
+        """
+        self.request = None
+        self.restarts = 0
+        self.store_results()
+        self.emit(Qt.SIGNAL("results()"))
+        return
+
+    def store_results(self):
+        self.remember()
+        # Runs with unreadable output are not cached, so that they are
+        # reported again.
+        if self.cache_key is not None and not self.rejected:
+            self.cache.put(self.cache_key, json.dumps(
+                [(msg.linenum, msg.message, msg.severity)
+                 for msg in self.messages]))
+        self.cache_key = None
+        return
+
+    def parse_output(self, data, final=False):
+        """Annotate the editor with every complete line of output.
+        An incomplete last line is kept until the rest of it arrives, or
+        until the process exits.
+        """
+        lines = (self.partial + data).split('\n')
+        self.partial = '' if final else lines.pop()
+        if self.server is None:
+            self.annotate_lines(lines)
+            return
+        # Output from a lint server ends with a DONE line per request.
+        batch = []
+        for line in lines:
+            if not line.startswith(DONE):
+                if self.request is not None and not self.stale:
+                    batch.append(line)
+                continue
+            self.annotate_lines(batch)
+            batch = []
+            ident = line.split()[1]
+            if self.request is not None and ident == str(self.request[0]):
+                self.end_output()
+                self.request_done()
+            elif self.stale:
+                self.stale -= 1
+        self.annotate_lines(batch)
+        return
+
+    def annotate_lines(self, lines):
+        if lines and self.parser is not None:
+            started = time.time()
+            messages = self.parser.feed(lines)
+            parsed = time.time()
+            for message in messages:
+                self.lint_error(message)
+            self.update_annotations()
+            self.timed('parse', parsed - started)
+            self.timed('annotate', time.time() - parsed)
+        return
+
+    def end_output(self):
+        """Called at the end of the output of a run.
+        """
+        if self.parser is None:
+            return
+        if self.linter_started is not None:
+            self.timed('linter', time.time() - self.linter_started)
+            self.linter_started = None
+        started = time.time()
+        messages = self.parser.close()
+        parsed = time.time()
+        for message in messages:
+            self.lint_error(message)
+        self.update_annotations()
+        self.timed('parse', parsed - started)
+        self.timed('annotate', time.time() - parsed)
+        self.rejected = self.parser.rejected
+        self.parser = None
         return
 
     def lint_error(self, msg):
-        """Annotate an editor with a single LintMessage object.
+        """Record a single LintMessage object, to be shown by the next
+        call to update_annotations().
         """
         if msg is None:
             return
@@ -68,121 +533,167 @@ class Lint(AbstractProcess): #, LintStyleMixin):
             hilite = self.severities[msg.severity]
         else:
             hilite = self.severities['W']
-        if self.console:
-            self.console.annotate(int(msg.linenum) - 1, msg.message, hilite)
+        linenum = int(msg.linenum) - 1
+        if self.carried is not None and self.carried.find(linenum + 1) >= 0:
+            return # Linted as a stub, see lint_file().
+        self.messages.append(msg)
+        if self.discard:
+            return # Kept for the cache, which is keyed by file content.
+        self.annotations.setdefault(linenum, []).append((msg.message, hilite))
+        self.dirty.add(linenum)
+        return
+
+    def update_annotations(self, final=False):
+        """Show the messages recorded since the last update, one
+        annotation per line in the style of its most severe message.
+        Only lines whose annotation has changed are touched, in one batch
+        without repainting in between. If final is True, the run is over
+        and annotations left over from earlier runs are cleared.
+        """
+        changes = []
+        for linenum in self.dirty:
+            messages = self.annotations[linenum]
+            style = max((hilite for _, hilite in messages), key=self.ranks.get)
+            shown = ('\n'.join(text for text, _ in messages), style)
+            if self.shown.get(linenum) != shown:
+                changes.append((linenum, shown))
+        self.dirty = set()
+        if final:
+            old = [linenum for linenum in self.shown
+                   if linenum not in self.annotations]
         else:
-            self.get_editor().annotate(int(msg.linenum) - 1, msg.message, hilite)
+            old = []
+        if not changes and not old:
+            return
+        self.console.setUpdatesEnabled(False)
+        try:
+            for linenum in old:
+                self.console.clearAnnotations(linenum)
+                del self.shown[linenum]
+            for linenum, shown in changes:
+                self.console.annotate(linenum, shown[0], shown[1])
+                self.shown[linenum] = shown
+        finally:
+            self.console.setUpdatesEnabled(True)
+        return
+
+    def forget_annotations(self):
+        """Called when the text of the editor has been replaced, which
+        removes all of its annotations.
+        """
+        self.annotations = {}
+        self.shown = {}
+        self.dirty = set()
+        self.shown_lines = None
         return
 
     def clear_all_lint_errors(self):
         """Remove all annotations from the editor.
         """
         self.console.clearAnnotations(-1)
+        self.forget_annotations()
         return
 
     def clear_lint_error(self, linenum):
         """Remove an annotation from a given line in the editor.
         """
         self.console.clearAnnotations(linenum - 1)
+        self.shown.pop(linenum - 1, None)
         return
 
     def apply_results(self):
+        """SLOT called when the lint process has exited.
+        Messages have already been annotated as they arrived.
+        """
+        if self.discard:
+            self.record_times()
+            return
+        started = time.time()
+        self.update_annotations(True)
+        self.timed('annotate', time.time() - started)
+        self.record_times()
         name = os.path.basename(self.program)
-        for message in self.results_iter(str(self.output)):
-            self.lint_error(message)
+        if self.rejected:
+            self.message('Could not read %d lines of %s output, e.g. %s' %
+                         (len(self.rejected), name, self.rejected[0]))
+        elif self.annotations:
             self.message('Code annotated with %s output.' % name)
+        self.emit(Qt.SIGNAL('annotated()'))
         return
     
 
-class LintMessage(object):
-    """An individual report from a lint process.
-    """
-
-    def __init__(self, linenum, message, severity):
-        self.linenum = linenum
-        self.message = message
-        self.severity = severity
-        return
+class LintScheduler(Qt.QObject):
+    """Run a Lint for one editor, with at most one run in flight and
+    one pending.
 
-    def __str__(self):
-        return ':'.join([self.severity, str(self.linenum), self.message])
-
-
-class LintOutputIterator(object):
-    """Iterate over all messages from a lint process.
+    Each run is tagged with the revision of the editor's buffer when it
+    was requested. The revision changes with every edit, and results for
+    a revision which is no longer current are discarded rather than
+    painted. A request made while lint is running supersedes both the
+    run in flight, which is cancelled, and any request still pending.
     """
 
-    def __init__(self, lint_output):
-        self.results = []
-        self.lint_output = lint_output.split('\n')
-        self.index = 0
+    IDLE = 750 # ms without an edit before idle() is emitted.
+
+    def __init__(self, lint):
+        Qt.QObject.__init__(self)
+        self.lint = lint
+        self.revision = 0
+        self.running = None # Revision being linted.
+        # (filename, args, stdin, path, revision, time) to lint next.
+        self.pending = None
+        # The idle() signal asks for the unsaved text to be linted.
+        self.idle_timer = Qt.QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.connect(self.idle_timer, Qt.SIGNAL('timeout()'),
+                     self, Qt.SIGNAL('idle()'))
+        self.connect(lint.console, Qt.SIGNAL('textChanged()'),
+                     self.buffer_changed)
+        # Connected after Lint.apply_results, so runs after it.
+        self.connect(lint, Qt.SIGNAL('results()'), self.run_done)
         return
 
-
-class CSPLintIterator(LintOutputIterator):
-    """Iterate over output from csplint.
-    """
-
-    def __init__(self, lint_output):
-        LintOutputIterator.__init__(self, lint_output)
-        re1 = '.*?\['	
-        re2 = '(\S*\\.py)'
-        re3 = '.*?'	
-        re4 = '(\d+)'	
-        re5 = '\].*?'	
-        re6 = '(\w\d\d\d)'
-        re7 = '.*?'	
-        re8 = '(:)'
-        re9 = '(.*)$'
-        self.pattern = re.compile(re1+re2+re3+re4+re5+re6+re7+re8+re9,
-                                  re.IGNORECASE|re.DOTALL)
-        return
-
-    def __iter__(self):
-        return self
-
-    def next(self):
-        if self.index >= len(self.lint_output):
-            raise StopIteration
-        
-        result = self.lint_output[self.index].strip()
-        res = re.match(self.pattern, result)
-        self.index += 1
-
-        if not result:
-            return None
-        try:
-            return LintMessage(res.group(2), res.group(5), res.group(3)[0])
-        except Exception, e:
-            return None
-
-
-class PyLintIterator(LintOutputIterator):
-    """Iterate over output from pylint.
-    """
-
-    def __init__(self, lint_output):
-        LintOutputIterator.__init__(self, lint_output)
-        self.pattern = re.compile('^(\w)(\d\d\d\d)(:)\s*(...)(:)\s*(.*)$',
-                                  re.IGNORECASE|re.DOTALL)
+    def buffer_changed(self):
+        """SLOT called when the text in the editor changes.
+        """
+        self.revision += 1
+        if self.running is not None:
+            self.lint.discard = True
+        self.idle_timer.start(LintScheduler.IDLE)
         return
 
-    def __iter__(self):
-        return self
-
-    def next(self):
-        if self.index >= len(self.lint_output):
-            raise StopIteration
-        
-        result = self.lint_output[self.index].strip()
-        res = re.match(self.pattern, result)
-        self.index += 1
-
-        if not result:
-            return None
-        try:
-            return LintMessage(res.group(4), res.group(6), res.group(1))
-        except Exception, e:
-            return None
+    def submit(self, filename, args, stdin=None, path=None):
+        """Lint filename, which holds the current contents of the editor,
+        or lint stdin, the current contents, given to the linter as stdin.
+        path is the directory of the module in the editor, if filename
+        is a copy of it kept elsewhere.
+        """
+        self.idle_timer.stop()
+        self.pending = (filename, args, stdin, path, self.revision,
+                        time.time())
+        if self.running is not None and not self.lint.cancel():
+            return # Started when the lint server has finished.
+        self.running = None
+        self.run_pending()
+        return
 
+    def run_done(self):
+        """SLOT called when a lint run has finished, or been answered
+        from the cache.
+        """
+        self.running = None
+        self.run_pending()
+        return
 
+    def run_pending(self):
+        if self.running is not None or self.pending is None:
+            return
+        filename, args, stdin, path, revision, submitted = self.pending
+        self.pending = None
+        if revision != self.revision:
+            return # Edited since it was requested.
+        self.running = revision
+        if self.lint.timings is not None:
+            self.lint.timings.record('queue', time.time() - submitted)
+        self.lint.lint_file(filename, args, stdin, path)
+        return
@@ -10,6 +10,7 @@ Current features:
  * Code autocompletion (Ctrl+Space).
  * Increase / decrease font size.
  * Automatic annotations for lint reports.
+ * Breakpoints, lint annotations and scrolling mirrored between panes.
  * Interactive Python interpreter.
  * Settings saved between sessions.
 
@@ -35,15 +36,32 @@ from PyQt4 import uic
 Ui_MainWindow, base_class = uic.loadUiType('bijector_main.ui')
 
 from basics import uniq 
+from cache import DiskCache, user_cache_dir
+from channelgraph import ChannelIndex, user_index_path
+from convert import detect
 from find_replace import FindReplaceDialog
 from history import HistoryEventFilter
-from interpreter import Interpreter, PdbDebugger
-from lint import Lint, PyLintIterator, CSPLintIterator
-from settings import SettingsManager, SettingsDialog
+from index_worker import IndexWorker
+from console_history import ConsoleHistoryDialog
+from interpreter import Interpreter, PdbDebugger, ScriptRunner
+from lint import LINT_PHASES, Lint, LintScheduler, ram_temp_dir
+from performance import PerformanceDialog
+from profile_view import PROFILE_RUN, HotspotDock, show_hot_lines
+from profilerun import load_profiles
+from project_lint import LintResultsDock, ProjectLint
+from settings import DEFAULT_SCROLLBACK, SettingsManager, SettingsDialog
 from styling import StyleMixin
+from tocsp import ThreadsToCSP
+from timings import Timings
+from tothreads import CSPToThreads
+from translate_worker import BackgroundTranslator
 
 
 import os
+import re
+import shutil
+import sys
+import tempfile
 import syntax # Basic syntax highlighting where QScintilla would be overkill.
 
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
@@ -102,7 +120,10 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
             self.action_Toggle_Console_Window : self.toggle_console,
             self.action_Folding_Mode_Source : self.toggle_folding_mode,
             self.action_Whitespace_Visible_Source : self.toggle_whitespace_visible,
-            self.action_Word_Wrap_Source : self.toggle_word_wrap
+            self.action_Word_Wrap_Source : self.toggle_word_wrap,
+            self.action_Sync_Scrolling_Source : self.toggle_sync_scrolling,
+            self.action_Lint_As_You_Type_Source : self.toggle_lint_as_you_type,
+            self.action_Lint_From_Stdin_Source : self.toggle_lint_from_stdin
             }
         for checkable in self.checkables:
             is_checked = self.settings.get_value(checkable.objectName())
@@ -118,11 +139,42 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         # Shortcuts without menu items
         self.connect(Qt.QShortcut(Qt.QKeySequence("Ctrl+Space"), self), 
                      Qt.SIGNAL('activated()'), self.autoCompleteFromAll)
-        # Set up linting.
+        # Set up linting. Results are cached by file content, so
+        # re-opening or re-saving an unchanged file does not re-run lint.
+        # Each linter runs in a warm lint server started on first use, and
+        # only definitions changed since the last run are linted again.
+        # The time taken by each phase of lint runs is kept for the
+        # Lint Performance dialog.
+        self.lint_cache = DiskCache(user_cache_dir('lint'), 8 * 1024 * 1024)
+        self.lint_timings = Timings(LINT_PHASES)
         self.csplint = Lint(self.csplint_exec, [], self.cspEdit,
-                            CSPLintIterator, self.message)
+                            'csplint', self.message, self.lint_cache,
+                            self.python_exec, True, self.lint_timings)
         self.pylint  = Lint(self.pylint_exec, [],
-                            self.threadEdit, PyLintIterator, self.message)
+                            self.threadEdit, 'pylint-parseable', self.message,
+                            self.lint_cache, self.python_exec, True,
+                            self.lint_timings)
+        self.lint_schedulers = {self.cspEdit: LintScheduler(self.csplint),
+                                self.threadEdit: LintScheduler(self.pylint)}
+        for scheduler in self.lint_schedulers.values():
+            self.connect(scheduler, Qt.SIGNAL('idle()'), self.lint_unsaved)
+        # Unsaved code is linted from copies in a RAM-backed directory.
+        self.lint_snapshot_dir = None
+        # Whole projects are linted in parallel, with results in a dock.
+        self.project_lint = ProjectLint(self.python_exec)
+        self.lint_results = LintResultsDock(self)
+        self.addDockWidget(Qt.Qt.BottomDockWidgetArea, self.lint_results)
+        self.lint_results.hide()
+        self.connect(self.project_lint,
+                     Qt.SIGNAL('messages(PyQt_PyObject, PyQt_PyObject)'),
+                     self.lint_results.model.add_rows)
+        self.connect(self.project_lint, Qt.SIGNAL('progress(int, int)'),
+                     self.lint_results.set_progress)
+        self.connect(self.project_lint, Qt.SIGNAL('finished()'),
+                     self.on_project_linted)
+        self.connect(self.lint_results,
+                     Qt.SIGNAL('open_location(PyQt_PyObject, int)'),
+                     self.open_lint_location)
         # Set up interpreters and history managers for their input widgets.
         self.history_python = HistoryEventFilter(self.pythonLineEdit, self.settings)
         self.history_thread = HistoryEventFilter(self.threadLineEdit, self.settings)
@@ -132,17 +184,32 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
                                           line_edit=self.pythonLineEdit,
                                           settings=self.settings,
                                           history=self.history_python)
-        self.thread_interp  = Interpreter(self.python_exec, [],
-                                          console=self.threadConsole,
-                                          line_edit=self.threadLineEdit,
-                                          prompt='> ', settings=self.settings,
-                                          history=self.history_thread)
-        self.csp_interp     = Interpreter(self.python_exec, [],
-                                          console=self.cspConsole,
-                                          line_edit=self.cspLineEdit,
-                                          prompt='> ', settings=self.settings,
-                                          history=self.history_csp)
+        self.thread_interp  = ScriptRunner(self.python_exec, [],
+                                           console=self.threadConsole,
+                                           line_edit=self.threadLineEdit,
+                                           prompt='> ', settings=self.settings,
+                                           history=self.history_thread)
+        self.csp_interp     = ScriptRunner(self.python_exec, [],
+                                           console=self.cspConsole,
+                                           line_edit=self.cspLineEdit,
+                                           prompt='> ', settings=self.settings,
+                                           history=self.history_csp)
         self.python_console.start()
+        self.thread_interp.warm_up()
+        self.csp_interp.warm_up()
+        # Runs under the profiler write their results to a temporary
+        # directory, which is read when the run finishes.
+        self.profile_runs = {} # Interpreter -> (directory, editor, file)
+        self.hotspots = HotspotDock(self)
+        self.addDockWidget(Qt.Qt.BottomDockWidgetArea, self.hotspots)
+        self.hotspots.hide()
+        self.connect(self.hotspots,
+                     Qt.SIGNAL('open_location(PyQt_PyObject, int)'),
+                     self.open_lint_location)
+        for interp in [self.thread_interp, self.csp_interp]:
+            self.connect(interp, Qt.SIGNAL('run_finished(int)'),
+                         lambda status, interp=interp: self.on_run_finished(interp))
+        self.apply_scrollback()
         # Set up debuggers.
         self.pdb_thread = PdbDebugger(self.pdb_exec, [],
                                       console=self.threadConsole,
@@ -150,6 +217,52 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         self.pdb_csp    = PdbDebugger(self.pdb_exec, [],
                                       console=self.cspConsole,
                                       line_edit=self.cspLineEdit)
+        for proc in [self.python_console, self.thread_interp, self.csp_interp,
+                     self.pdb_thread, self.pdb_csp]:
+            self.connect(proc, Qt.SIGNAL('write_queue(int, bool)'),
+                         self.report_write_queue)
+        # Set up translators. These cache their work between saves, and
+        # whole translations are cached on disk by content. Translation
+        # runs in background threads so the editor never blocks.
+        self.translation_cache = DiskCache(user_cache_dir('translations'))
+        self.threads_to_csp = BackgroundTranslator(ThreadsToCSP(),
+                                                   self.translation_cache, self)
+        self.csp_to_threads = BackgroundTranslator(CSPToThreads(),
+                                                   self.translation_cache, self)
+        self.connect(self.threads_to_csp,
+                     Qt.SIGNAL('translated(PyQt_PyObject, PyQt_PyObject)'),
+                     self.on_csp_translated)
+        self.connect(self.threads_to_csp, Qt.SIGNAL('failed(PyQt_PyObject)'),
+                     self.on_csp_failed)
+        self.connect(self.csp_to_threads,
+                     Qt.SIGNAL('translated(PyQt_PyObject, PyQt_PyObject)'),
+                     self.on_threads_translated)
+        self.connect(self.csp_to_threads, Qt.SIGNAL('failed(PyQt_PyObject)'),
+                     self.on_threads_failed)
+        # Map from lines of threadEdit to lines of cspEdit, from the last
+        # translation. Used to mirror markers and lint annotations, and
+        # to keep the panes scrolled to the same code.
+        self.source_map = None
+        self.syncing = False
+        self.lints = {self.threadEdit: self.pylint, self.cspEdit: self.csplint}
+        self.mirrored = {self.threadEdit: set(), self.cspEdit: set()}
+        for editor in self.lints:
+            self.connect(editor.verticalScrollBar(), Qt.SIGNAL('valueChanged(int)'),
+                         self.sync_scroll)
+        for lint in self.lints.values():
+            self.connect(lint, Qt.SIGNAL('annotated()'), self.mirror_lint)
+        # Index of processes and channels in every directory opened so far.
+        self.channel_index = ChannelIndex(user_index_path())
+        self.channel_index.load()
+        # Directories opened since they were last indexed. They are only
+        # indexed when the index is needed, by the indexer thread, which
+        # owns the index while it runs. See find_channel_users().
+        self.unindexed = set()
+        self.indexer = IndexWorker(self.channel_index)
+        self.connect(self.indexer, Qt.SIGNAL('indexed(PyQt_PyObject)'),
+                     self.on_indexed)
+        self.indexing = False
+        self.pending_lookup = None # Readers or writers, once indexed.
         # Start with focus on the left hand pane.
         self.threadEdit.setFocus()
         return
@@ -256,6 +369,7 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         self.message('Loaded document %s' % (self.filename))
         self.action_Close_File.setDisabled(False)
         self.run_lint(editor)
+        self.unindexed.add(os.path.dirname(os.path.abspath(filename)))
         return
 
     def open_recent_file(self):
@@ -295,6 +409,11 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
             self.to_threads()
         # Run appropriate lint.
         self.run_lint(editor)
+        if self.indexing:
+            filename = os.path.abspath(str(self.filename))
+            self.unindexed.add(os.path.dirname(filename))
+        else:
+            self.channel_index.update_file(str(self.filename))
         return
 
     def save_as_file(self):
@@ -305,12 +424,6 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         else:
             self.message('Saving aborted')
         self.action_Close_File.setDisabled(False)
-
-        # Auto-convert between concurrency models.
-        if self.get_editor() is self.threadEdit:
-            self.to_csp()
-        else:
-            self.to_threads()
         return
 
     def print_file(self):
@@ -373,6 +486,7 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         settings_dialog = SettingsDialog(self, self.settings)
         settings_dialog.exec_()
         self.load_settings()
+        self.apply_scrollback()
         if settings_dialog.result() == Qt.QDialog.Rejected:
             return
         msg = 'Please restart %s for your changes to take effect.' % self.app_name
@@ -386,9 +500,19 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
         self.pylint_exec  = str(self.settings.get_value('pylint')) or ''
         self.cspdb_exec   = str(self.settings.get_value('cspdb')) or ''
         self.csplint_exec = str(self.settings.get_value('csplint')) or ''
+        self.scrollback   = self.settings.get_int('scrollback', DEFAULT_SCROLLBACK)
         self.message('Loaded settings.')
         return
 
+    def apply_scrollback(self):
+        """Limit the number of lines kept in each console.
+        Older lines are trimmed from the top, and remain in the spool
+        of the interpreter which wrote them.
+        """
+        for console in [self.pythonConsole, self.threadConsole, self.cspConsole]:
+            console.document().setMaximumBlockCount(self.scrollback)
+        return
+
     #
     # Search menu actions.
     #
@@ -437,6 +561,81 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
             editor.setCursorPosition(lineno - 1, 0)
             self.message('At line %d.' % lineno)
         return
+
+    def find_channel_writers(self):
+        """Jump to a process which writes to the channel under the cursor.
+        """
+        self.find_channel_users('writers')
+        return
+
+    def find_channel_readers(self):
+        """Jump to a process which reads from the channel under the cursor.
+        """
+        self.find_channel_users('readers')
+        return
+
+    def on_indexed(self, directories):
+        """SLOT called when the indexer thread has finished.
+        """
+        self.indexing = False
+        which, self.pending_lookup = self.pending_lookup, None
+        if which is not None:
+            self.find_channel_users(which)
+        return
+
+    def find_channel_users(self, which):
+        editor = self.get_editor()
+        channel = self.channel_at_cursor(editor)
+        if channel is None:
+            self.message('No channel name under the cursor.')
+            return
+        if self.unindexed or self.indexing:
+            # Look again when the index is up to date. Only files which
+            # have changed since they were last indexed are re-read.
+            self.pending_lookup = which
+            if not self.indexing:
+                self.indexing = True
+                self.indexer.update(self.unindexed)
+                self.unindexed = set()
+            self.message('Indexing channels...')
+            return
+        if not self.filename.isEmpty():
+            self.channel_index.update_file(str(self.filename))
+        users = getattr(self.channel_index, which)(channel)
+        if not users and '.' in channel:
+            # Try the bare attribute name, e.g. chan for self.chan.
+            channel = channel.split('.')[-1]
+            users = getattr(self.channel_index, which)(channel)
+        if not users:
+            self.message('No %s found for channel %s.' % (which, channel))
+            return
+        choices = ['%s:%d: %s' % (os.path.basename(filename), lineno, desc)
+                   for filename, lineno, desc in users]
+        index = 0
+        if len(users) > 1:
+            choice, ok = Qt.QInputDialog.getItem(self, self.app_name,
+                                                 'Channel %s %s:' % (channel, which),
+                                                 choices, 0, False)
+            if not ok:
+                return
+            index = choices.index(str(choice))
+        filename, lineno, desc = users[index]
+        if os.path.abspath(str(self.filename)) != filename:
+            self.load_file(editor, filename)
+        editor.setCursorPosition(lineno - 1, 0)
+        editor.ensureLineVisible(lineno - 1)
+        self.message('Channel %s: %s' % (channel, choices[index]))
+        return
+
+    def channel_at_cursor(self, editor):
+        """Return the (possibly dotted) identifier under the cursor, or None.
+        """
+        line, index = editor.getCursorPosition()
+        text = str(editor.text(line))
+        for match in re.finditer(r'[A-Za-z_][\w.]*', text):
+            if match.start() <= index <= match.end():
+                return match.group().strip('.')
+        return None
     
     #
     # Source menu actions.
@@ -491,6 +690,28 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
             self.message('Word wrap off.')
         return
 
+    def toggle_sync_scrolling(self):
+        if self.action_Sync_Scrolling_Source.isChecked():
+            self.sync_scroll()
+            self.message('Synchronised scrolling on.')
+        else:
+            self.message('Synchronised scrolling off.')
+        return
+
+    def toggle_lint_as_you_type(self):
+        if self.action_Lint_As_You_Type_Source.isChecked():
+            self.message('Lint as you type on.')
+        else:
+            self.message('Lint as you type off.')
+        return
+
+    def toggle_lint_from_stdin(self):
+        if self.action_Lint_From_Stdin_Source.isChecked():
+            self.message('Unsaved threaded code will be sent to pylint on stdin.')
+        else:
+            self.message('Unsaved code will be linted from a temporary file.')
+        return
+
     def toggle_whitespace_visible(self):
         if self.action_Whitespace_Visible_Source.isChecked():
             self.get_editor().setWhitespaceVisibility(1)
@@ -507,6 +728,7 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
     def run_csp(self):
         """Run code in the CSP editor pane and display output in a console.
         """
+        self.discard_profile(self.csp_interp)
         self.cspConsole.clear()
         self.focus_csp_console()
         self.csp_interp.start([self.filename])
@@ -516,12 +738,78 @@ class MainWindow(Qt.QMainWindow, Ui_MainWindow, StyleMixin):
     def run_threads(self):
         """Run code in the thread editor pane and display output in a console.
         """
+        self.discard_profile(self.thread_interp)
         self.threadConsole.clear()
         self.focus_thread_console()
         self.thread_interp.start([self.filename])
         self.message('Running %s.' % self.filename)
         return
 
+    def run_csp_profiled(self):
+        """Run code in the CSP editor pane under the profiler.
+        """
+        self.cspConsole.clear()
+        self.focus_csp_console()
+        self.run_profiled(self.csp_interp, self.cspEdit)
+        return
+
+    def run_threads_profiled(self):
+        """Run code in the thread editor pane under the profiler.
+        """
+        self.threadConsole.clear()
+        self.focus_thread_console()
+        self.run_profiled(self.thread_interp, self.threadEdit)
+        return
+
+    def run_profiled(self, interp, editor):
+        self.discard_profile(interp)
+        filename = str(self.filename)
+        directory = tempfile.mkdtemp(prefix='bijector-profile-')
+        interp.start([PROFILE_RUN, '-d', directory, filename])
+        # Recorded after start(), which ends any earlier run.
+        self.profile_runs[interp] = (directory, editor, filename)
+        self.message('Profiling %s.' % filename)
+        return
+
+    def discard_profile(self, interp):
+        """Forget the profiled run of an interpreter, if there is one.
+        """
+        if interp in self.profile_runs:
+            shutil.rmtree(self.profile_runs.pop(interp)[0], True)
+        return
+
+    def on_run_finished(self, interp):
+        """SLOT called when a script exits. Show its profile, if it was
+        run under the profiler.
+        """
+        if interp not in self.profile_runs:
+            return
+        directory, editor, filename = self.profile_runs.pop(interp)
+        profile = load_profiles(directory)
+        shutil.rmtree(directory, True)
+        if not profile.pids:
+            self.message('No profile was written for %s.' % filename)
+            return
+        kind = 'CSP code' if interp is self.csp_interp else 'Threaded code'
+        self.hotspots.set_profile(kind, profile, filename)
+        self.hotspots.show()
+        show_hot_lines(editor, profile, filename)
+        self.message('Profiled %s in %d processes.' %
+                     (filename, len(profile.pids)))
+        return
+
+    def report_write_queue(self, waiting, stalled):
+        """SLOT called when input to a running program is queued.
+        """
+        if stalled:
+            self.message('Program is not reading its input '
+                         '(%d more lines queued).' % waiting)
+        elif waiting:
+            self.message('%d lines of input queued.' % waiting)
+        else:
+            self.message('Input queue empty.')
+        return
+
     def abort_thread_console(self):
         """Terminate currently running interpreter or debugger for threaded code.
         """
@@ -754,17 +1042,125 @@ http://code.google.com/p/python-csp/wiki/Tutorial
     #
     
     def to_csp(self):
-        # WRITEME
-        print 'to_csp'
-        self.message('Converted %s to CSP code.' % self.filename)
+        """Translate the threaded code pane into the CSP code pane.
+        The result arrives asynchronously in on_csp_translated.
+        """
+        self.threads_to_csp.request(str(self.threadEdit.text()))
         return
 
     def to_threads(self):
-        # WRITEME
-        print 'to_threads'
+        """Translate the CSP code pane into the threaded code pane.
+        The result arrives asynchronously in on_threads_translated.
+        """
+        self.csp_to_threads.request(str(self.cspEdit.text()))
+        return
+
+    def on_csp_translated(self, code, smap):
+        self.cspEdit.setText(code)
+        self.source_map = smap
+        self.refresh_mirrors(self.threadEdit)
+        self.message('Converted %s to CSP code.' % self.filename)
+        return
+
+    def on_csp_failed(self, error):
+        self.translation_failed('CSP', error)
+        return
+
+    def translation_failed(self, model, error):
+        """Show the first line of a translation error on the status bar.
+        The rest, a traceback if the translator failed, is logged.
+        """
+        summary, _, details = error.partition('\n')
+        self.message('Could not convert %s to %s code: %s' %
+                     (self.filename, model, summary))
+        if details:
+            sys.stderr.write(error)
+        return
+
+    def on_threads_translated(self, code, smap):
+        self.threadEdit.setText(code)
+        self.source_map = smap.inverted()
+        self.refresh_mirrors(self.cspEdit)
         self.message('Converted %s to threaded code.' % self.filename)
         return
 
+    #
+    # Keep the two panes in step, using the source map.
+    #
+
+    def map_line(self, editor, lineno):
+        """Return the other editor pane and the line in it which
+        corresponds to lineno in editor, or (None, None).
+        """
+        if self.source_map is None:
+            return None, None
+        elif editor is self.threadEdit:
+            return self.cspEdit, self.source_map.forward(lineno)
+        return self.threadEdit, self.source_map.backward(lineno)
+
+    def sync_scroll(self, value=None):
+        """SLOT called when either editor pane scrolls.
+        """
+        if self.syncing or not self.action_Sync_Scrolling_Source.isChecked():
+            return
+        if self.sender() is self.cspEdit.verticalScrollBar():
+            editor = self.cspEdit
+        else:
+            editor = self.threadEdit
+        other, lineno = self.map_line(editor, editor.firstVisibleLine())
+        if other is None:
+            return
+        self.syncing = True
+        other.setFirstVisibleLine(lineno)
+        self.syncing = False
+        return
+
+    def refresh_mirrors(self, editor):
+        """Copy breakpoint markers and lint annotations from editor to
+        the other pane, after the other pane has been re-translated.
+        """
+        other, _ = self.map_line(editor, 0)
+        if other is None:
+            return
+        # Replacing the text removed the other pane's own annotations.
+        self.lints[other].forget_annotations()
+        self.mirrored[other] = set()
+        for lineno in self.get_breakpoints(editor):
+            other.markerAdd(self.map_line(editor, lineno - 1)[1],
+                            MainWindow.BREAK_MARKER_NUM)
+        self.mirror_lint(self.lints[editor])
+        return
+
+    def mirror_lint(self, lint=None):
+        """SLOT called when a lint has annotated its editor.
+        Copy its annotations to the corresponding lines of the other pane,
+        except where the other pane has lint annotations of its own.
+        """
+        if lint is None:
+            lint = self.sender()
+        editor = lint.console
+        other, _ = self.map_line(editor, 0)
+        if other is None:
+            return
+        own = self.lints[other].annotations
+        for lineno in self.mirrored[other]:
+            if lineno not in own:
+                other.clearAnnotations(lineno)
+        self.mirrored[other] = set()
+        tag = 'threads' if editor is self.threadEdit else 'CSP'
+        for lineno, messages in sorted(lint.annotations.items()):
+            target = self.map_line(editor, lineno)[1]
+            if target in own:
+                continue
+            text, style = messages[-1]
+            other.annotate(target, '[%s] %s' % (tag, text), style)
+            self.mirrored[other].add(target)
+        return
+
+    def on_threads_failed(self, error):
+        self.translation_failed('threaded', error)
+        return
+
     #
     # Slots without menu signals.
     #
@@ -773,11 +1169,17 @@ http://code.google.com/p/python-csp/wiki/Tutorial
         """Toggle marker for the line the margin was clicked on.
         Used as a placeholder for a breakpoint.
         """
-        if self.get_editor().markersAtLine(lineno) != 0:
-            self.get_editor().markerDelete(lineno, MainWindow.BREAK_MARKER_NUM)
+        editor = self.get_editor()
+        other, mirror = self.map_line(editor, lineno)
+        if editor.markersAtLine(lineno) != 0:
+            editor.markerDelete(lineno, MainWindow.BREAK_MARKER_NUM)
+            if other is not None:
+                other.markerDelete(mirror, MainWindow.BREAK_MARKER_NUM)
             self.debug_remove_breakpoint(lineno)
         else:
-            self.get_editor().markerAdd(lineno, MainWindow.BREAK_MARKER_NUM)
+            editor.markerAdd(lineno, MainWindow.BREAK_MARKER_NUM)
+            if other is not None:
+                other.markerAdd(mirror, MainWindow.BREAK_MARKER_NUM)
             self.debug_set_breakpoint(lineno)
         return
 
@@ -817,13 +1219,124 @@ http://code.google.com/p/python-csp/wiki/Tutorial
     def stripped_name(self, fullFileName):
         return Qt.QFileInfo(fullFileName).fileName()
 
+    def lint_args(self, editor, filename):
+        if editor is self.cspEdit:
+            return ['-p', filename]
+        return ['-f', 'parseable', '-r', 'n', filename]
+
     def run_lint(self, editor):
         """Run an external static checker and display results as annotations.
         """
-        if editor == self.cspEdit:
-            self.csplint.start(['-p', self.filename])
-        else:
-            self.pylint.start(['-f', 'text', '-r', 'n', self.filename])
+        if editor is not self.cspEdit:
+            editor = self.threadEdit
+        self.lint_schedulers[editor].submit(
+            str(self.filename), self.lint_args(editor, str(self.filename)))
+        return
+
+    def show_lint_performance(self):
+        PerformanceDialog(self, self.lint_timings).exec_()
+        return
+
+    def show_console_history(self):
+        """Show everything written to the current console, including
+        lines trimmed from its scrollback.
+        """
+        index = self.consoleTabs.currentIndex()
+        interp = [self.python_console, self.thread_interp, self.csp_interp][index]
+        title = 'History of %s' % self.consoleTabs.tabText(index)
+        ConsoleHistoryDialog(self, interp.spool, title).exec_()
+        return
+
+    def lint_project(self):
+        """Lint every module under a directory, in parallel.
+        """
+        start = os.path.dirname(str(self.filename)) or self.userdir
+        root = str(Qt.QFileDialog.getExistingDirectory(self, 'Lint Project',
+                                                       start))
+        if not root:
+            self.message('Project lint aborted.')
+            return
+        self.lint_results.model.clear(root)
+        self.lint_results.set_progress(0, 0)
+        self.lint_results.show()
+        self.project_lint.start(root, self.project_lint_job)
+        self.message('Linting modules under %s on %d workers.' %
+                     (root, self.project_lint.size))
+        return
+
+    def project_lint_job(self, path, source):
+        """Return the lint job for a module of a project.
+        Called on the thread which finds the modules.
+        """
+        if detect(source) == 'threads':
+            return (path, self.csplint_exec,
+                    self.lint_args(self.cspEdit, path), 'csplint')
+        return (path, self.pylint_exec,
+                self.lint_args(self.threadEdit, path), 'pylint-parseable')
+
+    def on_project_linted(self):
+        model = self.lint_results.model
+        model.flush()
+        self.message('Project lint found %d messages in %d modules.' %
+                     (len(model.rows), len(model.files)))
+        return
+
+    def open_lint_location(self, filename, lineno):
+        """SLOT called when a project lint result or a hotspot is clicked.
+        """
+        try:
+            with open(filename) as f:
+                is_csp = detect(f.read()) == 'threads'
+        except IOError:
+            self.message('Could not open file %s.' % filename)
+            return
+        editor = self.cspEdit if is_csp else self.threadEdit
+        if os.path.abspath(str(self.filename)) != os.path.abspath(filename):
+            self.load_file(editor, filename)
+        editor.setCursorPosition(lineno - 1, 0)
+        editor.ensureLineVisible(lineno - 1)
+        editor.setFocus()
+        return
+
+    def lint_unsaved(self):
+        """SLOT called when typing in an editor has paused.
+        Lint the text in the editor without saving it, through stdin if
+        the linter can read it, or else through a copy in RAM.
+        """
+        if not self.action_Lint_As_You_Type_Source.isChecked():
+            return
+        scheduler = self.sender()
+        editor = scheduler.lint.console
+        # Skip text replaced by translation, rather than typed.
+        if editor is not self.get_editor() or not editor.isModified():
+            return
+        filename = str(self.filename) or 'untitled.py'
+        text = str(editor.text())
+        if editor is self.threadEdit and \
+                self.action_Lint_From_Stdin_Source.isChecked():
+            scheduler.submit(filename, ['-f', 'parseable', '-r', 'n',
+                                        '--from-stdin', filename], text)
+            return
+        if self.lint_snapshot_dir is None:
+            self.lint_snapshot_dir = tempfile.mkdtemp(prefix='bijector-lint-',
+                                                      dir=ram_temp_dir())
+            os.mkdir(os.path.join(self.lint_snapshot_dir, 'threads'))
+            os.mkdir(os.path.join(self.lint_snapshot_dir, 'csp'))
+        # Keep the file name, as lint messages may depend on it.
+        snapshot = os.path.join(self.lint_snapshot_dir,
+                                'csp' if editor is self.cspEdit else 'threads',
+                                os.path.basename(filename))
+        try:
+            with open(snapshot, 'w') as f:
+                f.write(text)
+        except IOError, e:
+            self.message('Could not write %s for lint: %s' % (snapshot, e))
+            return
+        # The copy can still import the modules next to the original.
+        path = os.path.dirname(os.path.abspath(filename)) \
+            if self.filename else None
+        scheduler.submit(snapshot, self.lint_args(editor, snapshot), None,
+                         path)
         return
 
     def clean_up(self):
@@ -836,10 +1349,23 @@ http://code.google.com/p/python-csp/wiki/Tutorial
         # Save checkables.
         for check in self.checkables:
             self.settings.set_value(check.objectName(), str(check.isChecked()))
+        self.project_lint.stop()
+        # Stop background translation.
+        self.threads_to_csp.stop()
+        self.csp_to_threads.stop()
+        self.indexer.wait()
+        self.channel_index.save()
+        if self.lint_snapshot_dir is not None:
+            shutil.rmtree(self.lint_snapshot_dir, True)
         # Close running processes.
         for proc in [self.python_console, self.thread_interp, self.csp_interp,
                      self.pdb_thread, self.pdb_csp, self.pylint, self.csplint]:
             proc.terminate()
+        for interp in [self.thread_interp, self.csp_interp]:
+            interp.shutdown()
+            self.discard_profile(interp)
+        for interp in [self.python_console, self.thread_interp, self.csp_interp]:
+            interp.close_spool()
         return
 
     def closeEvent(self, event):
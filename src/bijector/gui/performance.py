@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+Dialog showing where time goes in the lint pipeline.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import Qt
+
+from timings import BUCKETS
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+def format_ms(seconds):
+    if seconds is None:
+        return '-'
+    return '%.1f' % (seconds * 1000)
+
+
+def bucket_label(index):
+    if index == len(BUCKETS):
+        return '> %gs' % BUCKETS[-1]
+    return '<= %gs' % BUCKETS[index]
+
+
+def sparkline(counts):
+    """Return a histogram as a short row of bars, one per bucket.
+    """
+    bars = u' \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+    top = max(counts) or 1
+    return u''.join(bars[(count * (len(bars) - 1) + top - 1) // top]
+                    for count in counts)
+
+
+class PerformanceDialog(Qt.QDialog):
+    """Table of lint phase timings, refreshed while the dialog is open.
+    """
+    COLUMNS = ('Phase', 'Runs', 'Mean ms', 'p50 ms', 'p90 ms', 'p99 ms',
+               'Max ms', 'Total s', 'Histogram')
+    REFRESH = 1000 # ms
+
+    def __init__(self, parent, timings):
+        Qt.QDialog.__init__(self, parent)
+        self.timings = timings
+        self.setWindowTitle('Lint Performance')
+        layout = Qt.QVBoxLayout(self)
+        self.table = Qt.QTableWidget(0, len(PerformanceDialog.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(list(PerformanceDialog.COLUMNS))
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(Qt.QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        layout.addWidget(Qt.QLabel(
+            'Times are for the last %d runs. queue is the wait for an '
+            'earlier run to finish, linter is the linter itself, and read, '
+            'parse and annotate are spent in the editor. Histogram buckets '
+            'run from %s to %s.' % (timings.size, bucket_label(0),
+                                    bucket_label(len(BUCKETS))), self))
+        buttons = Qt.QDialogButtonBox(Qt.QDialogButtonBox.Close, Qt.Qt.Horizontal,
+                                      self)
+        save = buttons.addButton('Save JSON...', Qt.QDialogButtonBox.ActionRole)
+        clear = buttons.addButton('Clear', Qt.QDialogButtonBox.ResetRole)
+        layout.addWidget(buttons)
+        self.connect(buttons, Qt.SIGNAL('rejected()'), self.reject)
+        self.connect(save, Qt.SIGNAL('clicked()'), self.save)
+        self.connect(clear, Qt.SIGNAL('clicked()'), self.clear)
+        self.timer = Qt.QTimer(self)
+        self.connect(self.timer, Qt.SIGNAL('timeout()'), self.refresh)
+        self.timer.start(PerformanceDialog.REFRESH)
+        self.resize(760, 320)
+        self.refresh()
+        return
+
+    def refresh(self):
+        """SLOT called to update the table from the timings.
+        """
+        summary = self.timings.summary()
+        self.table.setRowCount(len(summary))
+        for row, (phase, stats) in enumerate(summary):
+            cells = [phase, str(stats['count']), format_ms(stats['mean']),
+                     format_ms(stats['p50']), format_ms(stats['p90']),
+                     format_ms(stats['p99']), format_ms(stats['max']),
+                     '%.2f' % stats['total'], sparkline(stats['buckets'])]
+            for column, text in enumerate(cells):
+                item = Qt.QTableWidgetItem(text)
+                if column == len(cells) - 1:
+                    item.setToolTip('\n'.join(
+                        '%s: %d' % (bucket_label(index), count)
+                        for index, count in enumerate(stats['buckets'])))
+                self.table.setItem(row, column, item)
+        return
+
+    def save(self):
+        filename = Qt.QFileDialog.getSaveFileName(self, 'Save Lint Timings',
+                                                  'lint-timings.json')
+        if filename.isEmpty():
+            return
+        try:
+            self.timings.dump(str(filename))
+        except IOError, e:
+            Qt.QMessageBox.warning(self, 'Lint Performance',
+                                   'Could not write %s: %s' % (filename, e))
+        return
+
+    def clear(self):
+        self.timings.clear()
+        self.refresh()
+        return
+
+    def done(self, result):
+        self.timer.stop()
+        Qt.QDialog.done(self, result)
+        return
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""
+Show the results of running a program under the profiler.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import Qt
+from PyQt4.Qsci import QsciScintilla
+
+import os
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+PROFILE_RUN = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'profilerun.py')
+
+HOT_MARGIN = 3 # Editor margin holding the share of samples per line;
+               # 0 to 2 hold line numbers, symbols and folding.
+HOT_LINES = 10 # Lines annotated after a run.
+
+
+def show_hot_lines(editor, profile, filename):
+    """Annotate the hottest lines of filename in the editor margin with
+    their share of all samples.
+    """
+    clear_hot_lines(editor)
+    total = profile.total_samples()
+    hot = profile.hot_lines(filename, HOT_LINES)
+    if not total or not hot:
+        return
+    editor.setMarginType(HOT_MARGIN, QsciScintilla.TextMargin)
+    editor.setMarginWidth(HOT_MARGIN, '100%')
+    for line, samples in hot:
+        editor.setMarginText(line - 1, '%d%%' % round(100.0 * samples / total),
+                             QsciScintilla.STYLE_LINENUMBER)
+    return
+
+
+def clear_hot_lines(editor):
+    editor.clearMarginText()
+    editor.setMarginWidth(HOT_MARGIN, 0)
+    return
+
+
+class NumberItem(Qt.QTableWidgetItem):
+    """Table item which sorts by number rather than by text.
+    """
+
+    def __init__(self, value, text):
+        Qt.QTableWidgetItem.__init__(self, text)
+        self.value = value
+        return
+
+    def __lt__(self, other):
+        return self.value < getattr(other, 'value', 0)
+
+
+class HotspotDock(Qt.QDockWidget):
+    """Dock showing the functions of a profiled run, hottest first.
+
+    The last profile of each kind of code is kept, so that threaded and
+    CSP versions of a program can be compared. Emits
+    open_location(PyQt_PyObject, int) with a file name and line number
+    when a row is clicked.
+    """
+    COLUMNS = ('Function', 'File', 'Line', 'Calls', 'Own s', 'Total s',
+               'Samples', '% Samples', 'Processes')
+
+    def __init__(self, parent=None):
+        Qt.QDockWidget.__init__(self, 'Profile', parent)
+        self.setObjectName('hotspotDock')
+        self.profiles = {} # Kind of code -> (profile, filename).
+        widget = Qt.QWidget(self)
+        layout = Qt.QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        bar = Qt.QHBoxLayout()
+        self.kind_box = Qt.QComboBox(widget)
+        self.mine_only = Qt.QCheckBox('Only the profiled script', widget)
+        self.summary = Qt.QLabel(widget)
+        bar.addWidget(self.kind_box)
+        bar.addWidget(self.mine_only)
+        bar.addWidget(self.summary)
+        bar.addStretch()
+        layout.addLayout(bar)
+        self.table = Qt.QTableWidget(0, len(HotspotDock.COLUMNS), widget)
+        self.table.setHorizontalHeaderLabels(list(HotspotDock.COLUMNS))
+        self.table.setSelectionBehavior(Qt.QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(Qt.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        self.setWidget(widget)
+        self.connect(self.kind_box, Qt.SIGNAL('currentIndexChanged(int)'),
+                     self.refresh)
+        self.connect(self.mine_only, Qt.SIGNAL('toggled(bool)'), self.refresh)
+        self.connect(self.table, Qt.SIGNAL('cellActivated(int, int)'),
+                     self.open_row)
+        self.connect(self.table, Qt.SIGNAL('cellClicked(int, int)'),
+                     self.open_row)
+        return
+
+    def set_profile(self, kind, profile, filename):
+        """Show the profile of a run of filename, replacing the last
+        profile of the same kind of code.
+        """
+        self.profiles[kind] = (profile, filename)
+        index = self.kind_box.findText(kind)
+        if index < 0:
+            self.kind_box.addItem(kind)
+            index = self.kind_box.count() - 1
+        if index == self.kind_box.currentIndex():
+            self.refresh()
+        else:
+            self.kind_box.setCurrentIndex(index)
+        return
+
+    def refresh(self, *args):
+        """SLOT called to fill the table from the chosen profile.
+        """
+        kind = str(self.kind_box.currentText())
+        if kind not in self.profiles:
+            return
+        profile, filename = self.profiles[kind]
+        total = profile.total_samples()
+        functions = profile.functions.values()
+        if self.mine_only.isChecked():
+            path = os.path.abspath(filename)
+            functions = [function for function in functions
+                         if os.path.abspath(function.filename) == path]
+        self.summary.setText('%d processes, %.2fs CPU sampled' %
+                             (len(profile.pids), total * profile.interval))
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(functions))
+        for row, function in enumerate(functions):
+            share = 100.0 * function.samples / total if total else 0.0
+            items = [Qt.QTableWidgetItem(function.name),
+                     Qt.QTableWidgetItem(function.filename),
+                     NumberItem(function.line, str(function.line)),
+                     NumberItem(function.calls, str(function.calls)),
+                     NumberItem(function.own, '%.3f' % function.own),
+                     NumberItem(function.total, '%.3f' % function.total),
+                     NumberItem(function.samples, str(function.samples)),
+                     NumberItem(share, '%.1f' % share),
+                     NumberItem(len(function.pids), str(len(function.pids)))]
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(HotspotDock.COLUMNS.index('Samples'),
+                             Qt.Qt.DescendingOrder)
+        return
+
+    def open_row(self, row, column):
+        """SLOT called when a row is clicked. Only the profiled script
+        is opened, not the libraries it calls.
+        """
+        kind = str(self.kind_box.currentText())
+        filename = str(self.table.item(row, 1).text())
+        if kind not in self.profiles or os.path.abspath(filename) != \
+                os.path.abspath(self.profiles[kind][1]):
+            return
+        self.emit(Qt.SIGNAL('open_location(PyQt_PyObject, int)'),
+                  filename, self.table.item(row, 2).value)
+        return
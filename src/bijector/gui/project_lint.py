@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+
+"""
+Lint every module in a project, in parallel, and browse the results.
+
+Modules are found, and read to choose their linter, on a background
+thread. Each worker is a warm lint server (see lintserver.py) for one
+linter, and at most one module per CPU is linted at a time. Messages
+stream into a LintResultsModel, which holds them in plain lists and
+does its own sorting and filtering, so that it stays responsive with
+hundreds of thousands of rows.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import Qt
+
+from collections import deque
+
+from convert import find_modules
+from lint import server_command
+from lintparse import get_parser
+from lintserver import DONE
+
+import json
+import os
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class LintWorker(Qt.QObject):
+    """A lint server which lints one module at a time.
+
+    Emits done(PyQt_PyObject, PyQt_PyObject, PyQt_PyObject) with the
+    worker, the job and a list of (linenum, severity, message) rows.
+    """
+
+    def __init__(self, python):
+        Qt.QObject.__init__(self)
+        self.python = python
+        self.program = None
+        self.job = None
+        self.parser = None
+        self.messages = []
+        self.partial = ''
+        self.retried = False
+        self.request_id = 0
+        self.process = Qt.QProcess()
+        self.process.setProcessChannelMode(Qt.QProcess.MergedChannels)
+        self.connect(self.process, Qt.SIGNAL('readyReadStandardOutput()'),
+                     self.read_lines)
+        self.connect(self.process, Qt.SIGNAL('finished(int)'), self.finished)
+        return
+
+    def run(self, job):
+        """Lint one module. job is a (filename, program, args, parser) tuple.
+        """
+        filename, program, args, parser = job
+        if program != self.program:
+            self.stop()
+            self.program = program
+        self.job = job
+        self.parser = get_parser(parser)()
+        self.messages = []
+        if not self.is_running():
+            self.partial = ''
+            self.process.start(*server_command(self.python, program))
+            self.process.waitForStarted(-1)
+        self.request_id += 1
+        self.process.write(json.dumps({'id': self.request_id,
+                                       'args': args}) + '\n')
+        return
+
+    def read_lines(self):
+        """SLOT called when the lint server has written more output.
+        """
+        lines = (self.partial +
+                 str(self.process.readAllStandardOutput())).split('\n')
+        self.partial = lines.pop()
+        batch = []
+        for line in lines:
+            if self.job is None:
+                continue
+            elif line.startswith(DONE):
+                if line.split()[1] != str(self.request_id):
+                    batch = [] # The end of an earlier request's output.
+                    continue
+                self.messages.extend(self.parser.feed(batch))
+                batch = []
+                self.job_done()
+            else:
+                batch.append(line)
+        if batch:
+            self.messages.extend(self.parser.feed(batch))
+        return
+
+    def job_done(self, failure=None):
+        job, parser, messages = self.job, self.parser, self.messages
+        self.job, self.parser, self.messages = None, None, []
+        self.retried = False
+        messages.extend(parser.close())
+        rows = [(msg.linenum, msg.severity, msg.message) for msg in messages]
+        # Unreadable output is shown rather than dropped.
+        rows.extend((1, 'F', 'Unreadable lint output: %s' % line)
+                    for line in parser.rejected)
+        if failure is not None:
+            rows.append((1, 'F', failure))
+        self.emit(Qt.SIGNAL('done(PyQt_PyObject, PyQt_PyObject, PyQt_PyObject)'),
+                  self, job, rows)
+        return
+
+    def finished(self, exit_status):
+        """SLOT called when the lint server exits.
+        A server which recycles itself may exit just after a new job was
+        sent to it, so the job is tried once more on a new server.
+        """
+        if self.job is not None and not self.retried:
+            self.retried = True
+            self.run(self.job)
+        elif self.job is not None:
+            self.job_done('%s stopped while linting this module.' %
+                          os.path.basename(self.program))
+        return
+
+    def is_running(self):
+        return self.process.state() == Qt.QProcess.Running
+
+    def is_busy(self):
+        return self.job is not None
+
+    def close(self):
+        """Let an idle lint server exit.
+        """
+        if self.is_running() and not self.is_busy():
+            self.process.closeWriteChannel()
+        return
+
+    def stop(self):
+        self.job = None
+        if self.is_running():
+            self.process.kill()
+            self.process.waitForFinished()
+        return
+
+
+class JobFinder(Qt.QThread):
+    """Background thread which finds the modules under a directory and
+    reads each one to make its lint job.
+
+    make_job(filename, source) returns a (filename, program, args,
+    parser) tuple, and is called on this thread. Emits
+    found(PyQt_PyObject, PyQt_PyObject) with the finder and each job,
+    then searched(PyQt_PyObject) with the finder.
+    """
+
+    def __init__(self, root, make_job):
+        Qt.QThread.__init__(self)
+        self.root = root
+        self.make_job = make_job
+        self.cancelled = False
+        return
+
+    def run(self):
+        for filename in find_modules([self.root]):
+            if self.cancelled:
+                return
+            try:
+                with open(filename) as f:
+                    source = f.read()
+            except IOError:
+                continue
+            self.emit(Qt.SIGNAL('found(PyQt_PyObject, PyQt_PyObject)'),
+                      self, self.make_job(filename, source))
+        self.emit(Qt.SIGNAL('searched(PyQt_PyObject)'), self)
+        return
+
+    def stop(self):
+        self.cancelled = True
+        self.wait()
+        return
+
+
+class ProjectLint(Qt.QObject):
+    """Run lint jobs on a bounded pool of LintWorkers.
+
+    Emits messages(PyQt_PyObject, PyQt_PyObject) with a file name and
+    its rows as each module is finished, progress(int, int) with the
+    number of modules finished and the number found so far, and
+    finished() at the end.
+    """
+
+    def __init__(self, python, size=None):
+        Qt.QObject.__init__(self)
+        self.python = python
+        self.size = size or max(Qt.QThread.idealThreadCount(), 1)
+        self.workers = []
+        self.queue = deque()
+        self.finder = None
+        self.total = 0
+        self.done = 0
+        return
+
+    def start(self, root, make_job):
+        """Lint every module under root. Jobs are made by a JobFinder.
+        """
+        self.stop()
+        self.total = self.done = 0
+        self.finder = JobFinder(root, make_job)
+        self.connect(self.finder,
+                     Qt.SIGNAL('found(PyQt_PyObject, PyQt_PyObject)'),
+                     self.job_found)
+        self.connect(self.finder, Qt.SIGNAL('searched(PyQt_PyObject)'),
+                     self.search_done)
+        self.finder.start()
+        return
+
+    def job_found(self, finder, job):
+        """SLOT called with the job for each module found.
+        """
+        if finder is not self.finder:
+            return # From a search which was stopped.
+        self.queue.append(job)
+        self.total += 1
+        self.emit(Qt.SIGNAL('progress(int, int)'), self.done, self.total)
+        self.dispatch()
+        return
+
+    def search_done(self, finder):
+        """SLOT called when every module has been found.
+        """
+        if finder is not self.finder:
+            return
+        self.finder = None
+        if self.done == self.total:
+            self.finish()
+        return
+
+    def dispatch(self):
+        """Give queued jobs to idle workers, at most size at a time.
+        """
+        while self.queue:
+            worker = self.idle_worker(self.queue[0][1])
+            if worker is None:
+                break
+            worker.run(self.queue.popleft())
+        return
+
+    def idle_worker(self, program):
+        """Return an idle worker, preferably already running program,
+        or None if every worker is busy.
+        """
+        idle = [worker for worker in self.workers if not worker.is_busy()]
+        for worker in idle:
+            if worker.program == program:
+                return worker
+        if len(self.workers) < self.size:
+            worker = LintWorker(self.python)
+            self.connect(worker,
+                         Qt.SIGNAL('done(PyQt_PyObject, PyQt_PyObject, PyQt_PyObject)'),
+                         self.job_done)
+            self.workers.append(worker)
+            return worker
+        if idle:
+            return idle[0] # Restarted with the other linter.
+        return None
+
+    def job_done(self, worker, job, rows):
+        """SLOT called when a worker has linted a module.
+        """
+        self.done += 1
+        self.emit(Qt.SIGNAL('messages(PyQt_PyObject, PyQt_PyObject)'),
+                  job[0], rows)
+        self.emit(Qt.SIGNAL('progress(int, int)'), self.done, self.total)
+        self.dispatch()
+        if self.done == self.total and self.finder is None:
+            self.finish()
+        return
+
+    def finish(self):
+        for worker in self.workers:
+            worker.close()
+        self.emit(Qt.SIGNAL('finished()'))
+        return
+
+    def is_running(self):
+        return self.finder is not None or self.done < self.total
+
+    def stop(self):
+        """Abandon all queued and running jobs.
+        """
+        if self.finder is not None:
+            self.finder.stop()
+            self.finder = None
+        self.queue.clear()
+        for worker in self.workers:
+            worker.stop()
+        self.total = self.done = 0
+        return
+
+
+class LintResultsModel(Qt.QAbstractTableModel):
+    """Table of lint messages from many files.
+
+    Rows are kept in arrival order in self.rows, and self.view lists the
+    indices of the rows which pass the filter, in sorted order. New rows
+    are buffered and added in batches.
+    """
+    HEADERS = ('File', 'Line', 'Severity', 'Message')
+    RANKS = {'F':0, 'E':1, 'W':2, 'R':3, 'C':4, 'I':5}
+    FLUSH = 200 # ms
+
+    def __init__(self, parent=None):
+        Qt.QAbstractTableModel.__init__(self, parent)
+        self.root = ''
+        self.rows = [] # (relative path, line, severity, message, filename)
+        self.view = []
+        self.pending = []
+        self.text = ''
+        self.severities = None
+        self.sort_column = None
+        self.sort_order = Qt.Qt.AscendingOrder
+        self.files = set()
+        self.timer = Qt.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.connect(self.timer, Qt.SIGNAL('timeout()'), self.flush)
+        return
+
+    def rowCount(self, parent=Qt.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.view)
+
+    def columnCount(self, parent=Qt.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(LintResultsModel.HEADERS)
+
+    def data(self, index, role=Qt.Qt.DisplayRole):
+        if not index.isValid():
+            return Qt.QVariant()
+        row = self.rows[self.view[index.row()]]
+        if role == Qt.Qt.DisplayRole:
+            return Qt.QVariant(row[index.column()])
+        elif role == Qt.Qt.ToolTipRole:
+            return Qt.QVariant(row[4])
+        return Qt.QVariant()
+
+    def headerData(self, section, orientation, role=Qt.Qt.DisplayRole):
+        if role == Qt.Qt.DisplayRole and orientation == Qt.Qt.Horizontal:
+            return Qt.QVariant(LintResultsModel.HEADERS[section])
+        return Qt.QVariant()
+
+    def clear(self, root=''):
+        self.beginResetModel()
+        self.root = root
+        self.rows, self.view, self.pending = [], [], []
+        self.files = set()
+        self.endResetModel()
+        return
+
+    def add_rows(self, filename, rows):
+        """SLOT called with the messages for one file.
+        """
+        relpath = os.path.relpath(filename, self.root) if self.root else filename
+        self.files.add(filename)
+        self.pending.extend((relpath, linenum, severity, message, filename)
+                            for linenum, severity, message in rows)
+        if not self.timer.isActive():
+            self.timer.start(LintResultsModel.FLUSH)
+        return
+
+    def flush(self):
+        """Add buffered rows to the model.
+        """
+        if not self.pending:
+            return
+        start = len(self.rows)
+        self.rows.extend(self.pending)
+        self.pending = []
+        added = [index for index in xrange(start, len(self.rows))
+                 if self.accepts(self.rows[index])]
+        if not added:
+            return
+        if self.sort_column is None:
+            first = len(self.view)
+            self.beginInsertRows(Qt.QModelIndex(), first, first + len(added) - 1)
+            self.view.extend(added)
+            self.endInsertRows()
+        else:
+            self.emit(Qt.SIGNAL('layoutAboutToBeChanged()'))
+            self.view.extend(added)
+            self.sort_view()
+            self.emit(Qt.SIGNAL('layoutChanged()'))
+        return
+
+    def accepts(self, row):
+        if self.severities is not None and row[2] not in self.severities:
+            return False
+        return not self.text or self.text in row[0].lower() or \
+            self.text in row[3].lower()
+
+    def set_filter(self, text, severities=None):
+        """Show only messages containing text, in their file name or
+        message, and with a severity in severities if it is not None.
+        """
+        self.beginResetModel()
+        self.text = text.lower()
+        self.severities = severities
+        self.view = [index for index, row in enumerate(self.rows)
+                     if self.accepts(row)]
+        self.sort_view()
+        self.endResetModel()
+        return
+
+    def sort(self, column, order=Qt.Qt.AscendingOrder):
+        self.emit(Qt.SIGNAL('layoutAboutToBeChanged()'))
+        self.sort_column = column
+        self.sort_order = order
+        self.sort_view()
+        self.emit(Qt.SIGNAL('layoutChanged()'))
+        return
+
+    def sort_view(self):
+        if self.sort_column is None:
+            return
+        rows = self.rows
+        if self.sort_column == 0:
+            key = lambda index: (rows[index][0], rows[index][1])
+        elif self.sort_column == 2:
+            ranks = LintResultsModel.RANKS
+            key = lambda index: ranks.get(rows[index][2], 2)
+        else:
+            column = self.sort_column
+            key = lambda index: rows[index][column]
+        self.view.sort(key=key, reverse=self.sort_order == Qt.Qt.DescendingOrder)
+        return
+
+    def location(self, index):
+        """Return the (filename, line number) of a row.
+        """
+        row = self.rows[self.view[index.row()]]
+        return row[4], row[1]
+
+
+class LintResultsDock(Qt.QDockWidget):
+    """Dock showing the results of linting a project.
+
+    Emits open_location(PyQt_PyObject, int) with a file name and line
+    number when a row is clicked.
+    """
+    SEVERITY_FILTERS = (('All messages', None),
+                        ('Errors', frozenset('EF')),
+                        ('Warnings and errors', frozenset('WEF')),
+                        ('Conventions and refactoring', frozenset('CR')))
+
+    def __init__(self, parent=None):
+        Qt.QDockWidget.__init__(self, 'Lint Results', parent)
+        self.setObjectName('lintResultsDock')
+        self.model = LintResultsModel(self)
+        widget = Qt.QWidget(self)
+        layout = Qt.QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        bar = Qt.QHBoxLayout()
+        self.filter_edit = Qt.QLineEdit(widget)
+        self.filter_edit.setToolTip('Show messages whose file or text contains this')
+        self.severity_box = Qt.QComboBox(widget)
+        for label, _ in LintResultsDock.SEVERITY_FILTERS:
+            self.severity_box.addItem(label)
+        self.status = Qt.QLabel(widget)
+        bar.addWidget(Qt.QLabel('Filter:', widget))
+        bar.addWidget(self.filter_edit)
+        bar.addWidget(self.severity_box)
+        bar.addWidget(self.status)
+        layout.addLayout(bar)
+        self.table = Qt.QTableView(widget)
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(Qt.QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(Qt.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        # Unsorted, i.e. in order of arrival, until a header is clicked.
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+        self.setWidget(widget)
+        # Filter once typing pauses, not on every key.
+        self.filter_timer = Qt.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.connect(self.filter_timer, Qt.SIGNAL('timeout()'), self.apply_filter)
+        self.connect(self.filter_edit, Qt.SIGNAL('textChanged(QString)'),
+                     lambda text: self.filter_timer.start(250))
+        self.connect(self.severity_box, Qt.SIGNAL('currentIndexChanged(int)'),
+                     self.apply_filter)
+        self.connect(self.table, Qt.SIGNAL('clicked(QModelIndex)'), self.open_row)
+        self.connect(self.table, Qt.SIGNAL('activated(QModelIndex)'), self.open_row)
+        return
+
+    def apply_filter(self, index=None):
+        severities = LintResultsDock.SEVERITY_FILTERS[
+            self.severity_box.currentIndex()][1]
+        self.model.set_filter(str(self.filter_edit.text()), severities)
+        return
+
+    def open_row(self, index):
+        if not index.isValid():
+            return
+        filename, linenum = self.model.location(index)
+        self.emit(Qt.SIGNAL('open_location(PyQt_PyObject, int)'),
+                  filename, linenum)
+        return
+
+    def set_progress(self, done, total):
+        """SLOT called as modules are linted.
+        """
+        self.status.setText('%d of %d modules' % (done, total))
+        return
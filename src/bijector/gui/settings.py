@@ -30,6 +30,10 @@ __date__ = 'April 2011'
 
 # pylint: disable=W0511
 
+# Default number of lines kept in each console.
+DEFAULT_SCROLLBACK = 10000
+
+
 class SettingsManager(object):
 
     def __init__(self, author, app_name):
@@ -46,6 +50,14 @@ class SettingsManager(object):
         self.settings.setValue(name, value)
         return
 
+    def get_int(self, name, default):
+        """Return an integer setting, or default if it is not set.
+        """
+        try:
+            return int(self.get_value(name))
+        except (TypeError, ValueError):
+            return default
+
 
 class SettingsDialog(Qt.QDialog, Ui_SettingsDialog):
 
@@ -58,6 +70,8 @@ class SettingsDialog(Qt.QDialog, Ui_SettingsDialog):
         self.pylintEdit.setText(self.settings.get_value('pylint'))
         self.cspdbEdit.setText(self.settings.get_value('cspdb'))
         self.csplintEdit.setText(self.settings.get_value('csplint'))
+        self.scrollbackSpin.setValue(self.settings.get_int('scrollback',
+                                                          DEFAULT_SCROLLBACK))
         return
 
     def accept(self):
@@ -66,5 +80,6 @@ class SettingsDialog(Qt.QDialog, Ui_SettingsDialog):
         self.settings.set_value('pylint',  self.pylintEdit.text())
         self.settings.set_value('cspdb',   self.cspdbEdit.text())
         self.settings.set_value('csplint', self.csplintEdit.text())
+        self.settings.set_value('scrollback', self.scrollbackSpin.value())
         Qt.QDialog.accept(self)
         return
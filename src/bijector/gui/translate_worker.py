@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+"""
+Run translations between concurrency models off the GUI thread.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import Qt
+
+import traceback
+
+from translator import TranslationCancelled, TranslationError
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class TranslationWorker(Qt.QThread):
+    """Background thread which runs one translation at a time.
+
+    Emits translated(int, PyQt_PyObject, PyQt_PyObject) with the revision,
+    new code and a SourceMap from the old lines to the new, or
+    failed(int, PyQt_PyObject) with the revision and an error message.
+    The message for a bug in the translator ends with its traceback.
+    Only the newest request is kept: older pending requests are dropped,
+    and a running translation is cancelled as soon as a newer one arrives.
+    """
+
+    def __init__(self, translator, cache=None):
+        Qt.QThread.__init__(self)
+        self.translator = translator
+        self.cache = cache
+        self.mutex = Qt.QMutex()
+        self.condition = Qt.QWaitCondition()
+        self.revision = 0
+        self.pending = None
+        self.stopping = False
+        return
+
+    def request(self, revision, source):
+        """Queue source for translation, replacing any pending request.
+        """
+        self.mutex.lock()
+        self.revision = revision
+        self.pending = (revision, source)
+        self.condition.wakeOne()
+        self.mutex.unlock()
+        if not self.isRunning():
+            self.start()
+        return
+
+    def cancel(self, revision):
+        """Mark any running translation older than revision as stale.
+        """
+        self.mutex.lock()
+        self.revision = revision
+        self.mutex.unlock()
+        return
+
+    def stop(self):
+        """Stop the thread and wait for it to finish.
+        """
+        self.mutex.lock()
+        self.stopping = True
+        self.condition.wakeOne()
+        self.mutex.unlock()
+        self.wait()
+        return
+
+    def is_stale(self, revision):
+        self.mutex.lock()
+        stale = self.stopping or revision != self.revision
+        self.mutex.unlock()
+        return stale
+
+    def run(self):
+        while True:
+            self.mutex.lock()
+            while self.pending is None and not self.stopping:
+                self.condition.wait(self.mutex)
+            if self.stopping:
+                self.mutex.unlock()
+                return
+            revision, source = self.pending
+            self.pending = None
+            self.mutex.unlock()
+            cancelled = lambda: self.is_stale(revision)
+            try:
+                code, smap = self.translator.translate_mapped(source, self.cache,
+                                                              cancelled)
+            except TranslationCancelled:
+                continue
+            except TranslationError, e:
+                self.emit(Qt.SIGNAL('failed(int, PyQt_PyObject)'),
+                          revision, str(e))
+                continue
+            except Exception, e:
+                # A bug in the translator must not end the thread, or no
+                # later edit would ever be translated.
+                self.emit(Qt.SIGNAL('failed(int, PyQt_PyObject)'), revision,
+                          'Internal error: %s: %s\n%s' %
+                          (e.__class__.__name__, e, traceback.format_exc()))
+                continue
+            if not self.is_stale(revision):
+                self.emit(Qt.SIGNAL('translated(int, PyQt_PyObject, PyQt_PyObject)'),
+                          revision, code, smap)
+        return
+
+
+class BackgroundTranslator(Qt.QObject):
+    """Debounce translation requests from the GUI and hand them to a
+    TranslationWorker.
+
+    Requests made within DELAY ms of each other are coalesced into one.
+    The translated(PyQt_PyObject, PyQt_PyObject) and failed(PyQt_PyObject)
+    signals are emitted on the GUI thread, and only for the newest request.
+    """
+    DELAY = 250 # ms
+
+    def __init__(self, translator, cache=None, parent=None):
+        Qt.QObject.__init__(self, parent)
+        self.revision = 0
+        self.source = None
+        self.worker = TranslationWorker(translator, cache)
+        self.timer = Qt.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.connect(self.timer, Qt.SIGNAL('timeout()'), self.submit)
+        self.connect(self.worker,
+                     Qt.SIGNAL('translated(int, PyQt_PyObject, PyQt_PyObject)'),
+                     self.on_translated)
+        self.connect(self.worker, Qt.SIGNAL('failed(int, PyQt_PyObject)'),
+                     self.on_failed)
+        return
+
+    def request(self, source):
+        """Ask for source to be translated, soon.
+        """
+        self.revision += 1
+        self.source = source
+        self.worker.cancel(self.revision)
+        self.timer.start(BackgroundTranslator.DELAY)
+        return
+
+    def submit(self):
+        """SLOT called when the debounce timer fires.
+        """
+        source, self.source = self.source, None
+        if source is not None:
+            self.worker.request(self.revision, source)
+        return
+
+    def on_translated(self, revision, code, smap):
+        if revision == self.revision:
+            self.emit(Qt.SIGNAL('translated(PyQt_PyObject, PyQt_PyObject)'),
+                      code, smap)
+        return
+
+    def on_failed(self, revision, error):
+        if revision == self.revision:
+            self.emit(Qt.SIGNAL('failed(PyQt_PyObject)'), error)
+        return
+
+    def stop(self):
+        self.timer.stop()
+        self.worker.stop()
+        return
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+
+"""
+Work out which top-level definitions of a module changed between two
+lint runs, so that only those need to be linted again.
+
+A module is split into its top-level functions, classes and processes,
+each running from its first decorator to the line before the next
+top-level statement, and the module-level code between them. A
+definition is changed if its body changed; its header is the decorators
+and signature.
+
+Lint messages often depend on code elsewhere in the module, e.g. an
+unused import or a call with the wrong number of arguments. So a module
+is only linted incrementally if its module-level code, and the headers
+and order of its definitions, are unchanged. Then the bodies of the
+unchanged definitions are replaced by "pass", keeping every line where
+it was, so that the linter checks only the changed bodies while every
+name it may need is still defined. Messages for the unchanged
+definitions, and for the module-level code, are carried over from the
+last run.
+
+Stubs hide what the linter would otherwise see, so a module is also
+linted in full when a changed definition:
+
+  * uses a different set of module-level names, which may make an
+    import unused or used;
+  * starts or stops returning a value from one of its functions, which
+    calls elsewhere may assign;
+  * assigns the result of calling a function which returns a value but
+    is stubbed, which would look like it returns nothing.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import bisect
+import difflib
+import tokenize
+
+from cache import digest
+from channelgraph import PROCESS_DECORATORS
+from translator import dotted_name
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class Definition(object):
+    """A top-level function, class or process. Lines are 1-based.
+    """
+    __slots__ = ('kind', 'name', 'start', 'header_end', 'end', 'header',
+                 'body', 'stubs', 'uses', 'returns', 'assigns')
+
+    def __init__(self, kind, name, start, header_end, end, header, body,
+                 stubs, uses=frozenset(), returns=frozenset(),
+                 assigns=frozenset()):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.header_end = header_end
+        self.end = end
+        self.header = header # Digests of the text.
+        self.body = body
+        self.stubs = stubs # (first, last) line ranges which may become pass.
+        self.uses = uses # Module-level names used.
+        self.returns = returns # Names of functions returning a value.
+        self.assigns = assigns # Names of functions whose results are assigned.
+        return
+
+
+def first_line(node):
+    """Return the first line of a statement, including its decorators.
+    """
+    return min([node.lineno] +
+               [dec.lineno for dec in getattr(node, 'decorator_list', [])])
+
+
+def header_end(lines, start, end):
+    """Return the last line of the decorators and signature of a def or
+    class statement on lines start..end, or None if its body starts on
+    the same line.
+    """
+    region = iter(lines[start - 1:end])
+    seen_keyword = False
+    depth = 0
+    colon = False
+    try:
+        for token in tokenize.generate_tokens(lambda: next(region, '')):
+            kind, text = token[0], token[1]
+            if kind == tokenize.NAME and text in ('def', 'class'):
+                seen_keyword = True
+            elif not seen_keyword or kind == tokenize.COMMENT:
+                continue
+            elif colon:
+                if kind == tokenize.NEWLINE:
+                    return start + token[2][0] - 1
+                return None # The body follows the colon.
+            elif kind == tokenize.OP and text in '([{':
+                depth += 1
+            elif kind == tokenize.OP and text in ')]}':
+                depth -= 1
+            elif kind == tokenize.OP and text == ':' and not depth:
+                colon = True
+    except (tokenize.TokenError, IndentationError):
+        return None
+    return None
+
+
+def function_nodes(node):
+    """Yield the nodes of a function, but not of functions, classes or
+    lambdas nested in it.
+    """
+    todo = list(ast.iter_child_nodes(node))
+    while todo:
+        child = todo.pop()
+        yield child
+        if not isinstance(child, (ast.FunctionDef, ast.ClassDef, ast.Lambda)):
+            todo.extend(ast.iter_child_nodes(child))
+    return
+
+
+def returns_value(func):
+    """Return True if calling a function may give a value other than
+    None, including a generator.
+    """
+    for node in function_nodes(func):
+        if isinstance(node, ast.Yield):
+            return True
+        if isinstance(node, ast.Return) and node.value is not None and \
+                not (isinstance(node.value, ast.Name) and
+                     node.value.id == 'None'):
+            return True
+    return False
+
+
+def bound_names(stmts):
+    """Return the names bound by module-level statements.
+    """
+    names = set()
+    for stmt in stmts:
+        if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+            names.add(stmt.name)
+            continue
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and \
+                    isinstance(node.ctx, (ast.Store, ast.Del)):
+                names.add(node.id)
+            elif isinstance(node, ast.alias):
+                names.add((node.asname or node.name).split('.')[0])
+    return names
+
+
+def facts(stmt, module_names):
+    """Return the module-level names a definition uses, the names of its
+    functions which return a value, and the names of the functions
+    whose results it assigns.
+    """
+    uses, returns, assigns = set(), set(), set()
+    for node in ast.walk(stmt):
+        if isinstance(node, ast.Name):
+            if node.id in module_names:
+                uses.add(node.id)
+        elif isinstance(node, ast.FunctionDef):
+            if returns_value(node):
+                returns.add(node.name)
+        elif isinstance(node, ast.Assign) and \
+                isinstance(node.value, ast.Call):
+            func = node.value.func
+            if isinstance(func, ast.Name):
+                assigns.add(func.id)
+            elif isinstance(func, ast.Attribute):
+                assigns.add(func.attr)
+    return frozenset(uses), frozenset(returns), frozenset(assigns)
+
+
+def body_ranges(lines, stmts, end):
+    """Return (first, last) body lines of each function in stmts, a list
+    of sibling statements ending at line end.
+    """
+    ranges = []
+    for index, stmt in enumerate(stmts):
+        if not isinstance(stmt, ast.FunctionDef):
+            continue
+        start = first_line(stmt)
+        last = first_line(stmts[index + 1]) - 1 if index + 1 < len(stmts) \
+            else end
+        head = header_end(lines, start, last)
+        if head is not None and head < last:
+            ranges.append((head + 1, last))
+    return ranges
+
+
+def definitions(source):
+    """Return (definitions, digest of module-level code) for a module,
+    or None if it cannot be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, TypeError):
+        return None
+    lines = source.splitlines(True)
+    stmts = tree.body
+    module_names = bound_names(stmts)
+    defs = []
+    glue = []
+    def add_glue(start, end):
+        # Module-level code is kept as a definition which never changes,
+        # so that its messages are carried over too.
+        text = ''.join(lines[start - 1:end])
+        glue.append(text)
+        if end >= start:
+            defs.append(Definition('module', '', start, end, end,
+                                   digest(text), digest(''), []))
+        return
+    add_glue(1, first_line(stmts[0]) - 1 if stmts else len(lines))
+    for index, stmt in enumerate(stmts):
+        start = first_line(stmt)
+        end = first_line(stmts[index + 1]) - 1 if index + 1 < len(stmts) \
+            else len(lines)
+        if not isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+            add_glue(start, end)
+            continue
+        head = header_end(lines, start, end)
+        if head is None:
+            add_glue(start, end)
+            continue
+        if isinstance(stmt, ast.ClassDef):
+            kind = 'class'
+            stubs = body_ranges(lines, stmt.body, end)
+        else:
+            decorators = set(dotted_name(dec) for dec in stmt.decorator_list)
+            kind = 'process' if decorators & set(PROCESS_DECORATORS) else 'def'
+            stubs = [(head + 1, end)] if head < end else []
+        defs.append(Definition(kind, stmt.name, start, head, end,
+                               digest(''.join(lines[start - 1:head])),
+                               digest(''.join(lines[head:end])), stubs,
+                               *facts(stmt, module_names)))
+    return defs, digest(*glue)
+
+
+def plan(old, new):
+    """Compare the definitions() of two versions of a module.
+
+    Return a list of (old, new) pairs of unchanged definitions and a
+    list of changed definitions, or None if the module must be linted
+    in full.
+    """
+    if old is None or new is None or old[1] != new[1]:
+        return None
+    old_defs, new_defs = old[0], new[0]
+    if [(d.kind, d.name, d.header) for d in old_defs] != \
+            [(d.kind, d.name, d.header) for d in new_defs]:
+        return None
+    unchanged, changed = [], []
+    for before, after in zip(old_defs, new_defs):
+        if before.body == after.body:
+            unchanged.append((before, after))
+        elif before.uses != after.uses or before.returns != after.returns:
+            return None
+        else:
+            changed.append(after)
+    stubbed = set()
+    for _, after in unchanged:
+        stubbed.update(after.returns)
+    for after in changed:
+        if after.assigns & stubbed:
+            return None
+    return unchanged, changed
+
+
+def stub_source(source, defs):
+    """Return source with the bodies of defs replaced by pass, keeping
+    every line where it was.
+    """
+    lines = source.splitlines(True)
+    for definition in defs:
+        for first, last in definition.stubs:
+            indent = None
+            for lineno in xrange(first - 1, last):
+                text = lines[lineno].strip()
+                if indent is None and text and not text.startswith('#'):
+                    indent = lines[lineno][:len(lines[lineno]) -
+                                           len(lines[lineno].lstrip())]
+                    lines[lineno] = indent + 'pass\n'
+                else:
+                    lines[lineno] = '\n'
+    return ''.join(lines)
+
+
+class Ranges(object):
+    """A sorted set of disjoint (first, last) line ranges.
+    """
+
+    def __init__(self, ranges):
+        ranges = sorted(ranges)
+        self.firsts = [first for first, _ in ranges]
+        self.lasts = [last for _, last in ranges]
+        return
+
+    def find(self, line):
+        """Return the index of the range holding line, or -1.
+        """
+        index = bisect.bisect_right(self.firsts, line) - 1
+        if index >= 0 and line <= self.lasts[index]:
+            return index
+        return -1
+
+
+def carry_over(messages, unchanged):
+    """Return the messages which fall in the old definitions of
+    unchanged (old, new) pairs, moved to the new line numbers.
+    messages is a list of (linenum, message, severity) tuples.
+    """
+    ranges = Ranges((old.start, old.end) for old, _ in unchanged)
+    shifts = [new.start - old.start
+              for old, new in sorted(unchanged, key=lambda pair: pair[0].start)]
+    kept = []
+    for linenum, message, severity in messages:
+        index = ranges.find(linenum)
+        if index >= 0:
+            kept.append((linenum + shifts[index], message, severity))
+    return kept
+
+
+def map_lines(old_lines, new_lines, linenums):
+    """Follow lines through an edit.
+
+    Return a dictionary from each of linenums (0-based lines of
+    old_lines) which is unchanged in new_lines to its new line number,
+    and a list of (first, last) 0-based ranges of changed lines in
+    new_lines.
+    """
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and \
+            old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    matcher = difflib.SequenceMatcher(
+        None, old_lines[prefix:len(old_lines) - suffix],
+        new_lines[prefix:len(new_lines) - suffix], False)
+    opcodes = [('equal', 0, prefix, 0, prefix)]
+    opcodes.extend((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix)
+                   for tag, i1, i2, j1, j2 in matcher.get_opcodes())
+    opcodes.append(('equal', len(old_lines) - suffix, len(old_lines),
+                    len(new_lines) - suffix, len(new_lines)))
+    starts = [opcode[1] for opcode in opcodes]
+    moved = {}
+    for linenum in linenums:
+        index = bisect.bisect_right(starts, linenum) - 1
+        while index > 0 and opcodes[index][1] == opcodes[index][2]:
+            index -= 1 # Skip empty opcodes, e.g. insertions.
+        tag, i1, i2, j1, j2 = opcodes[max(index, 0)]
+        if tag == 'equal' and i1 <= linenum < i2:
+            moved[linenum] = j1 + linenum - i1
+    changed = [(j1, max(j2, j1 + 1) - 1) for tag, i1, i2, j1, j2 in opcodes
+               if tag != 'equal' and j1 < len(new_lines)]
+    return moved, changed
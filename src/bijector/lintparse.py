@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+
+"""
+Parsers for the output of lint programs.
+
+Each output format has a parser class, registered by name:
+
+    pylint-parseable  pylint -f parseable, e.g.
+                      mod.py:12: [C0111, func] Missing docstring
+    pylint-json       pylint -f json, one JSON list of messages.
+    pylint-text       The default text format of older pylints, e.g.
+                      C0111: 12: Missing docstring
+    csplint           csplint text output, e.g.
+                      [mod.py, line 12] W001: Process writes to cin
+
+Parsers use plain string operations rather than regular expressions,
+and are fed output a batch of lines at a time, so that messages can be
+shown while lint is still running. Lines which cannot be read are kept
+in the parser's rejected list, rather than being dropped, so that the
+caller can report them.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+# Severities are the first letter of a pylint message id.
+SEVERITIES = 'ICRWEF'
+JSON_SEVERITIES = {'info': 'I', 'convention': 'C', 'refactor': 'R',
+                   'warning': 'W', 'error': 'E', 'fatal': 'F'}
+
+# Lines of pylint's text formats which are not messages: module headers,
+# and the score which pylint 1.7 and later prints after the messages.
+PYLINT_NOISE = ('*************', '-----', 'Your code has been rated at')
+
+_parsers = {}
+
+
+def register_parser(name, parser):
+    """Make a parser class available to get_parser() by name.
+    """
+    _parsers[name] = parser
+    return
+
+
+def get_parser(name):
+    """Return the parser class registered under name.
+    """
+    if name not in _parsers:
+        raise KeyError('No lint parser called %s' % name)
+    return _parsers[name]
+
+
+def parser_names():
+    return sorted(_parsers.keys())
+
+
+def is_message_id(text):
+    """Return True if text looks like a message id such as W0612 or E001.
+    """
+    return (len(text) in (4, 5) and text[0].isalpha() and
+            text[1:].isdigit())
+
+
+class LintMessage(object):
+    """An individual report from a lint process.
+    """
+    __slots__ = ('linenum', 'message', 'severity')
+
+    def __init__(self, linenum, message, severity):
+        self.linenum = linenum
+        self.message = message
+        self.severity = severity
+        return
+
+    def __str__(self):
+        return ':'.join([self.severity, str(self.linenum), self.message])
+
+
+class LintParser(object):
+    """Base class of parsers for line-oriented lint output.
+    Subclasses implement parse_line().
+    """
+
+    # Lines starting with these are not messages and are skipped.
+    NOISE = ()
+
+    def __init__(self):
+        self.rejected = []
+        return
+
+    def feed(self, lines):
+        """Return the messages in a list of complete lines of output.
+        """
+        messages = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(self.NOISE):
+                continue
+            msg = self.parse_line(line)
+            if msg is None:
+                self.rejected.append(line)
+            else:
+                messages.append(msg)
+        return messages
+
+    def close(self):
+        """Return any messages held back until the end of the output.
+        """
+        return []
+
+    def parse_line(self, line):
+        """Return a LintMessage, or None if line cannot be read.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def sample(cls, count):
+        """Return count lines of typical output, for benchmarking.
+        """
+        raise NotImplementedError()
+
+
+class PyLintParseableParser(LintParser):
+    """Parse output from pylint -f parseable.
+    """
+    NOISE = PYLINT_NOISE
+
+    def parse_line(self, line):
+        parts = line.split(':', 2)
+        if len(parts) != 3 or not parts[1].isdigit():
+            return None
+        text = parts[2].lstrip()
+        if not text.startswith('['):
+            return None
+        end = text.find(']')
+        if end < 0:
+            return None
+        ident = text[1:end].split(',', 1)[0].strip()
+        if not ident or ident[0] not in SEVERITIES:
+            return None
+        return LintMessage(int(parts[1]), text[end + 1:].strip(), ident[0])
+
+    @classmethod
+    def sample(cls, count):
+        return ['mod.py:%d: [C0111, func%d] Missing docstring' % (i + 1, i)
+                for i in xrange(count)]
+
+
+class PyLintTextParser(LintParser):
+    """Parse the default text output of older pylints.
+    """
+    NOISE = PYLINT_NOISE
+
+    def parse_line(self, line):
+        parts = line.split(':', 2)
+        if len(parts) != 3 or not is_message_id(parts[0]) or \
+                parts[0][0] not in SEVERITIES:
+            return None
+        # The line may be followed by a column or object name.
+        linenum = parts[1].strip().split(',', 1)[0]
+        if not linenum.isdigit():
+            return None
+        text = parts[2]
+        if text[:1] != ' ' and ':' in text:
+            # e.g. "C0111: 12,0:func: Missing docstring"
+            text = text.split(':', 1)[1]
+        return LintMessage(int(linenum), text.strip(), parts[0][0])
+
+    @classmethod
+    def sample(cls, count):
+        return ['C0111:%3d: Missing docstring' % (i + 1)
+                for i in xrange(count)]
+
+
+class PyLintJSONParser(LintParser):
+    """Parse output from pylint -f json.
+    The output is one JSON list, whose messages are decoded one object
+    at a time as each is completed.
+    """
+
+    def __init__(self):
+        LintParser.__init__(self)
+        self.decoder = json.JSONDecoder()
+        self.text = '' # Output not yet decoded.
+        self.state = 'start' # Then 'list', 'end' or 'failed'.
+        return
+
+    def feed(self, lines):
+        self.text += '\n'.join(lines) + '\n'
+        return self.decode()
+
+    def close(self):
+        messages = self.decode()
+        if self.text.strip():
+            self.rejected.extend(line for line in self.text.split('\n')
+                                 if line.strip())
+        self.text = ''
+        return messages
+
+    def decode(self):
+        """Return the messages in the complete objects of self.text.
+        """
+        text, pos, messages = self.text, 0, []
+        size = len(text)
+        while self.state in ('start', 'list'):
+            while pos < size and text[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == size:
+                break
+            elif self.state == 'start' and text[pos] == '[':
+                self.state = 'list'
+                pos += 1
+            elif self.state == 'start':
+                self.state = 'failed'
+            elif text[pos] == ']':
+                self.state = 'end'
+                pos += 1
+            elif text[pos] != '{':
+                self.state = 'failed'
+            elif text.find('}', pos) < 0:
+                break
+            else:
+                try:
+                    record, end = self.decoder.raw_decode(text, pos)
+                except ValueError:
+                    break # Incomplete, or malformed and rejected at close.
+                msg = self.parse_record(record)
+                if msg is None:
+                    self.rejected.append(text[pos:end])
+                else:
+                    messages.append(msg)
+                pos = end
+        self.text = text[pos:]
+        return messages
+
+    def parse_record(self, record):
+        """Return a LintMessage, or None if record cannot be read.
+        """
+        try:
+            ident = record.get('message-id') or ''
+            if ident[:1] in SEVERITIES and ident:
+                severity = ident[0]
+            else:
+                severity = JSON_SEVERITIES[record['type']]
+            return LintMessage(int(record['line']), record['message'],
+                               severity)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    @classmethod
+    def sample(cls, count):
+        return [json.dumps([{'type': 'convention', 'module': 'mod',
+                             'obj': 'func%d' % i, 'line': i + 1,
+                             'column': 0, 'path': 'mod.py',
+                             'symbol': 'missing-docstring',
+                             'message': 'Missing docstring',
+                             'message-id': 'C0111'}
+                            for i in xrange(count)], indent=4)]
+
+
+class CSPLintParser(LintParser):
+    """Parse output from csplint, which has no machine-readable format.
+    A message has a [file, line] location, then an id, a colon and text.
+    """
+
+    def parse_line(self, line):
+        start = line.find('[')
+        end = line.find(']', start + 1)
+        if start < 0 or end < 0:
+            return None
+        location = line[start + 1:end]
+        if '.py' not in location:
+            return None
+        # The line number is the last run of digits in the location.
+        stop = len(location)
+        while stop and not location[stop - 1].isdigit():
+            stop -= 1
+        first = stop
+        while first and location[first - 1].isdigit():
+            first -= 1
+        if first == stop:
+            return None
+        head, colon, text = line[end + 1:].partition(':')
+        if not colon:
+            return None
+        for ident in head.split():
+            if is_message_id(ident):
+                return LintMessage(int(location[first:stop]), text.strip(),
+                                   ident[0].upper())
+        return None
+
+    @classmethod
+    def sample(cls, count):
+        return ['[mod.py, line %d] W001: Process writes to cin' % (i + 1)
+                for i in xrange(count)]
+
+
+register_parser('pylint-parseable', PyLintParseableParser)
+register_parser('pylint-json', PyLintJSONParser)
+register_parser('pylint-text', PyLintTextParser)
+register_parser('csplint', CSPLintParser)
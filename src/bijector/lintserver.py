@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+"""
+Long-lived lint worker.
+
+Starting pylint costs far more than checking a small module, because
+pylint and its libraries are imported afresh by every process. This
+server runs a Python lint script (such as pylint or csplint) in-process
+for each request, so those imports are paid for once.
+
+Requests are read from stdin, one JSON object per line:
+
+    {"id": 1, "args": ["-f", "text", "-r", "n", "module.py"]}
+
+A request may also have a "stdin" string, which the linter reads as its
+standard input, e.g. the unsaved text of a module, and a "path" list of
+directories to import modules from before any others, e.g. the
+directory of a module whose copy is linted.
+
+The output of the linter is passed straight through to stdout as it is
+written, followed by a line:
+
+    @@lint-server-done@@ 1 STATUS
+
+where STATUS is the linter's exit status. Modules the linter has parsed
+are forgotten before each request, so that it sees the files as they
+are now rather than as they were at its first request.
+
+The server should be run by the interpreter named in the linter's #!
+line, see script_interpreter(), since that is where the linter and its
+libraries are installed. It is written to run under Python 2 or 3.
+
+The server exits after a fixed
+number of requests, or once its memory use passes a limit, so that
+whatever the linter caches cannot grow without bound. The client is
+expected to start a fresh server when needed.
+
+Usage: python lintserver.py [options] LINTER
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+DONE = '@@lint-server-done@@'
+
+MAX_REQUESTS = 50
+MAX_RSS_MB = 512
+
+
+def find_program(program):
+    """Return the full path of an executable on the PATH, or program.
+    """
+    if os.path.dirname(program):
+        return program
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(path, program)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return program
+
+
+def script_interpreter(path):
+    """Return the command line of the Python interpreter named in the #!
+    line of a script, e.g. ['/usr/bin/python2.7', '-E'], or None if the
+    script has no such line.
+    """
+    try:
+        with open(path) as f:
+            first = f.readline()
+    except (IOError, UnicodeDecodeError):
+        return None
+    if not first.startswith('#!'):
+        return None
+    words = first[2:].split()
+    if words and os.path.basename(words[0]) == 'env':
+        # #!/usr/bin/env [-S] python finds the interpreter on the PATH.
+        words = [word for word in words[1:] if not word.startswith('-')][:1]
+        if words:
+            words[0] = find_program(words[0])
+    if not words or 'python' not in os.path.basename(words[0]):
+        return None
+    return words
+
+
+def is_python_script(path):
+    """Return True if path can be run with runpy in this interpreter.
+    A script whose #! line names another interpreter is not, as the
+    linter may not be installed for this one.
+    """
+    interpreter = script_interpreter(path)
+    if interpreter is None:
+        return path.endswith('.py')
+    return os.path.abspath(interpreter[0]) == os.path.abspath(sys.executable)
+
+
+def clear_caches():
+    """Forget the modules the linter has parsed, as they may have been
+    edited since. The linter's own imports are kept.
+    """
+    for name in ('astroid', 'logilab.astng'):
+        manager = getattr(sys.modules.get(name), 'MANAGER', None)
+        if manager is None:
+            continue
+        if hasattr(manager, 'clear_cache'):
+            manager.clear_cache()
+            continue
+        for cache in ('astroid_cache', 'astng_cache', '_mod_file_cache'):
+            if isinstance(getattr(manager, cache, None), dict):
+                getattr(manager, cache).clear()
+    return
+
+
+def run_linter(script, args, in_process, stdin=None, path=()):
+    """Run a linter over args, writing its output to stdout.
+    Return its exit status.
+    """
+    if not in_process:
+        sys.stdout.flush()
+        env = None
+        if path:
+            env = dict(os.environ)
+            dirs = list(path)
+            if env.get('PYTHONPATH'):
+                dirs.append(env['PYTHONPATH'])
+            env['PYTHONPATH'] = os.pathsep.join(dirs)
+        if stdin is None:
+            return subprocess.call([script] + args, env=env)
+        proc = subprocess.Popen([script] + args, stdin=subprocess.PIPE,
+                                env=env)
+        if not isinstance(stdin, bytes):
+            stdin = stdin.encode('utf-8')
+        proc.communicate(stdin)
+        return proc.returncode
+    clear_caches()
+    argv, real_stdin, real_path = sys.argv, sys.stdin, sys.path[:]
+    sys.path[0:0] = path
+    sys.argv = [script] + args
+    # Never let the linter read the requests.
+    sys.stdin = StringIO(stdin or '')
+    status = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            sys.stdout.write('%s\n' % e.code)
+            status = 1
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        status = 1
+    finally:
+        sys.argv, sys.stdin = argv, real_stdin
+        sys.path[:] = real_path
+    return status
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def serve(script, max_requests=MAX_REQUESTS, max_rss=MAX_RSS_MB):
+    """Answer requests from stdin until it closes or a limit is reached.
+    """
+    in_process = is_python_script(script)
+    served = 0
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        try:
+            request = json.loads(line)
+            ident, args = request['id'], [str(arg) for arg in request['args']]
+            stdin = request.get('stdin')
+            path = [str(directory) for directory in request.get('path', [])]
+            if stdin is not None and not isinstance(stdin, str):
+                # Python 2 linters read bytes.
+                stdin = stdin.encode('utf-8')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            sys.stdout.write('%s %s %d\n' % (DONE, None, 2))
+            sys.stdout.flush()
+            continue
+        status = run_linter(script, args, in_process, stdin, path)
+        sys.stdout.flush()
+        sys.stdout.write('%s %s %d\n' % (DONE, ident, status))
+        sys.stdout.flush()
+        served += 1
+        if served >= max_requests or rss_mb() >= max_rss:
+            break
+    return 0
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog [options] LINTER')
+    parser.add_option('-n', '--max-requests', dest='max_requests', type='int',
+                      default=MAX_REQUESTS,
+                      help='Exit after this many requests [default: %default]')
+    parser.add_option('-m', '--max-rss', dest='max_rss', type='int',
+                      default=MAX_RSS_MB,
+                      help='Exit once peak memory passes this many MB '
+                      '[default: %default]')
+    (options, args) = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('expected the name of one lint program')
+    # Modules next to the server are not the linter's to import.
+    del sys.path[0]
+    return serve(find_program(args[0]), options.max_requests, options.max_rss)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
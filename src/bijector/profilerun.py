@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+"""
+Run a script under two profilers, and merge what they find.
+
+cProfile records every call in the main thread of each process, giving
+exact call counts and times per function. A sampling profiler also
+looks at every thread of each process at regular intervals of CPU time
+and counts the line each thread is on, which shows where threaded code
+spends its time and which lines are hot.
+
+python-csp runs processes as forked OS processes, which start with
+neither profiler running. os.fork is wrapped so that each child starts
+its own profilers, and writes its results when it exits, including
+through os._exit as multiprocessing children do.
+
+Each process writes a JSON file, profile-PID.json, to the output
+directory:
+
+    {"pid": 123, "parent": 100, "interval": 0.005,
+     "functions": [[file, line, name, calls, own seconds,
+                    total seconds], ...],
+     "samples": [[file, line, function line, function name, count], ...]}
+
+load_profiles() merges the files in a directory into one Profile.
+
+Usage: python profilerun.py -d DIRECTORY SCRIPT [ARGS...]
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import atexit
+import cProfile
+import glob
+import json
+import os
+import signal
+import sys
+import thread
+
+from warmstart import run
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+INTERVAL = 0.005 # Seconds of CPU time between samples.
+
+# Frames of the profiler itself are never counted.
+_SKIP = tuple(os.path.splitext(os.path.abspath(path))[0]
+              for path in (__file__, sys.modules[run.__module__].__file__))
+
+
+class Profiler(object):
+    """Both profilers, for the current process.
+    """
+
+    def __init__(self, directory, interval=INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.pid = None
+        self.parent = None
+        self.main_thread = None
+        self.stale = set() # Threads which did not survive a fork.
+        self.samples = {}
+        self.profile = None
+        self.saved = False
+        return
+
+    def start(self):
+        self.pid = os.getpid()
+        self.parent = os.getppid()
+        self.main_thread = thread.get_ident()
+        self.samples = {}
+        self.saved = False
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        signal.signal(signal.SIGPROF, self.sample)
+        # Restart system calls interrupted by a sample.
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        if self.profile is not None:
+            self.profile.disable()
+        return
+
+    def sample(self, signum, frame):
+        """SIGPROF handler. Count the line each thread is on.
+        """
+        frames = sys._current_frames()
+        frames[self.main_thread] = frame
+        for ident, top in frames.iteritems():
+            if top is None or ident in self.stale or \
+                    os.path.splitext(top.f_code.co_filename)[0] in _SKIP:
+                continue
+            code = top.f_code
+            key = (code.co_filename, top.f_lineno, code.co_firstlineno,
+                   code.co_name)
+            self.samples[key] = self.samples.get(key, 0) + 1
+        return
+
+    def functions(self):
+        """Return [file, line, name, calls, own, total] for each function
+        called in the main thread.
+        """
+        if self.profile is None:
+            return []
+        self.profile.create_stats()
+        rows = []
+        for (filename, line, name), stats in self.profile.stats.iteritems():
+            if os.path.splitext(filename)[0] in _SKIP:
+                continue
+            calls, _, own, total, _ = stats
+            rows.append([filename, line, name, calls, own, total])
+        return rows
+
+    def save(self):
+        """Stop profiling and write this process's results.
+        """
+        if self.saved or self.pid != os.getpid():
+            return
+        self.saved = True
+        self.stop()
+        report = {'pid': self.pid,
+                  'parent': self.parent,
+                  'interval': self.interval,
+                  'functions': self.functions(),
+                  'samples': [list(key) + [count] for key, count
+                              in self.samples.iteritems()]}
+        filename = os.path.join(self.directory, 'profile-%d.json' % self.pid)
+        with open(filename, 'w') as f:
+            json.dump(report, f)
+        return
+
+    def install(self):
+        """Profile this process, and any processes it forks, until exit.
+        """
+        real_fork = os.fork
+        real_exit = os._exit
+        def fork():
+            pid = real_fork()
+            if pid == 0:
+                # Only the forking thread runs in the child, but the
+                # others still have frames.
+                self.stale = set(sys._current_frames()) - \
+                    set([thread.get_ident()])
+                self.stop()
+                self.start()
+            return pid
+        def _exit(status):
+            self.save()
+            real_exit(status)
+        os.fork = fork
+        os._exit = _exit
+        atexit.register(self.save)
+        self.start()
+        return
+
+
+class Function(object):
+    """Merged results for one function, across processes.
+    """
+    __slots__ = ('filename', 'line', 'name', 'calls', 'own', 'total',
+                 'samples', 'pids')
+
+    def __init__(self, filename, line, name):
+        self.filename = filename
+        self.line = line
+        self.name = name
+        self.calls = 0
+        self.own = 0.0
+        self.total = 0.0
+        self.samples = 0
+        self.pids = set()
+        return
+
+
+class Profile(object):
+    """Merged results of every process in a profiled run.
+    """
+
+    def __init__(self):
+        self.functions = {} # (file, line, name) -> Function
+        self.lines = {} # (file, line) -> samples
+        self.pids = set()
+        self.interval = INTERVAL
+        return
+
+    def function(self, filename, line, name):
+        key = (filename, line, name)
+        if key not in self.functions:
+            self.functions[key] = Function(filename, line, name)
+        return self.functions[key]
+
+    def add(self, report):
+        """Add the report of one process.
+        """
+        pid = report['pid']
+        self.pids.add(pid)
+        self.interval = report.get('interval', self.interval)
+        for filename, line, name, calls, own, total in report['functions']:
+            function = self.function(filename, line, name)
+            function.calls += calls
+            function.own += own
+            function.total += total
+            function.pids.add(pid)
+        for filename, line, first, name, count in report['samples']:
+            function = self.function(filename, first, name)
+            function.samples += count
+            function.pids.add(pid)
+            key = (filename, line)
+            self.lines[key] = self.lines.get(key, 0) + count
+        return
+
+    def total_samples(self):
+        return sum(self.lines.itervalues())
+
+    def hot_lines(self, filename, count):
+        """Return up to count (line, samples) pairs for the hottest lines
+        of a file, hottest first.
+        """
+        filename = os.path.abspath(filename)
+        lines = [(samples, line) for (name, line), samples
+                 in self.lines.iteritems()
+                 if os.path.abspath(name) == filename]
+        lines.sort(reverse=True)
+        return [(line, samples) for samples, line in lines[:count]]
+
+
+def load_profiles(directory):
+    """Return a Profile merging every report in directory.
+    Reports which cannot be read, e.g. because their process was
+    killed while writing, are skipped.
+    """
+    profile = Profile()
+    for filename in sorted(glob.glob(os.path.join(directory,
+                                                  'profile-*.json'))):
+        try:
+            with open(filename) as f:
+                profile.add(json.load(f))
+        except (IOError, ValueError, KeyError, TypeError):
+            continue
+    return profile
+
+
+def main():
+    parser = OptionParser(usage='%prog -d DIRECTORY SCRIPT [ARGS...]')
+    parser.disable_interspersed_args()
+    parser.add_option('-d', '--directory', dest='directory',
+                      help='Write results to DIRECTORY')
+    parser.add_option('-i', '--interval', dest='interval', type='float',
+                      default=INTERVAL * 1000,
+                      help='Milliseconds of CPU time between samples')
+    options, args = parser.parse_args()
+    if not options.directory or not args:
+        parser.error('A directory and a script are needed')
+    # Run the script as if it had been run directly.
+    del sys.path[0]
+    profiler = Profiler(os.path.abspath(options.directory),
+                        options.interval / 1000.0)
+    profiler.install()
+    try:
+        return run(args)
+    finally:
+        profiler.save()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+"""
+Round-trip equivalence and performance harness for the translators.
+
+A CSP test script (by default test/testcsp.py) is translated to threaded
+code and back again, giving three variants:
+
+    csp       the original script
+    threads   CSP -> threads
+    csp2      CSP -> threads -> CSP
+
+Each scenario of the script is run once per variant in a subprocess. The
+normalised outputs are compared, and the wall time, CPU time and peak RSS
+of every run are recorded. A JSON report is written which can be compared
+with the report from another commit, to catch regressions in correctness
+or in the speed of generated code.
+
+Usage: python -m bijector roundtrip [options] [SCRIPT]
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import errno
+import json
+import os
+import platform
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from cache import digest
+from tocsp import ThreadsToCSP
+from tothreads import CSPToThreads
+from translator import TranslationError
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+REPORT_VERSION = 1
+
+# Scenario name -> command line flag of test/testcsp.py.
+SCENARIOS = (('Seq', '-s'), ('Par', '-p'), ('Chan', '-c'), ('OOP', '-o'),
+             ('Poison', '-t'), ('Alt', '-l'), ('Choice', '-i'), ('Rep', '-r'))
+
+VARIANTS = ('csp', 'threads', 'csp2')
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              os.pardir, os.pardir, 'test', 'testcsp.py')
+
+# Output which legitimately differs between runs.
+ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+NUMBER_RE = re.compile(r'\d+\.\d+')
+
+
+def translate(source):
+    """Return a dictionary mapping each variant name to its source code,
+    and a dictionary of translation times in seconds.
+    """
+    times = {}
+    start = time.time()
+    threads = CSPToThreads().translate(source)
+    times['to_threads'] = round(time.time() - start, 6)
+    start = time.time()
+    csp2 = ThreadsToCSP().translate(threads)
+    times['to_csp'] = round(time.time() - start, 6)
+    return {'csp': source, 'threads': threads, 'csp2': csp2}, times
+
+
+def normalise(output, ordered=False):
+    """Return output with run-specific detail removed.
+
+    Unless ordered is True the lines are sorted, since processes running
+    in parallel may interleave their output differently on every run.
+    """
+    lines = []
+    for line in output.splitlines():
+        line = NUMBER_RE.sub('N.N', ADDRESS_RE.sub('0x?', line.rstrip()))
+        if line:
+            lines.append(line)
+    if not ordered:
+        lines.sort()
+    return '\n'.join(lines)
+
+
+def run(python, script, flag, cwd, timeout):
+    """Run one scenario of a script and return a dictionary of results.
+    """
+    result = {'status': 'ok'}
+    out = tempfile.TemporaryFile()
+    start = time.time()
+    with open(os.devnull) as devnull:
+        proc = subprocess.Popen([python, script, flag], cwd=cwd, stdout=out,
+                                stderr=subprocess.STDOUT, stdin=devnull)
+    expired = []
+    def kill():
+        expired.append(True)
+        try:
+            os.kill(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        return
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        # wait4 gives the resource usage of this child alone.
+        while True:
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+                break
+            except OSError, e:
+                if e.errno != errno.EINTR:
+                    raise
+    finally:
+        timer.cancel()
+    proc.returncode = status
+    result['wall'] = round(time.time() - start, 6)
+    result['cpu'] = round(usage.ru_utime + usage.ru_stime, 6)
+    result['maxrss_kb'] = usage.ru_maxrss
+    result['returncode'] = os.WEXITSTATUS(status) if os.WIFEXITED(status) \
+                           else -os.WTERMSIG(status)
+    if expired:
+        result['status'] = 'timeout'
+    elif result['returncode'] != 0:
+        result['status'] = 'error'
+    out.seek(0)
+    result['output'] = out.read()
+    out.close()
+    return result
+
+
+def run_all(script, python=sys.executable, timeout=60.0, ordered=False,
+            scenarios=None, keep=None):
+    """Translate script, run every scenario of every variant and return
+    the report as a dictionary.
+    """
+    script = os.path.abspath(script)
+    with open(script) as f:
+        source = f.read()
+    report = {'version': REPORT_VERSION,
+              'script': script,
+              'source_digest': digest(source),
+              'commit': git_commit(os.path.dirname(script)),
+              'python': python,
+              'platform': platform.platform(),
+              'timestamp': int(time.time()),
+              'scenarios': {}}
+    try:
+        variants, report['translation'] = translate(source)
+    except TranslationError, e:
+        report['translation'] = {'error': str(e)}
+        return report
+    directory = keep or tempfile.mkdtemp(prefix='roundtrip-')
+    try:
+        paths = {}
+        for name in VARIANTS:
+            paths[name] = os.path.join(directory, '%s_%s' %
+                                       (name, os.path.basename(script)))
+            with open(paths[name], 'w') as f:
+                f.write(variants[name])
+        for scenario, flag in SCENARIOS:
+            if scenarios and scenario.lower() not in scenarios:
+                continue
+            results = {}
+            for name in VARIANTS:
+                # Run from the script's own directory, so that any relative
+                # paths it uses resolve as they would for the original.
+                results[name] = run(python, paths[name], flag,
+                                    os.path.dirname(script), timeout)
+                output = results[name]['output'].replace(paths[name], script)
+                output = normalise(output, ordered)
+                results[name]['output'] = output
+                results[name]['output_digest'] = digest(output)
+                results[name]['output_lines'] = output.count('\n') + 1
+            equivalent = len(set(results[name]['output_digest']
+                                 for name in VARIANTS)) == 1
+            if equivalent:
+                # The digest is enough to compare reports across commits;
+                # full output is kept only where it is needed to diagnose.
+                for name in VARIANTS:
+                    del results[name]['output']
+            report['scenarios'][scenario] = {'flag': flag,
+                                             'equivalent': equivalent,
+                                             'variants': results}
+    finally:
+        if keep is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def git_commit(directory):
+    try:
+        proc = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd=directory,
+                                stdout=subprocess.PIPE,
+                                stderr=open(os.devnull, 'w'))
+        commit = proc.communicate()[0].strip()
+    except OSError:
+        return None
+    return commit or None
+
+
+def compare(old, new, tolerance):
+    """Yield a line of text for every regression of new against old.
+
+    A run has regressed if its scenario was equivalent and is no longer,
+    if it used to succeed and now fails, or if its wall time, CPU time or
+    peak RSS grew by more than the given fraction.
+    """
+    for scenario, result in sorted(new['scenarios'].items()):
+        before = old.get('scenarios', {}).get(scenario)
+        if before is None:
+            continue
+        if before['equivalent'] and not result['equivalent']:
+            yield '%s: variants are no longer equivalent' % scenario
+        for name in VARIANTS:
+            was, now = before['variants'].get(name), result['variants'][name]
+            if was is None:
+                continue
+            if was['status'] == 'ok' and now['status'] != 'ok':
+                yield '%s/%s: %s' % (scenario, name, now['status'])
+            for key in ('wall', 'cpu', 'maxrss_kb'):
+                if was[key] and now[key] > was[key] * (1 + tolerance):
+                    yield '%s/%s: %s %s -> %s' % (scenario, name, key,
+                                                  was[key], now[key])
+    return
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog roundtrip [options] [SCRIPT]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='Write the JSON report to this file '
+                      '[default: stdout]')
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help='Compare against the report from another commit '
+                      'and exit with status 1 on any regression')
+    parser.add_option('--tolerance', dest='tolerance', type='float',
+                      default=0.25,
+                      help='Allowed fractional slow-down against the '
+                      'baseline [default: %default]')
+    parser.add_option('-s', '--scenario', dest='scenarios', action='append',
+                      default=[],
+                      help='Only run this scenario (may be repeated): ' +
+                      ', '.join(name for name, _ in SCENARIOS))
+    parser.add_option('--python', dest='python', default=sys.executable,
+                      help='Interpreter used to run the variants '
+                      '[default: %default]')
+    parser.add_option('--timeout', dest='timeout', type='float', default=60.0,
+                      help='Seconds allowed for each run [default: %default]')
+    parser.add_option('--ordered', dest='ordered', action='store_true',
+                      default=False,
+                      help='Compare output line by line, in order')
+    parser.add_option('--keep', dest='keep', default=None,
+                      help='Keep the translated variants in this directory')
+    (options, args) = parser.parse_args(argv)
+    if len(args) > 1:
+        parser.error('only one script may be given')
+    script = args[0] if args else DEFAULT_SCRIPT
+    if options.keep is not None and not os.path.isdir(options.keep):
+        os.makedirs(options.keep)
+
+    report = run_all(script, options.python, options.timeout, options.ordered,
+                     [name.lower() for name in options.scenarios],
+                     options.keep)
+    text = json.dumps(report, indent=1, sort_keys=True)
+    if options.output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+
+    status = 0
+    if 'error' in report['translation']:
+        sys.stderr.write('Translation failed: %s\n' %
+                         report['translation']['error'])
+        status = 1
+    for scenario, result in sorted(report['scenarios'].items()):
+        if not result['equivalent']:
+            sys.stderr.write('%s: outputs differ\n' % scenario)
+            status = 1
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report, options.tolerance):
+            sys.stderr.write('Regression: %s\n' % line)
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+"""
+Line-level source maps between a module and its translation.
+
+A map is a sorted list of segments. Each segment pairs a run of source
+lines with a run of translated lines:
+
+    (source start, source length, target start, target length)
+
+Segments cover both files without gaps or overlaps, and translation
+never reorders code, so the starts are sorted on both sides. Lookups in
+either direction are a bisection, i.e. O(log n) in the number of
+segments. Runs which map line for line (equal lengths) are merged, so a
+map needs only a few segments per translated construct.
+
+All line numbers are 0-based, as in QScintilla.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import difflib
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+def count_lines(text):
+    """Return the number of lines in text, counting a final partial line.
+    """
+    return text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+
+
+def loads(text):
+    """Return a SourceMap from a string made by SourceMap.dumps().
+    """
+    values = [int(value) for value in text.split()]
+    smap = SourceMap(src_lines=values[0], dst_lines=values[1])
+    for index in xrange(2, len(values), 4):
+        smap.append(*values[index:index + 4])
+    return smap
+
+
+def diff_segments(old, new):
+    """Return segments pairing the lines of two lists of strings.
+
+    Common leading and trailing lines are matched directly, so that
+    small changes to large texts stay cheap.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    segments = [(0, prefix, 0, prefix)]
+    matcher = difflib.SequenceMatcher(None, old[prefix:len(old) - suffix],
+                                      new[prefix:len(new) - suffix])
+    for _, i1, i2, j1, j2 in matcher.get_opcodes():
+        segments.append((prefix + i1, i2 - i1, prefix + j1, j2 - j1))
+    segments.append((len(old) - suffix, suffix, len(new) - suffix, suffix))
+    return segments
+
+
+def align_segments(old, new, window=256):
+    """Return segments pairing the lines of two lists of strings, where
+    new differs from old only by a few inserted, deleted or changed runs
+    of lines, each shorter than window.
+
+    This is a single linear pass, unlike diff_segments().
+    """
+    segments = []
+    i, j = 0, 0
+    while i < len(old) and j < len(new):
+        start_i, start_j = i, j
+        while i < len(old) and j < len(new) and old[i] == new[j]:
+            i += 1
+            j += 1
+        segments.append((start_i, i - start_i, start_j, j - start_j))
+        if i == len(old) or j == len(new):
+            break
+        # Find the nearest point where the texts match again. Blank lines
+        # are too common to resynchronise on.
+        ahead = {}
+        for dj, line in enumerate(new[j:j + window]):
+            ahead.setdefault(line, dj)
+        best = None
+        for di, line in enumerate(old[i:i + window]):
+            dj = ahead.get(line)
+            if dj is not None and line.strip() and \
+                    old[i + di:i + di + 2] == new[j + dj:j + dj + 2]:
+                best = di, dj
+                break
+        if best is None:
+            break
+        segments.append((i, best[0], j, best[1]))
+        i += best[0]
+        j += best[1]
+    segments.append((i, len(old) - i, j, len(new) - j))
+    return segments
+
+
+class SourceMap(object):
+    """Map lines of a source file to lines of its translation and back.
+    """
+
+    def __init__(self, segments=(), src_lines=0, dst_lines=0):
+        self.src, self.src_len, self.dst, self.dst_len = [], [], [], []
+        self.src_lines = src_lines
+        self.dst_lines = dst_lines
+        for segment in segments:
+            self.append(*segment)
+        return
+
+    def append(self, src, src_len, dst, dst_len):
+        """Add a segment after all existing segments.
+        """
+        if not src_len and not dst_len:
+            return
+        if self.src and src_len == dst_len and \
+                self.src_len[-1] == self.dst_len[-1] and \
+                self.src[-1] + self.src_len[-1] == src and \
+                self.dst[-1] + self.dst_len[-1] == dst:
+            # Extend a line for line run.
+            self.src_len[-1] += src_len
+            self.dst_len[-1] += dst_len
+            return
+        self.src.append(src)
+        self.src_len.append(src_len)
+        self.dst.append(dst)
+        self.dst_len.append(dst_len)
+        return
+
+    def __len__(self):
+        return len(self.src)
+
+    def segments(self):
+        return zip(self.src, self.src_len, self.dst, self.dst_len)
+
+    def forward(self, line):
+        """Return the target line for a source line.
+        """
+        return self._lookup(self.src, self.src_len, self.dst, self.dst_len,
+                            self.dst_lines, line)
+
+    def backward(self, line):
+        """Return the source line for a target line.
+        """
+        return self._lookup(self.dst, self.dst_len, self.src, self.src_len,
+                            self.src_lines, line)
+
+    def _lookup(self, starts, lens, others, other_lens, total, line):
+        if not starts:
+            return min(line, max(total - 1, 0))
+        index = max(bisect.bisect_right(starts, line) - 1, 0)
+        offset = min(max(line - starts[index], 0),
+                     max(other_lens[index] - 1, 0))
+        return min(others[index] + offset, max(total - 1, 0))
+
+    def inverted(self):
+        """Return the map from target lines to source lines.
+        """
+        inverse = SourceMap(src_lines=self.dst_lines, dst_lines=self.src_lines)
+        inverse.src, inverse.src_len = list(self.dst), list(self.dst_len)
+        inverse.dst, inverse.dst_len = list(self.src), list(self.src_len)
+        return inverse
+
+    def shifted(self, src, dst):
+        """Return the segments of this map moved by src and dst lines.
+        """
+        return [(s + src, sl, d + dst, dl) for s, sl, d, dl in self.segments()]
+
+    def compose(self, other):
+        """Return the map from the source of this map to the target of
+        other, which maps the target of this map onwards.
+        """
+        pieces = []
+        for s, sl, m, ml in self.segments():
+            if sl == ml:
+                # Line for line: split across the segments of other.
+                index = max(bisect.bisect_right(other.src, m) - 1, 0)
+                while index < len(other) and other.src[index] <= m + ml:
+                    os_, osl = other.src[index], other.src_len[index]
+                    od, odl = other.dst[index], other.dst_len[index]
+                    index += 1
+                    start, end = max(m, os_), min(m + ml, os_ + osl)
+                    if osl == 0:
+                        if m <= os_ < m + ml:
+                            pieces.append((s + os_ - m, 0, od, odl))
+                    elif start < end:
+                        if osl == odl:
+                            pieces.append((s + start - m, end - start,
+                                           od + start - os_, end - start))
+                        else:
+                            pieces.append((s + start - m, end - start,
+                                           od, odl))
+            else:
+                first = other.position(m)
+                last = other.position(m + ml - 1, True) if ml else first
+                pieces.append((s, sl, first, last - first))
+        result = SourceMap(src_lines=self.src_lines,
+                           dst_lines=other.dst_lines)
+        pos = 0 # Next target line not yet covered.
+        for s, sl, d, dl in pieces:
+            if d < pos:
+                # Overlaps the previous piece: merge them into one block.
+                prev = result.pop()
+                s, sl = prev[0], s + sl - prev[0]
+                d, dl = prev[2], max(pos, d + dl) - prev[2]
+            elif d > pos:
+                result.append(s, 0, pos, d - pos)
+            result.append(s, sl, d, dl)
+            pos = max(pos, d + dl)
+        if pos < other.dst_lines:
+            result.append(self.src_lines, 0, pos, other.dst_lines - pos)
+        return result
+
+    def position(self, line, end=False):
+        """Return the target line where a source line starts, or just
+        after it ends if end is True.
+        """
+        index = max(bisect.bisect_right(self.src, line) - 1, 0)
+        if not self.src:
+            return line + end
+        if self.src_len[index] == self.dst_len[index]:
+            return self.dst[index] + line - self.src[index] + end
+        return self.dst[index] + (self.dst_len[index] if end else 0)
+
+    def pop(self):
+        segment = (self.src.pop(), self.src_len.pop(),
+                   self.dst.pop(), self.dst_len.pop())
+        return segment
+
+    def dumps(self):
+        """Return the map as a compact string.
+        """
+        values = [self.src_lines, self.dst_lines]
+        for segment in self.segments():
+            values.extend(segment)
+        return ' '.join(str(value) for value in values)
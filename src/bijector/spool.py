@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+An append-only text file which can be read back a page of lines at a
+time, e.g. to keep the full output of a long program run on disk while
+only the most recent lines are held in a console.
+
+The spool keeps the byte offset of every PAGE-th line, so reading any
+line needs one seek and at most PAGE lines of reading, and memory use
+grows by one integer per PAGE lines written.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import tempfile
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class Spool(object):
+    """Append-only spool of lines in a temporary file.
+    """
+    PAGE = 1024 # Lines between entries in the offset index.
+
+    def __init__(self, prefix='bijector-spool-'):
+        handle, self.filename = tempfile.mkstemp(prefix=prefix, suffix='.txt')
+        self.writer = os.fdopen(handle, 'wb')
+        self.reader = open(self.filename, 'rb')
+        self.index = [0] # Offsets of lines 0, PAGE, 2 * PAGE, ...
+        self.size = 0 # Bytes written.
+        self.newlines = 0 # Complete lines written.
+        self.partial = False # True if the last line has no newline yet.
+        self.dirty = False # True if the writer has not been flushed.
+        self.generation = 0 # Incremented by clear().
+        return
+
+    def __len__(self):
+        """Return the number of lines, including an unfinished last line.
+        """
+        return self.newlines + int(self.partial)
+
+    def write(self, text):
+        if not text:
+            return
+        self.writer.write(text)
+        self.dirty = True
+        # Find where each new page starts.
+        total = text.count('\n')
+        position = -1
+        seen = 0
+        while self.newlines + total >= len(self.index) * Spool.PAGE:
+            wanted = len(self.index) * Spool.PAGE - self.newlines
+            while seen < wanted:
+                position = text.find('\n', position + 1)
+                seen += 1
+            self.index.append(self.size + position + 1)
+        self.size += len(text)
+        self.newlines += total
+        self.partial = not text.endswith('\n')
+        return
+
+    def lines(self, first, count):
+        """Return up to count lines, without newlines, starting at line first.
+        """
+        if first < 0 or first >= len(self) or count <= 0:
+            return []
+        if self.dirty:
+            self.writer.flush()
+            self.dirty = False
+        page, skip = divmod(first, Spool.PAGE)
+        self.reader.seek(self.index[page])
+        for _ in xrange(skip):
+            self.reader.readline()
+        result = []
+        for _ in xrange(min(count, len(self) - first)):
+            result.append(self.reader.readline().rstrip('\r\n'))
+        return result
+
+    def clear(self):
+        """Forget all lines written so far.
+        """
+        self.writer.seek(0)
+        self.writer.truncate()
+        self.index = [0]
+        self.size = 0
+        self.newlines = 0
+        self.partial = False
+        self.dirty = False
+        self.generation += 1
+        return
+
+    def close(self):
+        """Close the spool and remove its file.
+        """
+        self.writer.close()
+        self.reader.close()
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+        return
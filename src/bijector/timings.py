@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""
+Rolling timing histograms, e.g. for the phases of a lint run.
+
+Each phase keeps its most recent samples, so that the summary follows
+current behaviour rather than the whole session. Samples are also
+counted into fixed buckets on a roughly logarithmic scale, from a
+millisecond to ten seconds. Everything is held in memory and can be
+written out as JSON.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from collections import deque
+
+import bisect
+import json
+import time
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+REPORT_VERSION = 1
+
+# Upper bounds of the histogram buckets, in seconds. A last bucket holds
+# anything slower.
+BUCKETS = (0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0)
+
+
+def percentile(ordered, fraction):
+    """Return the sample at a fraction of the way through a sorted list.
+    """
+    if not ordered:
+        return None
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Histogram(object):
+    """The most recent samples of one measurement.
+    """
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.count = 0 # Every sample ever added.
+        return
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        return
+
+    def buckets(self):
+        """Return the number of recent samples in each bucket.
+        """
+        counts = [0] * (len(BUCKETS) + 1)
+        for seconds in self.samples:
+            counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        return counts
+
+    def summary(self):
+        """Return a dictionary of statistics over the recent samples.
+        """
+        ordered = sorted(self.samples)
+        return {'count': self.count,
+                'recent': len(ordered),
+                'mean': sum(ordered) / len(ordered) if ordered else None,
+                'p50': percentile(ordered, 0.5),
+                'p90': percentile(ordered, 0.9),
+                'p99': percentile(ordered, 0.99),
+                'max': ordered[-1] if ordered else None,
+                'total': sum(ordered),
+                'buckets': self.buckets()}
+
+
+class Timings(object):
+    """Histograms for a fixed, ordered list of named phases.
+    """
+    SIZE = 1000 # Samples kept per phase.
+
+    def __init__(self, phases, size=None):
+        self.phases = tuple(phases)
+        self.size = size or Timings.SIZE
+        self.histograms = {}
+        self.clear()
+        return
+
+    def clear(self):
+        self.histograms = dict((phase, Histogram(self.size))
+                               for phase in self.phases)
+        return
+
+    def record(self, phase, seconds):
+        if phase not in self.histograms:
+            self.phases += (phase,)
+            self.histograms[phase] = Histogram(self.size)
+        self.histograms[phase].add(seconds)
+        return
+
+    def summary(self):
+        """Return a list of (phase, summary dictionary) pairs.
+        """
+        return [(phase, self.histograms[phase].summary())
+                for phase in self.phases]
+
+    def dumps(self):
+        """Return the summaries and recent samples as JSON.
+        """
+        phases = {}
+        for phase, summary in self.summary():
+            summary['samples'] = list(self.histograms[phase].samples)
+            phases[phase] = summary
+        return json.dumps({'version': REPORT_VERSION,
+                           'timestamp': int(time.time()),
+                           'buckets': list(BUCKETS),
+                           'order': list(self.phases),
+                           'phases': phases}, indent=1, sort_keys=True)
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            f.write(self.dumps() + '\n')
+        return
@@ -0,0 +1,1007 @@
+#!/usr/bin/env python
+
+"""
+Translate threaded Python code into python-csp code.
+
+Supported patterns:
+ * Functions used as threading.Thread targets become @process functions.
+ * Thread(target=f, args=(...), kwargs={...}) becomes f(...).
+ * Queue.Queue() becomes Channel(); put() and get() become write()
+   and read(), including on parameters and attributes which are passed
+   a queue.
+ * Runs of t.start() followed by t.join() for the same threads become
+   Par(...).start().
+ * Locks are removed when every critical section they guard only puts
+   to or gets from queues: CSP processes share no state, so such a lock
+   has nothing to protect. Any other lock is kept, with the import of
+   threading.
+ * Code translated by tothreads is translated back: its helpers are
+   removed, _Par, _Seq, _Alt and _Timer become Par, Seq, Alt and Timer,
+   _SKIP becomes Skip(), _read(c) and _poison(c) become c.read() and
+   c.poison(), and @_process and @_forever become @process and @forever.
+ * Imports of threading and Queue become an import of python-csp, but
+   names which are still used after translation stay imported. The
+   backend (csp.os_thread or csp.os_process) is chosen by the static
+   cost model in costmodel, unless the translator is created with
+   backend='thread' or backend='process', or the source contains a
+   '# csp-backend: ...' comment.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+
+from costmodel import BACKENDS, backend_annotation, choose_backend, \
+    function_cost, shares_state, without_annotations
+from translator import Translator, Rewriter, dotted_name, indentation
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+BACKEND_IMPORTS = {'thread': 'from csp.os_thread import *',
+                   'process': 'from csp.os_process import *'}
+
+THREAD_MODULES = ('threading', 'Queue', 'queue')
+THREAD_CTORS = ('threading.Thread', 'Thread')
+QUEUE_CTORS = ('Queue.Queue', 'queue.Queue', 'Queue',
+               'Queue.LifoQueue', 'queue.LifoQueue', 'LifoQueue')
+LOCK_CTORS = ('threading.Lock', 'threading.RLock', 'Lock', 'RLock')
+PUT_METHODS = ('put', 'put_nowait')
+GET_METHODS = ('get', 'get_nowait')
+LOCK_METHODS = ('acquire', 'release')
+BODIES = ('body', 'orelse', 'finalbody', 'handlers')
+SIMPLE_VALUES = (ast.Name, ast.Num, ast.Str)
+
+# Helpers defined by the code which tothreads emits, and the python-csp
+# names which they stand for.
+HELPERS = ('_Poisoned', '_POISON', '_read', '_poison', '_process',
+           '_forever', '_Par', '_Seq', '_SKIP', '_Alt', '_Timer')
+HELPER_RENAMES = {'_Par': 'Par', '_Seq': 'Seq', '_Alt': 'Alt',
+                  '_Timer': 'Timer', '_process': 'process',
+                  '_forever': 'forever'}
+HELPER_CALLS = {'_read': 'read', '_poison': 'poison'}
+# Renamed helpers whose python-csp names come from csp.guards, which the
+# backend modules do not export.
+GUARDS = ('_Timer',)
+HELPER_IMPORTS = ('random', 'time')
+
+
+def call_name(node):
+    """Return the dotted name of the function called by node, or None.
+    """
+    if isinstance(node, ast.Call):
+        return dotted_name(node.func)
+    return None
+
+
+def keyword(call, name):
+    for kw in call.keywords:
+        if kw.arg == name:
+            return kw.value
+    return None
+
+
+def thread_target(call):
+    """Return the target expression of a Thread(...) call, or None.
+    """
+    target = keyword(call, 'target')
+    if target is None and len(call.args) >= 2:
+        # Thread(group, target, name, args, kwargs)
+        target = call.args[1]
+    return target
+
+
+def statement_lists(tree):
+    """Yield every list of statements in a tree, with the enclosing
+    function definition (or None).
+    """
+    todo = [(tree.body, None)]
+    while todo:
+        body, func = todo.pop()
+        yield body, func
+        for stmt in body:
+            inner = stmt if isinstance(stmt, ast.FunctionDef) else func
+            for field in BODIES[:-1]:
+                stmts = getattr(stmt, field, None)
+                if stmts:
+                    todo.append((stmts, inner))
+            for handler in getattr(stmt, 'handlers', ()):
+                todo.append((handler.body, inner))
+    return
+
+
+def functions(tree):
+    """Yield (FunctionDef, is_method) for every function in a tree.
+    """
+    todo = [(node, False) for node in tree.body]
+    while todo:
+        node, in_class = todo.pop()
+        if isinstance(node, ast.FunctionDef):
+            yield node, in_class
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.stmt):
+                todo.append((child, isinstance(node, ast.ClassDef)))
+    return
+
+
+def assignments(tree):
+    """Yield (dotted name, value) pairs for simple assignments in a tree,
+    or in a list of the nodes of a tree.
+    Tuple assignments such as 'a, b = f(), g()' are paired up.
+    """
+    nodes = tree if isinstance(tree, list) else ast.walk(tree)
+    for node in nodes:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if isinstance(target, (ast.Tuple, ast.List)) and \
+                    isinstance(node.value, (ast.Tuple, ast.List)) and \
+                    len(target.elts) == len(node.value.elts):
+                pairs = zip(target.elts, node.value.elts)
+            else:
+                pairs = [(target, node.value)]
+            for name, value in pairs:
+                name = dotted_name(name)
+                if name is not None:
+                    yield name, value
+    return
+
+
+def assigned_names(tree, ctors):
+    """Return the dotted names assigned the result of calling one of ctors.
+    """
+    return set(name for name, value in assignments(tree)
+               if call_name(value) in ctors)
+
+
+def is_helper(stmt):
+    """Return True if stmt defines one of the helpers emitted by tothreads.
+    """
+    if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+        return stmt.name in HELPERS
+    elif isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+        return dotted_name(stmt.targets[0]) in HELPERS and \
+               call_name(stmt.value) == 'object'
+    return False
+
+
+def helper_name(stmt):
+    """Return the name of the helper stmt defines, see is_helper().
+    """
+    if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+        return stmt.name
+    return dotted_name(stmt.targets[0])
+
+
+def without_helpers(tree):
+    """Return a module holding the statements of tree which are not
+    helpers emitted by tothreads.
+    """
+    return ast.Module(body=[stmt for stmt in tree.body
+                            if not is_helper(stmt)])
+
+
+def root_name(node):
+    """Return the Name node at the start of a dotted name, or None.
+    """
+    while isinstance(node, ast.Attribute):
+        node = node.value
+    if isinstance(node, ast.Name):
+        return node
+    return None
+
+
+def method_classes(tree):
+    """Return a dictionary mapping each method in a tree, or in a list of
+    the nodes of a tree, to the name of its class.
+    """
+    nodes = tree if isinstance(tree, list) else ast.walk(tree)
+    classes = {}
+    for node in nodes:
+        if isinstance(node, ast.ClassDef):
+            for stmt in node.body:
+                if isinstance(stmt, ast.FunctionDef):
+                    classes[stmt] = node.name
+    return classes
+
+
+def qualified_name(func, classes):
+    """Return the name of a function, qualified by its class for a method.
+    classes is the result of method_classes().
+    """
+    if func in classes:
+        return classes[func] + '.' + func.name
+    return func.name
+
+
+def global_names(func):
+    """Return the names declared global in a function.
+    """
+    if func is None:
+        return set()
+    return set(name for node in ast.walk(func)
+               if isinstance(node, ast.Global) for name in node.names)
+
+
+def lock_call(stmt):
+    """Return (method, receiver node) for a statement such as
+    'lock.acquire()', or (None, None).
+    """
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call) and \
+            isinstance(stmt.value.func, ast.Attribute) and \
+            stmt.value.func.attr in LOCK_METHODS:
+        return stmt.value.func.attr, stmt.value.func.value
+    return None, None
+
+
+def lock_sections(body):
+    """Yield (lock name, statements) for each critical section in a list
+    of statements: the body of 'with lock:', and the statements between
+    'lock.acquire()' and 'lock.release()'.
+    """
+    held = {}
+    for stmt in body:
+        method, receiver = lock_call(stmt)
+        if method == 'acquire':
+            held[dotted_name(receiver)] = []
+            continue
+        elif method == 'release':
+            yield dotted_name(receiver), held.pop(dotted_name(receiver), [])
+            continue
+        for stmts in held.values():
+            stmts.append(stmt)
+        if isinstance(stmt, ast.With) and stmt.optional_vars is None:
+            if stmt.body[0].lineno == stmt.lineno:
+                # 'with lock: ...' on one line cannot be unwrapped, so
+                # the with statement itself is the critical section.
+                yield dotted_name(stmt.context_expr), [stmt]
+            else:
+                yield dotted_name(stmt.context_expr), stmt.body
+    for name, stmts in held.items():
+        yield name, stmts
+    return
+
+
+def is_simple(node):
+    if isinstance(node, ast.Tuple):
+        return all(is_simple(elt) for elt in node.elts)
+    return isinstance(node, SIMPLE_VALUES)
+
+
+def channel_operation(stmt, shared):
+    """Return the receiver of a statement which does nothing but put a
+    simple value to a queue or get a value into a local variable, e.g.
+    'q.put(x)' or 'x = q.get()', or None for any other statement.
+    shared is the set of global names, which are not local variables.
+    """
+    if isinstance(stmt, ast.Expr):
+        call = stmt.value
+    elif isinstance(stmt, ast.Assign) and \
+            all(isinstance(target, ast.Name) and target.id not in shared
+                for target in stmt.targets):
+        call = stmt.value
+    else:
+        return None
+    if not isinstance(call, ast.Call) or \
+            not isinstance(call.func, ast.Attribute) or call.keywords or \
+            call.starargs is not None or call.kwargs is not None:
+        return None
+    method = call.func.attr
+    if method in GET_METHODS and not call.args:
+        return dotted_name(call.func.value)
+    elif method in PUT_METHODS and isinstance(stmt, ast.Expr) and \
+            len(call.args) == 1 and is_simple(call.args[0]):
+        return dotted_name(call.func.value)
+    return None
+
+
+class ThreadsToCSP(Translator):
+    """Incremental translator from threaded code to python-csp.
+
+    Options:
+     * backend: 'auto' (the default), 'thread' or 'process'.
+    """
+    VERSION = 9
+
+    def analyse(self, chunk):
+        tree = without_helpers(chunk.tree)
+        # Walk the tree once; each analysis below filters these nodes.
+        nodes = list(ast.walk(tree))
+        targets, calls = {}, {}
+        for node in nodes:
+            name = call_name(node)
+            if name is None:
+                continue
+            elif name not in THREAD_CTORS:
+                # Arguments of other calls, which may pass queues on.
+                bindings = set((index, dotted_name(arg))
+                               for index, arg in enumerate(node.args))
+                bindings.update((kw.arg, dotted_name(kw.value))
+                                for kw in node.keywords)
+                bindings = set(binding for binding in bindings
+                               if binding[1] is not None)
+                if bindings:
+                    calls.setdefault(name, set()).update(bindings)
+                continue
+            target = dotted_name(thread_target(node))
+            if target is None:
+                continue
+            bindings = targets.setdefault(target, set())
+            args = keyword(node, 'args')
+            if isinstance(args, (ast.Tuple, ast.List)):
+                for index, arg in enumerate(args.elts):
+                    bindings.add((index, dotted_name(arg)))
+            kwargs = keyword(node, 'kwargs')
+            if isinstance(kwargs, ast.Dict):
+                for key, value in zip(kwargs.keys, kwargs.values):
+                    if isinstance(key, ast.Str):
+                        bindings.add((key.s, dotted_name(value)))
+        # Functions are known by their scope-qualified names, e.g.
+        # 'Worker.run' for a method. A class stands for its constructor.
+        classes = method_classes(nodes)
+        params, costs, attrs, sharing = {}, {}, set(), set()
+        for func, is_method in functions(tree):
+            name = qualified_name(func, classes)
+            names = [arg.id for arg in func.args.args
+                     if isinstance(arg, ast.Name)]
+            if shares_state(func, is_method and func.name == '__init__'):
+                sharing.add(name)
+                if func in classes:
+                    # The work of a Thread subclass is done in its methods.
+                    sharing.add(classes[func])
+            if is_method and names:
+                if func.name == '__init__' and func in classes:
+                    name = classes[func]
+                # Attributes assigned a parameter, e.g. 'self.q = q'.
+                for target, value in assignments(func):
+                    if isinstance(value, ast.Name) and \
+                            value.id in names[1:] and \
+                            target.startswith(names[0] + '.'):
+                        attrs.add((classes.get(func), name, target,
+                                   value.id))
+                names = names[1:]
+            params[name] = names
+            costs[name] = function_cost(func)
+        assigned = [(name, call_name(value))
+                    for name, value in assignments(nodes)]
+        facts = {'queues': set(name for name, ctor in assigned
+                               if ctor in QUEUE_CTORS),
+                 'locks': set(name for name, ctor in assigned
+                              if ctor in LOCK_CTORS),
+                 'threads': set(name for name, ctor in assigned
+                                if ctor in THREAD_CTORS),
+                 'targets': targets,
+                 'calls': calls,
+                 'attrs': attrs,
+                 'params': params,
+                 'costs': costs,
+                 'sharing': sharing,
+                 'helpers': set(helper_name(stmt)
+                                for stmt in chunk.tree.body
+                                if is_helper(stmt)),
+                 'backend': backend_annotation(chunk.text)}
+        facts.update(self.analyse_locks(tree, nodes, classes))
+        facts.update(self.analyse_names(nodes))
+        return facts
+
+    def analyse_locks(self, tree, nodes, classes):
+        """Return facts about what each lock guards.
+
+        sections holds (lock, function, class, receivers) for each
+        critical section, where receivers are the queues it uses, or
+        None if it does anything else. lock_refs holds every other use
+        of a dotted name, e.g. passing a lock to a function, after which
+        it cannot be removed.
+        """
+        sections = set()
+        shared = {}
+        for body, func in statement_lists(tree):
+            scope = (func.name if func else None, classes.get(func))
+            for lock, stmts in lock_sections(body):
+                if lock is None:
+                    continue
+                if func not in shared:
+                    shared[func] = global_names(func)
+                receivers = tuple(channel_operation(stmt, shared[func])
+                                  for stmt in stmts)
+                if None in receivers:
+                    receivers = None
+                sections.add((lock,) + scope + (receivers,))
+        skip = set()
+        for node in nodes:
+            method, receiver = lock_call(node)
+            if method is not None:
+                skip.add(receiver)
+            elif isinstance(node, ast.With) and node.optional_vars is None:
+                skip.add(node.context_expr)
+        refs = set(dotted_name(node) for node in nodes
+                   if isinstance(node, (ast.Name, ast.Attribute)) and
+                   isinstance(node.ctx, ast.Load) and node not in skip)
+        refs.discard(None)
+        return {'sections': sections, 'lock_refs': refs}
+
+    def analyse_names(self, nodes):
+        """Return facts about the names imported from threading and Queue,
+        and which of them are still used once calls are translated.
+
+        lock_ctors holds (name, locks) for each 'lock = threading.Lock()',
+        which uses name only if the lock is kept.
+        """
+        imported = set()
+        for node in nodes:
+            if isinstance(node, ast.ImportFrom) and \
+                    node.module in THREAD_MODULES:
+                imported.update(alias.asname or alias.name
+                                for alias in node.names)
+            elif isinstance(node, ast.Import):
+                imported.update(alias.asname or alias.name.split('.')[0]
+                                for alias in node.names
+                                if alias.name in THREAD_MODULES)
+        translated = set()
+        lock_ctors = set()
+        for node in nodes:
+            name = call_name(node)
+            if name in QUEUE_CTORS or name in THREAD_CTORS and \
+                    dotted_name(thread_target(node)) is not None:
+                translated.add(root_name(node.func))
+            elif isinstance(node, ast.Assign) and \
+                    call_name(node.value) in LOCK_CTORS:
+                root = root_name(node.value.func)
+                translated.add(root)
+                lock_ctors.add((root.id, tuple(dotted_name(target)
+                                              for target in node.targets)))
+        used = set(node.id for node in nodes
+                   if isinstance(node, ast.Name) and
+                   isinstance(node.ctx, ast.Load) and node not in translated)
+        return {'imported': imported,
+                'used': used,
+                'lock_ctors': lock_ctors}
+
+    def merge(self, facts):
+        queues, locks, threads = set(), set(), set()
+        sections, lock_refs, lock_ctors = set(), set(), set()
+        imported, used, attrs = set(), set(), set()
+        targets, calls, params, costs = {}, {}, {}, {}
+        sharing = set()
+        annotation = None
+        helpers = set()
+        for fact in facts:
+            helpers.update(fact['helpers'])
+            queues.update(fact['queues'])
+            locks.update(fact['locks'])
+            threads.update(fact['threads'])
+            sections.update(fact['sections'])
+            lock_refs.update(fact['lock_refs'])
+            lock_ctors.update(fact['lock_ctors'])
+            imported.update(fact['imported'])
+            used.update(fact['used'])
+            attrs.update(fact['attrs'])
+            params.update(fact['params'])
+            costs.update(fact['costs'])
+            sharing.update(fact['sharing'])
+            annotation = annotation or fact['backend']
+            for target, bindings in fact['targets'].items():
+                targets.setdefault(target, set()).update(bindings)
+            for callee, bindings in fact['calls'].items():
+                calls.setdefault(callee, set()).update(bindings)
+        # Follow queues into the parameters of processes, other functions
+        # and constructors, and into attributes assigned those parameters,
+        # until no more are found.
+        holders = set(queues)
+        while True:
+            processes = self.bind(targets, params, holders)
+            arguments = self.bind(calls, params, holders)
+            attributes = {}
+            for cls, key, target, param in attrs:
+                if param in arguments.get(key, ()) or \
+                        param in processes.get(key, ()):
+                    attributes.setdefault(cls, set()).add(target)
+            found = set(queues)
+            for names in processes.values() + arguments.values() + \
+                    attributes.values():
+                found.update(names)
+            if found == holders:
+                break
+            holders = found
+        context = {'queues': queues, 'processes': processes,
+                   'arguments': arguments, 'attributes': attributes}
+        # A lock can only be removed if it guards nothing but queues.
+        kept = locks & lock_refs
+        for lock, func, cls, receivers in sections:
+            if lock not in locks:
+                continue
+            channels = self.channels(context, func, cls)
+            if receivers is None or any(receiver not in queues and
+                                        receiver not in channels
+                                        for receiver in receivers):
+                kept.add(lock)
+        for name, names in lock_ctors:
+            if not set(names) <= locks - kept:
+                used.add(name)
+        # Every process started in one module is treated as one network.
+        # A kept lock guards state, which OS processes would not share.
+        shared = sorted(set(processes) & sharing) or sorted(kept)
+        backend, bound = choose_backend(dict((name, costs.get(name, (0, 0)))
+                                             for name in processes), shared)
+        reason = 'auto'
+        if annotation in BACKENDS:
+            backend, reason = annotation, 'set in source'
+        elif self.options.get('backend', 'auto') in BACKENDS:
+            backend, reason = self.options['backend'], 'set by option'
+        return {'queues': queues,
+                'locks': locks - kept,
+                'threads': threads,
+                'processes': processes,
+                'arguments': arguments,
+                'attributes': attributes,
+                'imports': imported & used,
+                'helpers': helpers,
+                'guards': sorted(HELPER_RENAMES[name] for name in GUARDS
+                                 if name in used),
+                'backend': backend,
+                'reason': reason,
+                'cpu_bound': bound,
+                'shared': shared}
+
+    def bind(self, calls, params, holders):
+        """Map each function called in calls to its parameters which are
+        passed one of holders.
+        """
+        bound = {}
+        for callee, bindings in calls.items():
+            for name in self.callees(callee, params):
+                names = params[name]
+                channels = bound.setdefault(name, set())
+                for slot, arg in bindings:
+                    if arg not in holders:
+                        continue
+                    if isinstance(slot, int) and slot < len(names):
+                        channels.add(names[slot])
+                    elif not isinstance(slot, int):
+                        channels.add(slot)
+        return bound
+
+    def callees(self, callee, params):
+        """Return the qualified names of the functions which a call of
+        callee may run. 'f' is the function or class f; 'x.f' is any
+        method f, since the class of x is not known.
+        """
+        if '.' not in callee:
+            return [callee] if callee in params else []
+        method = callee.split('.')[-1]
+        names = [name for name in params if name.endswith('.' + method)]
+        if not names and method in params:
+            # A function of another module, e.g. 'mod.f'.
+            names = [method]
+        return names
+
+    def channels(self, context, func, cls):
+        """Return the names which hold queues within a function, besides
+        those assigned a queue directly.
+        """
+        if func is None:
+            return set()
+        if cls is None:
+            key = func
+        elif func == '__init__':
+            key = cls
+        else:
+            key = cls + '.' + func
+        names = context['processes'].get(key, set()) | \
+            context['arguments'].get(key, set())
+        if cls is not None:
+            names |= context['attributes'].get(cls, set())
+        return names
+
+    def emit(self, chunk, context):
+        rewriter = Rewriter(chunk)
+        processes = context['processes']
+        tree = without_helpers(chunk.tree)
+        classes = method_classes(tree)
+        for func, _ in functions(tree):
+            self.emit_decorators(rewriter, func)
+            if qualified_name(func, classes) in processes:
+                self.emit_process(rewriter, func)
+        for body, func in statement_lists(tree):
+            channels = ()
+            if func is not None:
+                channels = self.channels(context, func.name,
+                                         classes.get(func))
+            self.emit_calls(rewriter, body, channels, context)
+        for body, _ in statement_lists(tree):
+            self.emit_statements(rewriter, body, context)
+        self.emit_helpers(rewriter, context)
+        return rewriter.rewritten()
+
+    def emit_decorators(self, rewriter, func):
+        """Replace the decorators emitted by tothreads.
+        """
+        chunk = rewriter.chunk
+        for decorator in func.decorator_list:
+            name = dotted_name(decorator)
+            if name in HELPER_RENAMES:
+                start = chunk.node_offset(decorator)
+                rewriter.replace(start, start + len(name),
+                                 HELPER_RENAMES[name])
+        return
+
+    def emit_helpers(self, rewriter, context):
+        """Remove the helpers emitted by tothreads, with the imports
+        which only they need.
+        """
+        if not context['helpers']:
+            return
+        chunk = rewriter.chunk
+        last = max(HELPERS.index(name) for name in context['helpers'])
+        after_queue = False
+        for stmt in chunk.tree.body:
+            if isinstance(stmt, ast.Import) and len(stmt.names) == 1 and \
+                    not stmt.names[0].asname:
+                name = stmt.names[0].name
+                if not after_queue or name not in HELPER_IMPORTS:
+                    after_queue = name in ('Queue', 'queue')
+                    continue
+            else:
+                after_queue = False
+                if not is_helper(stmt):
+                    continue
+            if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+                start = chunk.line_start(stmt.lineno)
+                lines = chunk.text[start:chunk.block_end(stmt)]
+                lines = lines.splitlines(True)
+                # Comments after the body belong to the following code.
+                while lines and (not lines[-1].strip() or
+                                 lines[-1].startswith('#')):
+                    lines.pop()
+                end = start + len(''.join(lines))
+            else:
+                span = chunk.stmt_span(stmt)
+                if span is None:
+                    continue
+                start, end = span
+            # tothreads puts blank lines before each helper, so take them
+            # unless this is the last helper, after which they came with
+            # the source.
+            if is_helper(stmt) and HELPERS.index(helper_name(stmt)) == last:
+                rewriter.replace(start, end, '')
+                continue
+            while end < len(chunk.text):
+                next_end = chunk.text.find('\n', end) + 1 or len(chunk.text)
+                if chunk.text[end:next_end].strip():
+                    break
+                end = next_end
+            rewriter.replace(start, end, '')
+        return
+
+    def emit_process(self, rewriter, func):
+        """Decorate a thread target as a CSP process.
+        """
+        for decorator in func.decorator_list:
+            if dotted_name(decorator) in ('process', 'forever',
+                                          '_process', '_forever'):
+                return
+        chunk = rewriter.chunk
+        start = chunk.line_start(func.lineno)
+        indent = indentation(chunk.lines[func.lineno - 1])
+        rewriter.insert(start, indent + '@process\n')
+        return
+
+    def emit_calls(self, rewriter, body, channels, context):
+        """Rewrite calls within the simple statements of a body.
+        """
+        chunk = rewriter.chunk
+        for stmt in body:
+            if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+                continue
+            nodes = []
+            for field, child in ast.iter_fields(stmt):
+                if field in BODIES:
+                    continue
+                elif isinstance(child, list):
+                    # Global.names is a list of strings, not nodes.
+                    nodes.extend(item for item in child
+                                 if isinstance(item, ast.AST))
+                elif isinstance(child, ast.AST):
+                    nodes.append(child)
+            # Names are only rewritten in code from tothreads.
+            kinds = (ast.Call, ast.Name) if context['helpers'] else ast.Call
+            exprs = [node for root in nodes for node in ast.walk(root)
+                     if isinstance(node, kinds)]
+            # Inner calls first, so outer rewrites can reuse them.
+            # ast.walk() yields parents before their children.
+            order = dict((id(node), index) for index, node in enumerate(exprs))
+            exprs.sort(key=lambda node: (-chunk.node_offset(node),
+                                         -order[id(node)]))
+            for node in exprs:
+                if isinstance(node, ast.Call):
+                    self.emit_call(rewriter, node, channels,
+                                   context['queues'])
+                elif node.id == '_SKIP' and context['helpers']:
+                    start = chunk.node_offset(node)
+                    rewriter.replace(start, start + len(node.id), 'Skip()')
+        return
+
+    def emit_call(self, rewriter, call, channels, queues):
+        chunk = rewriter.chunk
+        name = call_name(call)
+        if name is None:
+            self.emit_repeat(rewriter, call)
+            return
+        parens = chunk.call_parens(call)
+        if parens is None:
+            return
+        start = chunk.node_offset(call)
+        if name in QUEUE_CTORS:
+            rewriter.replace(start, parens[1], 'Channel()')
+        elif name in THREAD_CTORS:
+            self.emit_thread(rewriter, call, parens)
+        elif name in HELPER_RENAMES:
+            rewriter.replace(start, start + len(name), HELPER_RENAMES[name])
+        elif name in HELPER_CALLS and len(call.args) == 1:
+            rewriter.replace(start, parens[1], '%s.%s()' %
+                             (self.slice(rewriter, call.args[0]),
+                              HELPER_CALLS[name]))
+        elif isinstance(call.func, ast.Attribute):
+            receiver = dotted_name(call.func.value)
+            if receiver not in channels and receiver not in queues:
+                return
+            method = call.func.attr
+            if method in PUT_METHODS and call.args:
+                value = chunk.node_offset(call.args[0])
+                rewriter.replace(start, parens[1], '%s.write(%s)' %
+                                 (receiver, rewriter.rewritten(
+                                     value, chunk.expr_end(value))))
+            elif method in GET_METHODS:
+                rewriter.replace(start, parens[1], receiver + '.read()')
+        return
+
+    def emit_repeat(self, rewriter, call):
+        """Rewrite _Alt(...).repeat(n), emitted by tothreads, as
+        Alt(...) * n.
+        """
+        chunk = rewriter.chunk
+        if not isinstance(call.func, ast.Attribute) or \
+                call.func.attr != 'repeat' or len(call.args) != 1 or \
+                call_name(call.func.value) != '_Alt':
+            return
+        alt = chunk.call_parens(call.func.value)
+        if alt is None:
+            return
+        # The closing bracket follows the argument.
+        value = chunk.node_offset(call.args[0])
+        tokens = chunk.tokens()
+        close = tokens[chunk.token_index(chunk.expr_end(value))]
+        if close[1] != ')':
+            return
+        start = chunk.node_offset(call)
+        rewriter.replace(start, close[3], '%s * %s' %
+                         (rewriter.rewritten(start, alt[1]),
+                          rewriter.rewritten(value, chunk.expr_end(value))))
+        return
+
+    def emit_thread(self, rewriter, call, parens):
+        """Rewrite Thread(target=f, args=(...), kwargs={...}) as f(...).
+        """
+        chunk = rewriter.chunk
+        target = thread_target(call)
+        if dotted_name(target) is None:
+            return
+        args = []
+        value = keyword(call, 'args')
+        if value is None and len(call.args) >= 4:
+            value = call.args[3]
+        if isinstance(value, (ast.Tuple, ast.List)):
+            args.extend(self.slice(rewriter, elt) for elt in value.elts)
+        elif value is not None:
+            args.append('*' + self.slice(rewriter, value))
+        value = keyword(call, 'kwargs')
+        if value is None and len(call.args) >= 5:
+            value = call.args[4]
+        if isinstance(value, ast.Dict) and \
+                all(isinstance(key, ast.Str) for key in value.keys):
+            for key, val in zip(value.keys, value.values):
+                args.append('%s=%s' % (key.s, self.slice(rewriter, val)))
+        elif value is not None:
+            args.append('**' + self.slice(rewriter, value))
+        rewriter.replace(chunk.node_offset(call), parens[1], '%s(%s)' %
+                         (dotted_name(target), ', '.join(args)))
+        return
+
+    def slice(self, rewriter, node):
+        """Return the rewritten source text of an expression node.
+        """
+        chunk = rewriter.chunk
+        start = chunk.node_offset(node)
+        return rewriter.rewritten(start, chunk.expr_end(start))
+
+    def emit_statements(self, rewriter, body, context):
+        """Rewrite whole statements within a body.
+        """
+        chunk = rewriter.chunk
+        locks = context['locks']
+        removed = 0
+        for stmt in body:
+            if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                self.emit_import(rewriter, stmt, context)
+            elif isinstance(stmt, ast.Assign) and \
+                    call_name(stmt.value) in LOCK_CTORS and \
+                    all(dotted_name(target) in locks
+                        for target in stmt.targets):
+                removed += self.remove(rewriter, stmt)
+            elif isinstance(stmt, ast.Expr) and \
+                    isinstance(stmt.value, ast.Call) and \
+                    isinstance(stmt.value.func, ast.Attribute) and \
+                    stmt.value.func.attr in LOCK_METHODS and \
+                    dotted_name(stmt.value.func.value) in locks:
+                removed += self.remove(rewriter, stmt)
+            elif isinstance(stmt, ast.With) and \
+                    dotted_name(stmt.context_expr) in locks and \
+                    stmt.optional_vars is None:
+                self.emit_with(rewriter, stmt)
+        if body and removed == len(body):
+            # Keep the body syntactically valid.
+            stmt = body[0]
+            indent = indentation(chunk.lines[stmt.lineno - 1])
+            rewriter.insert(chunk.line_start(stmt.lineno), indent + 'pass\n')
+        self.emit_par(rewriter, body, context['threads'])
+        return
+
+    def remove(self, rewriter, stmt):
+        span = rewriter.chunk.stmt_span(stmt)
+        if span is None:
+            return 0
+        rewriter.replace(span[0], span[1], '')
+        return 1
+
+    def emit_import(self, rewriter, stmt, context):
+        """Replace imports of threading and Queue by the CSP import,
+        keeping any names which are still used.
+        """
+        csp_import = BACKEND_IMPORTS[context['backend']]
+        chunk = rewriter.chunk
+        span = chunk.stmt_span(stmt)
+        if span is None:
+            return
+        indent = indentation(chunk.lines[stmt.lineno - 1])
+        if isinstance(stmt, ast.ImportFrom):
+            if stmt.module not in THREAD_MODULES:
+                return
+            kept = [alias for alias in stmt.names
+                    if (alias.asname or alias.name) in context['imports']]
+            if len(kept) == len(stmt.names):
+                return
+            text = indent + csp_import + '\n'
+            if kept:
+                text += '%sfrom %s import %s\n' % (indent, stmt.module,
+                                                   self.aliases(kept))
+            rewriter.replace(span[0], span[1], text)
+            return
+        names = [alias for alias in stmt.names
+                 if alias.name not in THREAD_MODULES]
+        kept = [alias for alias in stmt.names
+                if alias.name in THREAD_MODULES and
+                (alias.asname or alias.name) in context['imports']]
+        if len(names) + len(kept) == len(stmt.names):
+            return
+        text = indent + csp_import + '\n'
+        if names:
+            text = indent + 'import ' + self.aliases(names) + '\n' + text
+        if kept:
+            text += indent + 'import ' + self.aliases(kept) + '\n'
+        rewriter.replace(span[0], span[1], text)
+        return
+
+    def aliases(self, names):
+        return ', '.join(alias.name + (' as ' + alias.asname
+                                       if alias.asname else '')
+                         for alias in names)
+
+    def emit_with(self, rewriter, stmt):
+        """Replace 'with lock:' by its (dedented) body.
+        """
+        chunk = rewriter.chunk
+        if stmt.body[0].lineno == stmt.lineno:
+            return
+        start = chunk.line_start(stmt.lineno)
+        body_start = chunk.line_start(stmt.body[0].lineno)
+        end = chunk.block_end(stmt)
+        outer = indentation(chunk.lines[stmt.lineno - 1])
+        inner = indentation(chunk.lines[stmt.body[0].lineno - 1])
+        lines = rewriter.rewritten(body_start, end).splitlines(True)
+        text = ''.join(outer + line[len(inner):]
+                       if line.startswith(inner) else line
+                       for line in lines)
+        rewriter.replace(start, end, text)
+        return
+
+    def emit_par(self, rewriter, body, threads):
+        """Replace runs of t.start() followed by t.join() with Par(...).
+        """
+        chunk = rewriter.chunk
+        calls = []
+        for stmt in body:
+            method, name = None, None
+            if isinstance(stmt, ast.Expr) and \
+                    isinstance(stmt.value, ast.Call) and \
+                    not stmt.value.args and \
+                    isinstance(stmt.value.func, ast.Attribute):
+                method = stmt.value.func.attr
+                name = dotted_name(stmt.value.func.value)
+            if name not in threads:
+                method = None
+            calls.append((method, name, stmt))
+        index = 0
+        while index < len(calls):
+            starts = []
+            while index < len(calls) and calls[index][0] == 'start':
+                starts.append(calls[index])
+                index += 1
+            joins = []
+            while index < len(calls) and calls[index][0] == 'join':
+                joins.append(calls[index])
+                index += 1
+            names = [name for _, name, _ in starts]
+            if len(starts) < 2 or \
+                    sorted(names) != sorted(name for _, name, _ in joins):
+                if not starts and not joins:
+                    index += 1
+                continue
+            first = chunk.stmt_span(starts[0][2])
+            last = chunk.stmt_span(joins[-1][2])
+            if first is None or last is None:
+                continue
+            indent = indentation(chunk.lines[starts[0][2].lineno - 1])
+            rewriter.replace(first[0], last[1], '%sPar(%s).start()\n' %
+                             (indent, ', '.join(names)))
+        return
+
+    def assemble(self, out, context):
+        """Join translated chunks, keeping only the first CSP import.
+        The first import is followed by a comment line giving the chosen
+        backend, which replaces any such comment in the source, and by
+        an import of the guards which the code uses.
+        """
+        csp_import = BACKEND_IMPORTS[context['backend']]
+        text = '\n' + without_annotations(''.join(out))
+        line = '\n' + csp_import + '\n'
+        first = text.find(line)
+        if first == -1:
+            if not context['processes'] and not context['queues']:
+                return text[1:]
+            text = line + text[1:]
+            first = 0
+        first += len(line) - 1
+        header = '\n' + self.annotation(context)
+        guards = 'from csp.guards import ' + ', '.join(context['guards'])
+        if context['guards'] and '\n' + guards + '\n' not in text:
+            header += '\n' + guards
+        return text[1:first] + header + text[first:].replace(line, '\n')
+
+    def annotation(self, context):
+        """Return a comment recording why the backend was chosen.
+        Change 'auto' in the comment to 'thread' or 'process' to override;
+        the comment is kept by tothreads, so the choice is remembered.
+        """
+        if context['reason'] != 'auto':
+            return '# csp-backend: %s (%s)' % (context['backend'],
+                                               context['reason'])
+        elif context['shared'] and context['cpu_bound']:
+            return '# csp-backend: auto (shared state: %s)' % \
+                   ', '.join(context['shared'])
+        elif context['cpu_bound']:
+            return '# csp-backend: auto (CPU-bound: %s)' % \
+                   ', '.join(context['cpu_bound'])
+        return '# csp-backend: auto (no CPU-bound processes)'
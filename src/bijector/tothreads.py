@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+
+"""
+Translate python-csp code into threaded Python code.
+
+Supported patterns:
+ * @process functions become plain functions, and calls to them become
+   threading.Thread objects. @forever generators are driven by a helper.
+ * Channel() becomes Queue.Queue(); read() and write() become get()
+   and put(). poison() is handled by a sentinel value.
+ * Par, Seq, Alt, Skip and Timer become small helpers built on threading
+   and Queue, which are emitted once in place of the imports of the core
+   csp modules. Imports from other csp modules, such as csp.builtins,
+   are kept, as the processes they define cannot be translated.
+ * The operators // (Par), > (Seq), | (choice) and * (repetition).
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+
+from tocsp import call_name, functions, statement_lists, assignments, BODIES
+from translator import Translator, Rewriter, dotted_name, indentation
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+THREAD_IMPORTS = 'import threading\nimport Queue\n'
+
+# Modules whose names are all replaced by helpers.
+CORE_MODULES = ('csp', 'csp.csp', 'csp.os_thread', 'csp.os_process',
+                'csp.guards')
+
+# Helpers emitted in place of the csp imports, keyed by the feature
+# which needs them.
+PRELUDE = [
+    ('time', 'import time\n'),
+    ('poison', '''
+
+class _Poisoned(Exception):
+    pass
+
+_POISON = object()
+
+
+def _read(chan):
+    item = chan.get()
+    if item is _POISON:
+        chan.put(_POISON)
+        raise _Poisoned()
+    return item
+
+
+def _poison(chan):
+    chan.put(_POISON)
+
+
+def _process(func):
+    def run(*args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except _Poisoned:
+            pass
+    return run
+'''),
+    ('forever', '''
+
+def _forever(func):
+    def run(*args, **kwargs):
+        for _ in func(*args, **kwargs):
+            pass
+    return run
+'''),
+    ('par', '''
+
+class _Par(object):
+
+    def __init__(self, *threads):
+        self.threads = threads
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        for thread in self.threads:
+            thread.join()
+'''),
+    ('seq', '''
+
+class _Seq(object):
+
+    def __init__(self, *threads):
+        self.threads = threads
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+            thread.join()
+'''),
+    ('alt', '''
+
+_SKIP = object()
+
+
+class _Alt(object):
+
+    def __init__(self, *guards):
+        self.guards = list(guards)
+        self.last = -1
+
+    def _poll(self, order):
+        while True:
+            for index in order:
+                guard = self.guards[index]
+                if guard is _SKIP:
+                    self.last = index
+                    return 'Skip'
+                try:
+                    item = guard.get_nowait()
+                except Queue.Empty:
+                    continue
+                self.last = index
+                return item
+            time.sleep(0.001)
+
+    def select(self):
+        order = range(len(self.guards))
+        random.shuffle(order)
+        return self._poll(order)
+
+    def pri_select(self):
+        return self._poll(range(len(self.guards)))
+
+    def fair_select(self):
+        size = len(self.guards)
+        return self._poll([(self.last + 1 + i) % size for i in range(size)])
+
+    def repeat(self, times):
+        for _ in range(times):
+            yield self.select()
+'''),
+    ('timer', '''
+
+class _Timer(object):
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+'''),
+    ]
+
+# Names from the csp modules and the helpers which replace them.
+RENAMES = {'Par': ('_Par', 'par'),
+           'Seq': ('_Seq', 'seq'),
+           'Alt': ('_Alt', 'alt'),
+           'Timer': ('_Timer', 'timer')}
+
+
+def is_csp_import(stmt):
+    """Return True if stmt only imports core csp modules.
+    """
+    if isinstance(stmt, ast.ImportFrom):
+        return stmt.module in CORE_MODULES
+    elif isinstance(stmt, ast.Import):
+        return all(alias.name in CORE_MODULES for alias in stmt.names)
+    return False
+
+
+def prelude(features):
+    """Return the thread imports and helpers needed for a set of features.
+    """
+    if 'alt' in features or 'timer' in features:
+        features = features | set(['time'])
+    text = THREAD_IMPORTS
+    if 'alt' in features:
+        text += 'import random\n'
+    for feature, code in PRELUDE:
+        if feature in features:
+            text += code
+    return text
+
+
+class CSPToThreads(Translator):
+    """Incremental translator from python-csp to threaded code.
+    """
+    VERSION = 2
+
+    def analyse(self, chunk):
+        tree = chunk.tree
+        processes, channels = set(), set()
+        features, skips = set(), set()
+        for func, _ in functions(tree):
+            names = [dotted_name(dec) for dec in func.decorator_list]
+            if 'process' in names:
+                processes.add(func.name)
+            elif 'forever' in names:
+                processes.add(func.name)
+                features.add('forever')
+            else:
+                continue
+            channels.update(self.docstring_channels(func))
+            for node in ast.walk(func):
+                if isinstance(node, ast.Call) and \
+                        isinstance(node.func, ast.Attribute) and \
+                        node.func.attr in ('read', 'write', 'poison'):
+                    name = dotted_name(node.func.value)
+                    if name is not None:
+                        channels.add(name)
+        for node in ast.walk(tree):
+            name = call_name(node)
+            if name in RENAMES:
+                features.add(RENAMES[name][1])
+            elif name == 'Skip':
+                features.add('alt')
+            elif isinstance(node, ast.Call) and \
+                    isinstance(node.func, ast.Attribute) and \
+                    node.func.attr == 'poison':
+                features.add('poison')
+            elif isinstance(node, (ast.BinOp, ast.AugAssign)):
+                if isinstance(node.op, ast.FloorDiv):
+                    features.add('par')
+                elif isinstance(node.op, ast.BitOr):
+                    features.add('alt')
+                elif isinstance(node.op, ast.Mult):
+                    features.update(['seq', 'alt'])
+            elif isinstance(node, ast.Compare) and \
+                    isinstance(node.ops[0], ast.Gt):
+                features.add('seq')
+        for name, value in assignments(tree):
+            if call_name(value) == 'Channel':
+                channels.add(name)
+            elif call_name(value) == 'Skip':
+                skips.add(name)
+        return {'processes': processes,
+                'channels': channels,
+                'skips': skips,
+                'features': features}
+
+    def docstring_channels(self, func):
+        """Return the channels named by readset and writeset declarations.
+        """
+        channels = set()
+        doc = ast.get_docstring(func) or ''
+        for line in doc.splitlines():
+            name, sep, value = line.partition('=')
+            if sep and name.strip() in ('readset', 'writeset'):
+                channels.update(chan.strip() for chan in value.split(',')
+                                if chan.strip())
+        return channels
+
+    def merge(self, facts):
+        context = {'processes': set(), 'channels': set(), 'skips': set(),
+                   'features': set()}
+        for fact in facts:
+            for name, value in fact.items():
+                context[name].update(value)
+        return context
+
+    def emit(self, chunk, context):
+        rewriter = Rewriter(chunk)
+        for func, _ in functions(chunk.tree):
+            self.emit_decorators(rewriter, func, context)
+        for body, _ in statement_lists(chunk.tree):
+            self.emit_calls(rewriter, body, context)
+        for body, _ in statement_lists(chunk.tree):
+            for stmt in body:
+                self.emit_statement(rewriter, stmt, context)
+        return rewriter.rewritten()
+
+    def emit_decorators(self, rewriter, func, context):
+        chunk = rewriter.chunk
+        for decorator in func.decorator_list:
+            name = dotted_name(decorator)
+            if name not in ('process', 'forever'):
+                continue
+            start = chunk.line_start(decorator.lineno)
+            end = chunk.line_start(decorator.lineno + 1)
+            indent = indentation(chunk.lines[decorator.lineno - 1])
+            if name == 'forever':
+                rewriter.replace(start, end, indent + '@_forever\n')
+            elif 'poison' in context['features']:
+                rewriter.replace(start, end, indent + '@_process\n')
+            else:
+                rewriter.replace(start, end, '')
+        return
+
+    def emit_calls(self, rewriter, body, context):
+        """Rewrite calls within the simple statements of a body.
+        """
+        chunk = rewriter.chunk
+        for stmt in body:
+            if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+                continue
+            nodes = []
+            for field, child in ast.iter_fields(stmt):
+                if field in BODIES:
+                    continue
+                elif isinstance(child, list):
+                    # Global.names is a list of strings, not nodes.
+                    nodes.extend(item for item in child
+                                 if isinstance(item, ast.AST))
+                elif isinstance(child, ast.AST):
+                    nodes.append(child)
+            exprs = [node for root in nodes for node in ast.walk(root)
+                     if isinstance(node, (ast.Call, ast.BinOp))]
+            # Inner expressions first, so outer rewrites can reuse them.
+            # ast.walk() yields parents before their children.
+            order = dict((id(node), index) for index, node in enumerate(exprs))
+            exprs.sort(key=lambda node: (-chunk.node_offset(node),
+                                         -order[id(node)]))
+            for node in exprs:
+                if isinstance(node, ast.Call):
+                    self.emit_call(rewriter, node, context)
+                else:
+                    self.emit_binop(rewriter, node, context)
+        return
+
+    def emit_call(self, rewriter, call, context):
+        chunk = rewriter.chunk
+        name = call_name(call)
+        if name is None:
+            return
+        parens = chunk.call_parens(call)
+        if parens is None:
+            return
+        start = chunk.node_offset(call)
+        last = name.split('.')[-1]
+        if name == 'Channel':
+            rewriter.replace(start, parens[1], 'Queue.Queue()')
+        elif name == 'Skip':
+            rewriter.replace(start, parens[1], '_SKIP')
+        elif name in RENAMES:
+            rewriter.replace(start, start + len(name), RENAMES[name][0])
+        elif last in context['processes']:
+            self.emit_thread(rewriter, call, name, parens)
+        elif isinstance(call.func, ast.Attribute):
+            receiver = dotted_name(call.func.value)
+            if receiver not in context['channels']:
+                return
+            poison = 'poison' in context['features']
+            if last == 'read' and not call.args:
+                if poison:
+                    text = '_read(%s)' % receiver
+                else:
+                    text = receiver + '.get()'
+                rewriter.replace(start, parens[1], text)
+            elif last == 'write' and len(call.args) == 1:
+                rewriter.replace(start, parens[1], '%s.put(%s)' %
+                                 (receiver, self.slice(rewriter,
+                                                       call.args[0])))
+            elif last == 'poison' and not call.args:
+                rewriter.replace(start, parens[1], '_poison(%s)' % receiver)
+        return
+
+    def emit_thread(self, rewriter, call, name, parens):
+        """Rewrite a process instance f(...) as a Thread object.
+        """
+        args = ', '.join(self.slice(rewriter, arg) for arg in call.args)
+        if len(call.args) == 1:
+            args += ','
+        if call.starargs is not None:
+            star = 'tuple(%s)' % self.slice(rewriter, call.starargs)
+            args = '(%s) + %s' % (args, star) if args else star
+        elif args:
+            args = '(%s)' % args
+        kwargs = ', '.join('%r: %s' % (kw.arg, self.slice(rewriter, kw.value))
+                           for kw in call.keywords)
+        if call.kwargs is not None:
+            star = self.slice(rewriter, call.kwargs)
+            kwargs = 'dict(%s, **{%s})' % (star, kwargs) if kwargs else star
+        elif kwargs:
+            kwargs = '{%s}' % kwargs
+        text = 'threading.Thread(target=%s' % name
+        if args:
+            text += ', args=' + args
+        if kwargs:
+            text += ', kwargs=' + kwargs
+        rewriter.replace(rewriter.chunk.node_offset(call), parens[1],
+                         text + ')')
+        return
+
+    def emit_binop(self, rewriter, node, context):
+        """Rewrite choice (a | b) and repeated choice (Alt(...) * n).
+        """
+        chunk = rewriter.chunk
+        start = chunk.node_offset(node)
+        end = self.node_end(chunk, node.right)
+        if end is None:
+            return
+        if isinstance(node.op, ast.BitOr):
+            left = dotted_name(node.left)
+            right = dotted_name(node.right)
+            if left in context['channels'] and right in context['channels']:
+                rewriter.replace(start, end, '_Alt(%s, %s).select()' %
+                                 (left, right))
+        elif isinstance(node.op, ast.Mult):
+            alt, times = node.left, node.right
+            if call_name(times) == 'Alt':
+                alt, times = times, alt
+            if call_name(alt) == 'Alt' and isinstance(times, ast.Num):
+                rewriter.replace(start, end, '%s.repeat(%s)' %
+                                 (self.slice(rewriter, alt), times.n))
+        return
+
+    def emit_statement(self, rewriter, stmt, context):
+        """Rewrite imports and statements using the Par, Seq and
+        repetition operators.
+        """
+        chunk = rewriter.chunk
+        span = chunk.stmt_span(stmt)
+        if span is None:
+            return
+        indent = indentation(chunk.lines[stmt.lineno - 1])
+        text = None
+        if is_csp_import(stmt):
+            if indent:
+                text = 'import threading, Queue'
+            else:
+                text = prelude(context['features'])
+        elif isinstance(stmt, ast.AugAssign) and \
+                isinstance(stmt.op, ast.FloorDiv):
+            procs = [stmt.target] + self.elements(stmt.value)
+            text = self.run('_Par', rewriter, self.drop_skips(procs, context))
+        elif isinstance(stmt, ast.Expr):
+            expr = stmt.value
+            if isinstance(expr, ast.BinOp) and \
+                    isinstance(expr.op, ast.FloorDiv):
+                procs = [expr.left] + self.elements(expr.right)
+                text = self.run('_Par', rewriter,
+                                self.drop_skips(procs, context))
+            elif isinstance(expr, ast.Compare) and \
+                    all(isinstance(op, ast.Gt) for op in expr.ops):
+                text = self.run('_Seq', rewriter,
+                                [expr.left] + expr.comparators)
+            elif isinstance(expr, ast.BinOp) and \
+                    isinstance(expr.op, ast.Mult):
+                proc, times = expr.left, expr.right
+                if isinstance(proc, ast.Num):
+                    proc, times = times, proc
+                if isinstance(times, ast.Num) and \
+                        isinstance(proc, ast.Call) and \
+                        (call_name(proc) or '').split('.')[-1] in \
+                        context['processes']:
+                    text = '_Seq(*[%s for _ in range(%s)]).start()' % \
+                        (self.slice(rewriter, proc), times.n)
+        if text is not None:
+            if indent or not is_csp_import(stmt):
+                text = indent + text + '\n'
+            rewriter.replace(span[0], span[1], text)
+        return
+
+    def drop_skips(self, procs, context):
+        """Remove Skip() and names bound to it from the operands of
+        Par, since they do nothing.
+        """
+        return [proc for proc in procs if call_name(proc) != 'Skip' and
+                dotted_name(proc) not in context['skips']]
+
+    def elements(self, node):
+        if isinstance(node, (ast.Tuple, ast.List)):
+            return list(node.elts)
+        return [node]
+
+    def run(self, helper, rewriter, procs):
+        return '%s(%s).start()' % (helper, ', '.join(
+            self.slice(rewriter, proc) for proc in procs))
+
+    def slice(self, rewriter, node):
+        """Return the rewritten source text of an expression node.
+        """
+        chunk = rewriter.chunk
+        start = chunk.node_offset(node)
+        end = self.node_end(chunk, node)
+        if end is None:
+            end = chunk.expr_end(start)
+        return rewriter.rewritten(start, end)
+
+    def node_end(self, chunk, node):
+        """Return the offset just past a simple expression node, or None.
+        """
+        start = chunk.node_offset(node)
+        if isinstance(node, ast.Call):
+            parens = chunk.call_parens(node)
+            return parens[1] if parens else None
+        elif isinstance(node, (ast.Name, ast.Attribute)) and \
+                dotted_name(node) is not None:
+            return start + len(dotted_name(node))
+        elif isinstance(node, ast.Num):
+            tokens = chunk.tokens()
+            return tokens[chunk.token_index(start)][3]
+        return None
+
+    def assemble(self, out, context):
+        """Join translated chunks, keeping only the first set of helpers.
+        """
+        text = ''.join(out)
+        header = prelude(context['features'])
+        first = text.find(header)
+        if first == -1:
+            if context['processes'] or context['channels']:
+                text = header + '\n' + text
+            return text
+        first += len(header)
+        return text[:first] + text[first:].replace(header, '')
@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+
+"""
+Incremental source-to-source translation between concurrency models.
+
+A module is split into chunks: every top-level function or class
+definition (with its decorators) is a chunk of its own, and each run of
+other top-level statements is grouped into a single chunk. Each chunk is
+parsed, analysed and translated on its own, and the results are cached
+by chunk text. Re-translating a large module after editing one function
+therefore only re-parses and re-emits that one function.
+
+Translation is done by rewriting the original source text, guided by
+the AST, so that comments and layout survive the round trip.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import __future__
+import ast
+import bisect
+import StringIO
+import tokenize
+
+from cache import digest
+from sourcemap import SourceMap, align_segments, count_lines, diff_segments, \
+     loads
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+# Lines starting with these begin a new top-level definition.
+BOUNDARIES = ('def ', 'class ', '@')
+
+# Syntax errors which mean a chunk was split in the wrong place, for
+# example a column 0 line inside a triple quoted string.
+EOF_ERRORS = ('EOF', 'never closed', 'unterminated triple-quoted')
+
+OPENERS = '([{'
+CLOSERS = ')]}'
+
+
+class TranslationCancelled(Exception):
+    """Raised when a translation is cancelled part way through.
+    """
+    pass
+
+
+class TranslationError(Exception):
+    """Raised when a module cannot be translated.
+    """
+
+    def __init__(self, msg, lineno=None):
+        Exception.__init__(self, msg)
+        self.lineno = lineno
+        return
+
+    def __str__(self):
+        if self.lineno is None:
+            return self.args[0]
+        return '%s (line %d)' % (self.args[0], self.lineno)
+
+
+def split_chunks(source):
+    """Split the source of a module into a list of (lineno, text) pairs.
+
+    This is a purely lexical pass, so it costs very little on large
+    modules. Chunks which are split in the wrong place are merged again
+    by parse_chunks().
+    """
+    chunks = []
+    current = []
+    start = 1
+    kind = None # None, 'decorator', 'def' or 'stmt'.
+    for lineno, line in enumerate(source.splitlines(True)):
+        if not line.strip() or line[0] in ' \t#':
+            current.append(line)
+            continue
+        if line.startswith(BOUNDARIES):
+            if kind == 'decorator':
+                if not line.startswith('@'):
+                    kind = 'def'
+                current.append(line)
+                continue
+            if kind is not None:
+                chunks.append((start, ''.join(current)))
+                current, start = [], lineno + 1
+            kind = 'decorator' if line.startswith('@') else 'def'
+        elif kind in (None, 'stmt'):
+            kind = 'stmt'
+        else:
+            chunks.append((start, ''.join(current)))
+            current, start = [], lineno + 1
+            kind = 'stmt'
+        current.append(line)
+    if current:
+        chunks.append((start, ''.join(current)))
+    return chunks
+
+
+def future_flags(text):
+    """Return compiler flags for any __future__ imports in text.
+    """
+    flags = 0
+    if '__future__' not in text:
+        return flags
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return flags
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == '__future__':
+            for alias in node.names:
+                feature = getattr(__future__, alias.name, None)
+                if feature is not None:
+                    flags |= feature.compiler_flag
+    return flags
+
+
+def dotted_name(node):
+    """Return the dotted name for a Name or chain of Attribute nodes.
+    Return None for any other expression.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def indentation(line):
+    """Return the leading whitespace of a line.
+    """
+    return line[:len(line) - len(line.lstrip())]
+
+
+class Chunk(object):
+    """A parsed chunk of a module.
+
+    Positions are relative to the start of the chunk. Chunk objects are
+    cached by their text, and hold anything which can be worked out
+    from the text alone.
+    """
+
+    def __init__(self, text, flags=0):
+        self.text = text
+        self.tree = compile(text, '<chunk>', 'exec', ast.PyCF_ONLY_AST | flags)
+        self.lines = text.splitlines(True)
+        self.facts = None
+        self._offsets = None
+        self._tokens = None
+        self._starts = None
+        return
+
+    def offset(self, lineno, col):
+        """Convert an AST (lineno, col_offset) pair to an offset in text.
+        """
+        if self._offsets is None:
+            self._offsets = [0]
+            for line in self.lines:
+                self._offsets.append(self._offsets[-1] + len(line))
+        return self._offsets[lineno - 1] + col
+
+    def node_offset(self, node):
+        return self.offset(node.lineno, node.col_offset)
+
+    def line_start(self, lineno):
+        return self.offset(lineno, 0)
+
+    def tokens(self):
+        """Return a list of (type, string, start, end) tokens, with start
+        and end given as offsets into text.
+        """
+        if self._tokens is None:
+            readline = StringIO.StringIO(self.text).readline
+            self._tokens = []
+            for tok in tokenize.generate_tokens(readline):
+                kind, string, start, end = tok[:4]
+                if kind in (tokenize.COMMENT, tokenize.NL):
+                    continue
+                self._tokens.append((kind, string,
+                                     self.offset(*start), self.offset(*end)))
+            self._starts = [tok[2] for tok in self._tokens]
+        return self._tokens
+
+    def token_index(self, offset):
+        """Return the index of the first token starting at or after offset,
+        skipping over any INDENT or DEDENT tokens.
+        """
+        tokens = self.tokens()
+        index = bisect.bisect_left(self._starts, offset)
+        while index < len(tokens) and \
+                tokens[index][0] in (tokenize.INDENT, tokenize.DEDENT):
+            index += 1
+        return index
+
+    def expr_end(self, start):
+        """Return the offset just past the expression starting at start.
+
+        The expression ends at the first comma, semicolon or newline not
+        nested inside brackets, or at an unmatched closing bracket.
+        """
+        tokens = self.tokens()
+        index = self.token_index(start)
+        depth = 0
+        end = start
+        while index < len(tokens):
+            kind, string, tok_start, tok_end = tokens[index]
+            if kind == tokenize.OP and string in OPENERS:
+                depth += 1
+            elif kind == tokenize.OP and string in CLOSERS:
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and (kind in (tokenize.NEWLINE, tokenize.ENDMARKER)
+                                 or string in (',', ';')):
+                break
+            end = tok_end
+            index += 1
+        return end
+
+    def call_parens(self, call):
+        """Return (open, close) offsets for the brackets of a call.
+
+        open is the offset of '(' and close is the offset just past the
+        matching ')'. Only calls of dotted names are supported; for any
+        other call None is returned.
+        """
+        if dotted_name(call.func) is None:
+            return None
+        tokens = self.tokens()
+        index = self.token_index(self.node_offset(call.func))
+        # Skip NAME ('.' NAME)*
+        index += 1
+        while index + 1 < len(tokens) and tokens[index][1] == '.':
+            index += 2
+        if index >= len(tokens) or tokens[index][1] != '(':
+            return None
+        open_ = tokens[index][2]
+        depth = 0
+        while index < len(tokens):
+            string = tokens[index][1]
+            if tokens[index][0] == tokenize.OP and string in OPENERS:
+                depth += 1
+            elif tokens[index][0] == tokenize.OP and string in CLOSERS:
+                depth -= 1
+                if depth == 0:
+                    return open_, tokens[index][3]
+            index += 1
+        return None
+
+    def stmt_span(self, stmt):
+        """Return (start, end) offsets of the whole lines of a simple
+        statement, or None if the statement shares a line with another.
+        """
+        start = self.line_start(stmt.lineno)
+        if self.text[start:self.node_offset(stmt)].strip():
+            return None
+        tokens = self.tokens()
+        index = self.token_index(self.node_offset(stmt))
+        depth = 0
+        while index < len(tokens):
+            kind, string, _, tok_end = tokens[index]
+            if kind == tokenize.OP and string in OPENERS:
+                depth += 1
+            elif kind == tokenize.OP and string in CLOSERS:
+                depth -= 1
+            elif depth == 0 and string == ';':
+                return None
+            elif depth == 0 and kind in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                return start, tok_end
+            index += 1
+        return start, len(self.text)
+
+    def block_end(self, stmt):
+        """Return the offset just past the body of a compound statement.
+        """
+        tokens = self.tokens()
+        index = self.token_index(self.node_offset(stmt.body[0]))
+        depth = 0
+        while index < len(tokens):
+            kind = tokens[index][0]
+            if kind == tokenize.INDENT:
+                depth += 1
+            elif kind == tokenize.DEDENT:
+                if depth == 0:
+                    return self.line_start_of(tokens[index][2])
+                depth -= 1
+            elif kind == tokenize.ENDMARKER:
+                break
+            index += 1
+        return len(self.text)
+
+    def line_start_of(self, offset):
+        """Return the offset of the start of the line containing offset.
+        """
+        return self.text.rfind('\n', 0, offset) + 1
+
+
+class Rewriter(object):
+    """Collect text edits against a chunk and apply them.
+
+    Edits may be nested: a replacement can be built from rewritten
+    slices of the chunk with rewritten(), in which case the inner edits
+    are subsumed by the outer one when the chunk is finally rewritten.
+    """
+
+    def __init__(self, chunk):
+        self.chunk = chunk
+        # (start, -end, sequence, text), kept sorted so that the edits
+        # within a slice can be found by bisection.
+        self.edits = []
+        return
+
+    def replace(self, start, end, text):
+        bisect.insort(self.edits, (start, -end, len(self.edits), text))
+        return
+
+    def insert(self, offset, text):
+        self.replace(offset, offset, text)
+        return
+
+    def rewritten(self, start=0, end=None):
+        """Return chunk text between start and end with edits applied.
+        """
+        if end is None:
+            end = len(self.chunk.text)
+        # Outermost edits first; edits nested inside them are skipped.
+        first = bisect.bisect_left(self.edits, (start,))
+        last = bisect.bisect_left(self.edits, (end + 1,))
+        out = []
+        pos = start
+        for edit_start, edit_end, _, text in self.edits[first:last]:
+            if edit_start < pos or -edit_end > end:
+                continue
+            out.append(self.chunk.text[pos:edit_start])
+            out.append(text)
+            pos = -edit_end
+        out.append(self.chunk.text[pos:end])
+        return ''.join(out)
+
+
+class Translator(object):
+    """Base class for incremental translators.
+
+    Subclasses implement analyse(), which returns a dictionary of facts
+    about a single chunk, merge(), which combines the facts for every
+    chunk into a context for the module, and emit(), which translates a
+    single chunk given that context.
+    """
+    VERSION = 1
+
+    def __init__(self, **options):
+        self.options = options
+        self._chunks = {} # (text, flags) -> Chunk
+        self._emitted = {} # (text, context key) -> [text, line segments]
+        self._merged = ((), None, None) # Facts keys, context, context key.
+        return
+
+    def cache_key(self, source):
+        """Return a digest of everything which affects the translation
+        of source.
+        """
+        return digest(self.__class__.__name__, self.VERSION,
+                      sorted(self.options.items()), source)
+
+    def translate_cached(self, source, cache, cancelled=None):
+        """Translate source, reusing output from a DiskCache if possible.
+        """
+        key = self.cache_key(source)
+        code = cache.get(key)
+        if code is None:
+            code = self.translate(source, cancelled)
+            cache.put(key, code)
+        return code
+
+    def translate(self, source, cancelled=None):
+        """Translate the source of a module and return the new source.
+
+        cancelled is an optional callable, polled between chunks. If it
+        returns True, TranslationCancelled is raised.
+        """
+        return self.translate_chunks(source, cancelled, False)[0]
+
+    def translate_mapped(self, source, cache=None, cancelled=None):
+        """Translate source and return the new source with a SourceMap
+        from lines of source to lines of the translation.
+        If cache is a DiskCache, both are reused from it if possible.
+        """
+        if cache is not None:
+            key = self.cache_key(source)
+            code, smap = cache.get(key), cache.get(key + '.map')
+            if code is not None and smap is not None:
+                return code, loads(smap)
+        code, smap = self.translate_chunks(source, cancelled, True)
+        if cache is not None:
+            cache.put(key, code)
+            cache.put(key + '.map', smap.dumps())
+        return code, smap
+
+    def translate_chunks(self, source, cancelled, mapped):
+        """Translate source chunk by chunk. Return the translation and,
+        if mapped is True, its SourceMap (otherwise None).
+        """
+        pieces = self.parse_chunks(source, cancelled)
+        # The context only changes when the facts of some chunk do, so an
+        # edit which leaves every chunk's facts alone is not merged again.
+        facts_keys = tuple(chunk.facts_key for _, chunk in pieces)
+        if facts_keys == self._merged[0]:
+            context, key = self._merged[1:]
+        else:
+            context = self.merge([chunk.facts for _, chunk in pieces])
+            # Digest the context once: hashing the full key for every
+            # chunk would cost time proportional to the module for each.
+            key = digest(repr(self.context_key(context)))
+            self._merged = (facts_keys, context, key)
+        emitted = {}
+        out = []
+        segments = []
+        line = 0 # First line of the current chunk in the joined output.
+        for lineno, chunk in pieces:
+            if cancelled is not None and cancelled():
+                raise TranslationCancelled()
+            cache_key = (chunk.text, key)
+            entry = self._emitted.get(cache_key)
+            if entry is None:
+                entry = [self.emit(chunk, context), None]
+            if mapped:
+                # Line segments are cached with the text, so only chunks
+                # which changed are diffed.
+                if entry[1] is None:
+                    entry[1] = diff_segments(chunk.lines,
+                                             entry[0].splitlines(True))
+                segments.extend((src + lineno - 1, src_len, dst + line, dst_len)
+                                for src, src_len, dst, dst_len in entry[1])
+                line += entry[0].count('\n')
+            emitted[cache_key] = entry
+            out.append(entry[0])
+        # Drop cached output for chunks which no longer exist.
+        self._emitted = emitted
+        code = self.assemble(out, context)
+        if not mapped:
+            return code, None
+        joined = ''.join(out)
+        smap = SourceMap(segments, count_lines(source), count_lines(joined))
+        if code != joined:
+            # Follow the lines moved by assemble().
+            smap = smap.compose(SourceMap(align_segments(joined.splitlines(True),
+                                                         code.splitlines(True)),
+                                          count_lines(joined),
+                                          count_lines(code)))
+        return code, smap
+
+    def parse_chunks(self, source, cancelled=None):
+        """Return a list of (lineno, Chunk) pairs for a module.
+        """
+        raw = split_chunks(source)
+        flags = future_flags(raw[0][1]) if raw else 0
+        pieces = []
+        cache = {}
+        index = 0
+        while index < len(raw):
+            if cancelled is not None and cancelled():
+                raise TranslationCancelled()
+            lineno, text = raw[index]
+            while True:
+                try:
+                    chunk = self.get_chunk(text, flags)
+                    break
+                except SyntaxError, e:
+                    if index + 1 < len(raw) and \
+                            any(err in str(e.msg) for err in EOF_ERRORS):
+                        index += 1
+                        text += raw[index][1]
+                        continue
+                    raise TranslationError('Syntax error: %s' % e.msg,
+                                           lineno + (e.lineno or 1) - 1)
+            cache[(text, flags)] = chunk
+            pieces.append((lineno, chunk))
+            index += 1
+        self._chunks = cache
+        return pieces
+
+    def get_chunk(self, text, flags):
+        chunk = self._chunks.get((text, flags))
+        if chunk is None:
+            chunk = Chunk(text, flags)
+            chunk.facts = self.analyse(chunk)
+            chunk.facts_key = digest(repr(self.context_key(chunk.facts)))
+        return chunk
+
+    def context_key(self, context):
+        """Return a hashable key for a context dictionary.
+        """
+        items = []
+        for name in sorted(context):
+            value = context[name]
+            if isinstance(value, dict):
+                value = tuple(sorted((k, self.freeze(v))
+                                     for k, v in value.items()))
+            else:
+                value = self.freeze(value)
+            items.append((name, value))
+        return tuple(items)
+
+    def freeze(self, value):
+        if isinstance(value, (set, frozenset, list)):
+            return tuple(sorted(value))
+        return value
+
+    def assemble(self, out, context):
+        return ''.join(out)
+
+    def analyse(self, chunk):
+        raise NotImplementedError()
+
+    def merge(self, facts):
+        raise NotImplementedError()
+
+    def emit(self, chunk, context):
+        raise NotImplementedError()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+Start a Python interpreter ahead of time, ready to run a script.
+
+Starting Python and importing python-csp takes a noticeable part of a
+second, which was paid between pressing Run and seeing any output. The
+editor instead starts this script while it is idle. It imports the
+modules named on its command line, then waits for one line on stdin,
+a JSON list of the script to run and its arguments:
+
+    ["/home/user/pipeline.py"]
+
+The script is then run as __main__, as if by "python pipeline.py", with
+this process's stdin, stdout and stderr. The process exits when the
+script finishes, so every run starts from a clean interpreter, and the
+editor starts another one for the next run.
+
+Usage: python warmstart.py [MODULE...]
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from optparse import OptionParser
+
+import json
+import os
+import runpy
+import sys
+import traceback
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+def preload(modules):
+    """Import modules, ignoring any which cannot be imported.
+    """
+    for name in modules:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+    return
+
+
+def run(argv):
+    """Run the script argv[0] as __main__ with arguments argv[1:].
+    Tracebacks start at the script, as they would if it were run directly.
+    """
+    path = os.path.abspath(argv[0])
+    sys.argv = list(argv)
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except SystemExit:
+        raise
+    except:
+        etype, value, tb = sys.exc_info()
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(etype, value, tb)
+        return 1
+    return 0
+
+
+def main():
+    parser = OptionParser(usage='%prog [MODULE...]')
+    _, modules = parser.parse_args()
+    # Modules next to this script should not shadow those of the user.
+    del sys.path[0]
+    preload(modules)
+    line = sys.stdin.readline()
+    if not line.strip():
+        return 0
+    return run([arg.encode('utf-8') for arg in json.loads(line)])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
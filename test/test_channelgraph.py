@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Tests for the index of processes and channels.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from channelgraph import ChannelIndex, index_source, parse_sets
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+METHODS = '''import procs
+
+
+class Worker(object):
+
+    @process
+    def put(self, cout):
+        """
+        writeset = cout
+        """
+        return
+
+    def run(self):
+        c = Channel()
+        self.put(c)
+        return
+
+
+def main():
+    w = Worker()
+    d = Channel()
+    w.put(d)
+    procs.get(d)
+    return
+'''
+
+
+class TestChannelIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ChannelIndex()
+        with open(os.path.join(TEST_DIR, 'testcsp.py')) as f:
+            self.index._add('testcsp.py', index_source(f.read()))
+        return
+
+    def test_parse_sets(self):
+        self.assertEqual(parse_sets('Doc.\n\n  readset = a, b\n'
+                                    '  writeset =\n'),
+                         (['a', 'b'], []))
+
+    def test_qualified_names(self):
+        processes = self.index.files['testcsp.py']['processes']
+        self.assertEqual(processes['send']['params'], ['cout'])
+        self.assertEqual(processes['TestOOP.send']['params'], ['msg'])
+        self.assertEqual(processes['TestOOP.send']['scope'], 'TestOOP')
+
+    def test_writers(self):
+        writers = self.index.writers('cout')
+        self.assertTrue(('testcsp.py', 43, 'process send') in writers)
+        self.assertTrue(('testcsp.py', 67, 'process send100') in writers)
+
+    def test_local_channel(self):
+        self.assertTrue(('testcsp.py', 292, 'send(...) in testChan')
+                        in self.index.writers('c1'))
+        self.assertTrue(('testcsp.py', 292, 'recv(...) in testChan')
+                        in self.index.readers('c1'))
+
+    def test_methods(self):
+        instances = [(inst['process'], inst['scope'])
+                     for inst in index_source(METHODS)['instances']]
+        self.assertEqual(sorted(instances),
+                         [('Worker.put', 'Worker.run'), ('Worker.put', 'main'),
+                          ('get', 'main')])
+
+    def test_update_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'mod.py')
+            with open(filename, 'w') as f:
+                f.write(METHODS)
+            index = ChannelIndex(os.path.join(directory, 'index.json'))
+            self.assertEqual(index.update_tree(directory), 1)
+            self.assertFalse(index.update_file(filename))
+            self.assertEqual(index.writers('d'),
+                             [(filename, 22, 'Worker.put(...) in main')])
+            index.save()
+            loaded = ChannelIndex(index.path)
+            loaded.load()
+            self.assertEqual(loaded.writers('d'), index.writers('d'))
+            os.remove(filename)
+            index.update_tree(directory)
+            self.assertEqual(index.writers('d'), [])
+        finally:
+            shutil.rmtree(directory)
+
+
+    def test_update_directory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(directory, 'sub'))
+            for name in ('mod.py', os.path.join('sub', 'mod.py')):
+                with open(os.path.join(directory, name), 'w') as f:
+                    f.write(METHODS)
+            index = ChannelIndex(os.path.join(directory, 'index.json'))
+            self.assertEqual(index.update_directory(directory), 1)
+            self.assertEqual(sorted(index.files),
+                             [os.path.join(directory, 'mod.py')])
+            index.update_tree(directory)
+            os.remove(os.path.join(directory, 'mod.py'))
+            self.assertEqual(index.update_directory(directory), 0)
+            self.assertEqual(sorted(index.files),
+                             [os.path.join(directory, 'sub', 'mod.py')])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Tests for incremental linting.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from lintdiff import carry_over, definitions, map_lines, plan, stub_source
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+MODULE = '''import os
+import sys
+
+
+def helper(x):
+    return x + 1
+
+
+def show(x):
+    print(x)
+
+
+class Thing(object):
+
+    def size(self):
+        return len(sys.argv)
+
+    def run(self):
+        y = helper(1)
+        show(y)
+        return
+
+
+print(os.sep)
+'''
+
+
+def edit(old, new):
+    return plan(definitions(MODULE), definitions(MODULE.replace(old, new)))
+
+
+class TestLintDiff(unittest.TestCase):
+
+    def test_unchanged(self):
+        unchanged, changed = edit('', '')
+        self.assertEqual(changed, [])
+        kinds = [old.kind for old, _ in unchanged]
+        self.assertEqual(kinds, ['module', 'module', 'def', 'def', 'class',
+                                 'module'])
+
+    def test_changed_body(self):
+        unchanged, changed = edit('    print(x)\n', '    print(x * 2)\n')
+        self.assertEqual([d.name for d in changed], ['show'])
+        self.assertEqual(len(unchanged), 5)
+
+    def test_changed_header(self):
+        self.assertEqual(edit('def show(x):', 'def show(x, y=1):'), None)
+
+    def test_changed_module_code(self):
+        self.assertEqual(edit('print(os.sep)', 'print(os.linesep)'), None)
+
+    def test_changed_uses(self):
+        # sys may become unused, which only a full run can tell.
+        self.assertEqual(edit('len(sys.argv)', 'len(\'\')'), None)
+
+    def test_changed_returns(self):
+        self.assertEqual(edit('    return x + 1\n', '    print(x)\n'), None)
+
+    def test_assigns_stubbed(self):
+        # A stubbed helper would seem to return nothing.
+        self.assertEqual(edit('show(y)', 'show(y + 1)'), None)
+        unchanged, changed = edit('return x + 1', 'return x + 2')
+        self.assertEqual([d.name for d in changed], ['helper'])
+
+    def test_stub_source(self):
+        unchanged, changed = edit('    print(x)\n', '    print(x * 2)\n')
+        source = MODULE.replace('    print(x)\n', '    print(x * 2)\n')
+        stubbed = stub_source(source, [new for _, new in unchanged])
+        self.assertEqual(len(stubbed.splitlines()), len(source.splitlines()))
+        self.assertTrue('def helper(x):\n    pass\n' in stubbed)
+        self.assertTrue('    def run(self):\n        pass\n\n\n\n' in stubbed)
+        self.assertTrue('    print(x * 2)\n' in stubbed)
+        self.assertTrue('import sys\n' in stubbed)
+        compile(stubbed, '<stub>', 'exec')
+
+    def test_carry_over(self):
+        source = MODULE.replace('    print(x)\n', '\n    print(x * 2)\n')
+        unchanged, changed = plan(definitions(MODULE), definitions(source))
+        messages = [(1, 'Unused import os', 'W'),
+                    (10, 'Changed', 'C'),
+                    (16, 'Missing docstring', 'C'),
+                    (24, 'Module level', 'W')]
+        self.assertEqual(carry_over(messages, unchanged),
+                         [(1, 'Unused import os', 'W'),
+                          (17, 'Missing docstring', 'C'),
+                          (25, 'Module level', 'W')])
+
+    def test_map_lines(self):
+        moved, changed = map_lines(['a', 'b', 'c'], ['a', 'x', 'b', 'c'],
+                                   [0, 1, 2])
+        self.assertEqual(moved, {0: 0, 1: 2, 2: 3})
+        self.assertEqual(changed, [(1, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+Tests for the parsers of lint output.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from lintparse import get_parser, parser_names
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+# Output of pylint 1.7 and later, which ends with a score.
+PARSEABLE = """************* Module mod
+mod.py:1: [C0111, ] Missing module docstring
+mod.py:12: [W0612, func] Unused variable 'x'
+
+------------------------------------------------------------------
+Your code has been rated at 5.00/10 (previous run: 4.00/10, +1.00)
+
+"""
+
+
+def parse(name, text):
+    parser = get_parser(name)()
+    messages = parser.feed(text.split('\n')) + parser.close()
+    return [(msg.linenum, msg.severity, msg.message) for msg in messages], \
+        parser.rejected
+
+
+class TestLintParsers(unittest.TestCase):
+
+    def test_parseable(self):
+        messages, rejected = parse('pylint-parseable', PARSEABLE)
+        self.assertEqual(messages,
+                         [(1, 'C', 'Missing module docstring'),
+                          (12, 'W', "Unused variable 'x'")])
+        self.assertEqual(rejected, [])
+
+    def test_text(self):
+        messages, rejected = parse('pylint-text',
+                                   'C0111: 12: Missing docstring\n'
+                                   'W0612: 3,4:func: Unused variable\n'
+                                   '-----------------------------------\n'
+                                   'Your code has been rated at 9.00/10\n')
+        self.assertEqual(messages, [(12, 'C', 'Missing docstring'),
+                                    (3, 'W', 'Unused variable')])
+        self.assertEqual(rejected, [])
+
+    def test_json(self):
+        messages, rejected = parse('pylint-json',
+                                   '[{"type": "error", "line": 4, '
+                                   '"message": "Undefined variable"}]')
+        self.assertEqual(messages, [(4, 'E', 'Undefined variable')])
+        self.assertEqual(rejected, [])
+        messages, rejected = parse('pylint-json', 'Traceback\n')
+        self.assertEqual((messages, rejected), ([], ['Traceback']))
+
+    def test_json_streamed(self):
+        parser = get_parser('pylint-json')()
+        self.assertEqual(parser.feed(['[', '    {', '        "type": '
+                                      '"warning",']), [])
+        messages = parser.feed(['        "line": 2, "message": "a}b"',
+                                '    },', '    {"line": 3}'])
+        self.assertEqual([(msg.linenum, msg.severity, msg.message)
+                          for msg in messages], [(2, 'W', 'a}b')])
+        self.assertEqual(parser.feed([']', 'trailing']), [])
+        self.assertEqual(parser.close(), [])
+        self.assertEqual(parser.rejected, ['{"line": 3}', 'trailing'])
+
+    def test_csplint(self):
+        messages, rejected = parse('csplint',
+                                   '[mod.py, line 7] W001: Process writes '
+                                   'to cin\nnot a message\n')
+        self.assertEqual(messages, [(7, 'W', 'Process writes to cin')])
+        self.assertEqual(rejected, ['not a message'])
+
+    def test_samples(self):
+        for name in parser_names():
+            parser_class = get_parser(name)
+            messages, rejected = parse(name,
+                                       '\n'.join(parser_class.sample(5)))
+            self.assertEqual(len(messages), 5, name)
+            self.assertEqual(rejected, [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+Tests for source maps between a module and its translation.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from sourcemap import SourceMap, align_segments, diff_segments, loads
+from tothreads import CSPToThreads
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+
+class TestSourceMap(unittest.TestCase):
+
+    def setUp(self):
+        # Lines 0-1 map line for line, 2-3 become 5 lines, 4 is deleted.
+        self.smap = SourceMap([(0, 2, 0, 2), (2, 2, 2, 5), (4, 1, 7, 0),
+                               (5, 3, 7, 3)], 8, 10)
+        return
+
+    def test_merge(self):
+        smap = SourceMap([(0, 2, 0, 2), (2, 3, 2, 3), (5, 1, 5, 2)], 6, 7)
+        self.assertEqual(smap.segments(), [(0, 5, 0, 5), (5, 1, 5, 2)])
+
+    def test_forward(self):
+        self.assertEqual([self.smap.forward(line) for line in xrange(8)],
+                         [0, 1, 2, 3, 7, 7, 8, 9])
+
+    def test_backward(self):
+        self.assertEqual([self.smap.backward(line) for line in xrange(10)],
+                         [0, 1, 2, 3, 3, 3, 3, 5, 6, 7])
+
+    def test_clamped(self):
+        self.assertEqual(self.smap.forward(100), 9)
+        self.assertEqual(SourceMap([], 0, 3).forward(5), 2)
+
+    def test_inverted(self):
+        inverse = self.smap.inverted()
+        self.assertEqual([inverse.forward(line) for line in xrange(10)],
+                         [self.smap.backward(line) for line in xrange(10)])
+
+    def test_dumps(self):
+        copy = loads(self.smap.dumps())
+        self.assertEqual(copy.segments(), self.smap.segments())
+        self.assertEqual((copy.src_lines, copy.dst_lines), (8, 10))
+
+    def test_compose(self):
+        # Then a line is inserted at the top.
+        shift = SourceMap([(0, 0, 0, 1), (0, 10, 1, 10)], 10, 11)
+        smap = self.smap.compose(shift)
+        self.assertEqual([smap.forward(line) for line in xrange(8)],
+                         [1, 2, 3, 4, 8, 8, 9, 10])
+        self.assertEqual(smap.backward(0), 0)
+
+    def test_segments(self):
+        old = ['a\n', 'b\n', 'c\n', 'd\n']
+        new = ['a\n', 'x\n', 'y\n', 'c\n', 'd\n']
+        for segments in (diff_segments(old, new), align_segments(old, new)):
+            smap = SourceMap(segments, len(old), len(new))
+            self.assertEqual([smap.forward(line) for line in xrange(4)],
+                             [0, 1, 3, 4])
+
+    def test_translation(self):
+        with open(os.path.join(TEST_DIR, 'testcsp.py')) as f:
+            source = f.read()
+        code, smap = CSPToThreads().translate_mapped(source)
+        src, dst = source.splitlines(), code.splitlines()
+        self.assertEqual((smap.src_lines, smap.dst_lines),
+                         (len(src), len(dst)))
+        for line, text in enumerate(src):
+            if text.startswith('def ') or text.startswith('class '):
+                self.assertEqual(dst[smap.forward(line)], text)
+                self.assertEqual(smap.backward(smap.forward(line)), line)
+
+
+if __name__ == '__main__':
+    unittest.main()
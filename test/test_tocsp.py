@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+"""
+Tests for the translator from threaded code to python-csp.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from tocsp import ThreadsToCSP
+from tothreads import CSPToThreads
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+PIPELINE = '''import threading
+import Queue
+
+count = 0
+
+
+def producer(out):
+    global count
+    for i in range(3):
+        out.put(i)
+        count += 1
+    return
+
+
+def consumer(inp):
+    for i in range(3):
+        print(inp.get())
+    return
+
+
+q = Queue.Queue()
+t1 = threading.Thread(target=producer, args=(q,))
+t2 = threading.Thread(target=consumer, args=(q,))
+t1.start()
+t2.start()
+t1.join()
+t2.join()
+'''
+
+LOCKED = '''import threading
+import Queue
+
+lock = threading.Lock()
+total = 0
+
+
+def worker(q, n):
+    global total
+    for i in range(n):
+        with lock:
+            %s
+        lock.acquire()
+        q.put(i)
+        lock.release()
+    return
+
+
+q = Queue.Queue()
+t1 = threading.Thread(target=worker, args=(q, 3))
+t2 = threading.Thread(target=worker, args=(q, 4))
+t1.start()
+t2.start()
+t1.join()
+t2.join()
+'''
+
+SUBCLASS = '''import threading
+import Queue
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, q):
+        threading.Thread.__init__(self)
+        self.q = q
+        return
+
+    def run(self):
+        self.q.put(1)
+        return
+
+
+def show(inp):
+    print(inp.get())
+    return
+
+
+q = Queue.Queue()
+w = Worker(q)
+t = threading.Thread(target=show, args=(q,))
+w.start()
+t.start()
+w.join()
+t.join()
+'''
+
+CRUNCH = '''import threading
+import Queue
+
+results = []
+lock = threading.Lock()
+
+
+def crunch(out, n):
+    %s
+    for i in range(n):
+        for j in range(n):
+            for k in range(n):
+                x = i * j + k * k - i / 3
+    out.put(x)
+    return
+
+
+q = Queue.Queue()
+t1 = threading.Thread(target=crunch, args=(q, 10))
+t2 = threading.Thread(target=crunch, args=(q, 20))
+t1.start()
+t2.start()
+'''
+
+
+def translate(source, **options):
+    code = ThreadsToCSP(**options).translate(source)
+    compile(code, '<translation>', 'exec')
+    return code
+
+
+def imports(code):
+    """Return the names imported at the top level of code, by module.
+    """
+    names = []
+    for stmt in ast.parse(code).body:
+        if isinstance(stmt, ast.Import):
+            names.extend((None, alias.name) for alias in stmt.names)
+        elif isinstance(stmt, ast.ImportFrom):
+            names.extend((stmt.module, alias.name) for alias in stmt.names)
+    return names
+
+
+class TestThreadsToCSP(unittest.TestCase):
+
+    def test_pipeline(self):
+        code = translate(PIPELINE, backend='thread')
+        self.assertTrue(code.startswith('from csp.os_thread import *'))
+        self.assertTrue('@process\ndef producer(out):' in code)
+        self.assertTrue('out.write(i)' in code)
+        self.assertTrue('print(inp.read())' in code)
+        self.assertTrue('q = Channel()' in code)
+        self.assertTrue('t1 = producer(q)' in code)
+        self.assertTrue('Par(t1, t2).start()' in code)
+        self.assertFalse('threading' in code)
+
+    def test_global(self):
+        code = translate(PIPELINE, backend='thread')
+        self.assertTrue('    global count\n' in code)
+
+    def test_lock_guarding_queues(self):
+        code = translate(LOCKED % 'q.put(i)', backend='thread')
+        self.assertFalse('lock' in code)
+        self.assertFalse('threading' in code)
+        self.assertTrue('        q.write(i)\n        q.write(i)\n' in code)
+
+    def test_lock_guarding_state(self):
+        code = translate(LOCKED % 'total += i', backend='thread')
+        self.assertTrue('import threading\n' in code)
+        self.assertTrue('lock = threading.Lock()' in code)
+        self.assertTrue('        with lock:\n            total += i\n' in code)
+        self.assertTrue('        lock.acquire()\n        q.write(i)\n'
+                        '        lock.release()\n' in code)
+
+    def test_lock_passed_on(self):
+        source = LOCKED.replace('args=(q, 3)', 'args=(q, lock)')
+        code = translate(source % 'q.put(i)', backend='thread')
+        self.assertTrue('lock = threading.Lock()' in code)
+        self.assertTrue('with lock:' in code)
+
+    def test_thread_subclass(self):
+        code = translate(SUBCLASS, backend='thread')
+        self.assertTrue(code.startswith('import threading\n'))
+        self.assertTrue('class Worker(threading.Thread):' in code)
+        self.assertTrue('        self.q.write(1)\n' in code)
+        self.assertTrue('t = show(q)' in code)
+
+    def test_incremental(self):
+        translator = ThreadsToCSP(backend='thread')
+        translator.translate(PIPELINE)
+        for source in (PIPELINE.replace('range(', 'xrange('),
+                       PIPELINE.replace('q = Queue.Queue()', 'q = []'),
+                       PIPELINE):
+            self.assertEqual(translator.translate(source),
+                             translate(source, backend='thread'))
+
+    def test_cpu_bound(self):
+        code = translate(CRUNCH % 'pass')
+        self.assertTrue(code.startswith('from csp.os_process import *\n'
+                                        '# csp-backend: auto (CPU-bound: '
+                                        'crunch)\n'))
+
+    def test_shared_state(self):
+        for shared in ('global results', 'crunch.calls = 1'):
+            code = translate(CRUNCH % shared)
+            self.assertTrue(code.startswith('from csp.os_thread import *\n'
+                                            '# csp-backend: auto (shared '
+                                            'state: crunch)\n'), shared)
+        code = translate(CRUNCH % 'with lock:\n        results.append(n)')
+        self.assertTrue(code.startswith('import threading\n'
+                                        'from csp.os_thread import *\n'
+                                        '# csp-backend: auto (shared '
+                                        'state: lock)\n'))
+
+    def test_round_trip(self):
+        with open(os.path.join(TEST_DIR, 'testcsp.py')) as f:
+            source = f.read()
+        code = translate(CSPToThreads().translate(source))
+        for helper in ('_Par', '_Seq', '_Alt', '_SKIP', '_read', '_poison',
+                       '@_process', 'threading', 'Queue', '.put(', '.get('):
+            self.assertFalse(helper in code, helper)
+        self.assertEqual(code.count('@process\n'),
+                         source.count('@process\n'))
+        self.assertTrue('        cout.write(i)\n' in code)
+        self.assertTrue('        data = cin.read()\n' in code)
+        self.assertTrue('        self.chan.write(msg)\n' in code)
+        self.assertTrue('    chan.poison()\n' in code)
+        self.assertTrue('    alt = Alt(Skip(), cin1, cin2, cin3)\n' in code)
+        self.assertTrue('    gen = Alt(cin1, cin2, cin3) * 3\n' in code)
+        self.assertTrue('    p = Par(recv(c1), send(c1))\n' in code)
+        self.assertTrue('    Par(f.send(\'hello world\'), f.recv()).start()\n'
+                        in code)
+
+    def test_round_trip_imports(self):
+        with open(os.path.join(TEST_DIR, 'testcsp.py')) as f:
+            source = f.read()
+        code = translate(CSPToThreads().translate(source))
+        expected = source.replace('from csp.csp import *',
+                                  'from csp.os_thread import *')
+        self.assertEqual(imports(code), imports(expected))
+        self.assertTrue('    t = Timer()\n' in code)
+
+    def test_round_trip_tracer(self):
+        with open(os.path.join(TEST_DIR, 'test_tracer.py')) as f:
+            source = f.read()
+        code = translate(CSPToThreads().translate(source))
+        expected = source.replace(
+            'from csp.csp import *\nfrom csp.guards import Skip\n',
+            'from csp.os_thread import *\n'
+            '# csp-backend: auto (no CPU-bound processes)\n')
+        for procs in ("foo(chan, 'hello world!'), client(chan)",
+                      'server_read(chan_s), server_write(chan_s)'):
+            expected = expected.replace('skip //= ' + procs,
+                                        'Par(%s).start()' % procs)
+        self.assertEqual(code, expected)
+
+    def test_round_trip_override(self):
+        code = translate(CRUNCH % 'pass').replace('# csp-backend: auto',
+                                                  '# csp-backend: thread')
+        threads = CSPToThreads().translate(code)
+        self.assertTrue('# csp-backend: thread (CPU-bound: crunch)\n'
+                        in threads)
+        code = translate(threads)
+        self.assertTrue(code.startswith('from csp.os_thread import *\n'
+                                        '# csp-backend: thread (set in '
+                                        'source)\n'))
+        self.assertEqual(code.count('csp-backend'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+Tests for the translator from python-csp to threaded code.
+
+Copyright (C) Sarah Mount, 2011.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'bijector'))
+
+from tothreads import CSPToThreads
+
+__author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
+__date__ = 'Oct 2011'
+
+COUNTER = '''from csp.csp import *
+
+count = 0
+
+
+@process
+def counter(cout):
+    global count
+    count += 1
+    cout.write(count)
+    return
+'''
+
+
+def translate(source):
+    code = CSPToThreads().translate(source)
+    compile(code, '<translation>', 'exec')
+    return code
+
+
+class TestCSPToThreads(unittest.TestCase):
+
+    def test_global(self):
+        code = translate(COUNTER)
+        self.assertTrue('    global count\n' in code)
+        self.assertTrue('    cout.put(count)\n' in code)
+        self.assertFalse('csp' in code)
+
+    def test_builtins(self):
+        with open(os.path.join(TEST_DIR, 'testpar.py')) as f:
+            code = translate(f.read())
+        self.assertTrue('\nfrom csp.builtins import Generate, Plus, Printer\n'
+                        in code)
+        self.assertFalse('csp.csp' in code)
+        self.assertTrue('    _Par(Generate(in1), Generate(in2), '
+                        'Plus(in1, in2, out), Printer(out)).start()\n' in code)
+        self.assertFalse('_Par(_SKIP' in code)
+        self.assertTrue('    _Par(Generate(out), Printer(out)).start()\n'
+                        in code)
+
+    def test_tracer(self):
+        with open(os.path.join(TEST_DIR, 'test_tracer.py')) as f:
+            code = translate(f.read())
+        self.assertTrue('\n    from csp.tracer.tracer import csptrace\n'
+                        in code)
+        self.assertFalse('csp.csp' in code or 'csp.guards' in code)
+        self.assertTrue('\n\nch = Queue.Queue()\n' in code)
+        self.assertTrue('@_forever\ndef server():\n' in code)
+        self.assertTrue('    alt = _Alt(inchan1, inchan2, inchan3, _SKIP)\n'
+                        in code)
+        self.assertTrue('        _Par(threading.Thread(target=server_read, '
+                        'args=(chan_s,)), threading.Thread('
+                        'target=server_write, args=(chan_s,))).start()\n'
+                        in code)
+        self.assertTrue('        threading.Thread(target=simple).start()\n'
+                        in code)
+
+    def test_skip_name(self):
+        code = translate('from csp.csp import *\n'
+                         'p = Skip()\n'
+                         'p //= [foo(), bar()]\n')
+        self.assertTrue('_Par(foo(), bar()).start()' in code)
+
+
+if __name__ == '__main__':
+    unittest.main()